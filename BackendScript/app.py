@@ -1,42 +1,51 @@
-from flask import Flask, jsonify, send_file, request
+from flask import Flask, jsonify, send_file, request, g, Response, stream_with_context
 from flask_cors import CORS, cross_origin
 from shared.extensions import socketio
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from shared.logger import logger
-from tests.CTXtest import run_ctx_test  # Add this import
+from shared.config import (
+    TEST_WORKERS, REPORT_WORKERS, REPORT_RENDERING, REPORT_CACHE_MB, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_POLL_INTERVAL,
+    BROWSER_POOL_ENABLED, BROWSER_POOL_SIZE, BROWSER_MAX_USES, PROGRESS_FLUSH_MS,
+    MAINTENANCE_INTERVAL_MINUTES, MAINTENANCE_DRY_RUN
+)
+from shared.browser_pool import BrowserPool
+from shared.executor import ExecutionPool, JobCancelled, check_cancelled, job_cancelled
+from shared.job_queue import JobQueue
+from shared.mongo import DatabaseProxy, GridFSProxy, get_client
+from shared.progress_writer import ProgressWriter
+from shared.report_cache import ReportCache
+from shared.report_template import (
+    INFO_TABLE_STYLE, SUMMARY_TABLE_STYLES, STATS_TABLE_STYLE, SUCCESS_STATUSES, ERROR_STATUSES,
+    header_flowables, section_title, step_flowables, footer_flowables
+)
+from shared.gridfs_stream import send_gridfs_file
+from shared.campaigns import expand_campaign_targets, id_part, refresh_campaign
+from shared.campaign_report import (
+    CAMPAIGN_REPORT_FORMATS, campaign_report_json, campaign_report_html, write_campaign_pdf
+)
+from shared.scenario import ScenarioError
+from shared.tracing import step_latency_stats
+from shared.rapport_listing import DEFAULT_PAGE_SIZE, parse_date, rapport_filters, rapport_stats, list_rapports_page
+from shared.indexes import apply_indexes
+from shared.maintenance import MaintenanceScheduler, run_cleanup
+from shared.metrics import (
+    registry, TESTS_TOTAL, TEST_DURATION, STEP_DURATION, PDF_BUILD,
+    GRIDFS_WRITE_BYTES, HTTP_REQUESTS
+)
+from shared.wait_utils import WaitRecorder
+from tests.CTXtest import run_ctx_test, scenario_store  # Add this import
 from events.socket_handlers import register_socket_handlers
 from bson import ObjectId
 from gridfs.errors import NoFile
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, cm
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
-from reportlab.graphics.shapes import Drawing, Rect, Line
-from reportlab.graphics.charts.piecharts import Pie
-from reportlab.graphics import renderPDF
-from datetime import datetime
-import io
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Spacer, Table
+from reportlab.lib.units import cm
 
 import time
 import io
-from datetime import datetime
-from pymongo import MongoClient
-import gridfs
+from datetime import datetime, timedelta
 import subprocess
-import os
-import threading
-
-# En haut de votre fichier
-
-_test_lock = threading.Lock()
-
-_test_running = False
+import tempfile
 
 app = Flask(__name__)
 socketio.init_app(
@@ -66,31 +75,73 @@ def after_request(response):
     return response
 
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        # La route (et non l'URL) limite le nombre de séries
+        endpoint = request.url_rule.rule if request.url_rule else 'inconnue'
+        HTTP_REQUESTS.observe(time.perf_counter() - started, method=request.method, endpoint=endpoint, status=response.status_code)
+    return response
+
+
 
 # --- MongoDB config ---
-mongo_client = MongoClient("mongodb://10.110.6.139:27017/")
-db_test = mongo_client["TestIkos"]    # Base de données pour les tests et rapports
-fs = gridfs.GridFS(db_test)           # GridFS pointé vers TestIkos
+# Client partagé (shared/mongo.py) : base et GridFS sont résolus à chaque
+# utilisation sur le client du processus courant, jamais à l'import
+db_test = DatabaseProxy()             # Base de données pour les tests et rapports
+fs = GridFSProxy()                    # GridFS de la base des tests
+
+# Version du gabarit PDF : à incrémenter à chaque modification de la mise en
+# forme pour invalider les rapports en cache
+REPORT_TEMPLATE_VERSION = 2
+report_cache = ReportCache(fs, db_test, REPORT_CACHE_MB * 1024 * 1024, version=REPORT_TEMPLATE_VERSION)
+
+# Progression des tests : mises à jour regroupées par test et écrites par lots
+progress_writer = ProgressWriter(db_test["rapport"], interval=PROGRESS_FLUSH_MS / 1000)
+
+# Rapport de la dernière application des index (voir shared/indexes.py)
+index_report = None
+
+
+def ensure_indexes(force=False, repair=False):
+    """Applique les index déclarés, une fois par processus"""
+    global index_report
+    if index_report is None or force or repair:
+        index_report = apply_indexes(db_test, repair=repair)
+    return index_report
+
 
 # Ajout d'une fonction de vérification de la connexion
 def check_mongodb_connection():
     try:
-        mongo_client.server_info()
+        get_client().server_info()
         logger.info("Connexion MongoDB établie avec succès")
         collections = db_test.list_collection_names()
-        logger.info(f"Collections dans TestIkos: {collections}")
+        logger.info(f"Collections dans {db_test.name}: {collections}")
         if "rapport" not in collections:
             db_test.create_collection("rapport")
             logger.info("Collection 'rapport' créée")
+        ensure_indexes()
         return True
     except Exception as e:
         logger.error(f"Erreur de connexion MongoDB: {str(e)}", exc_info=True)
         return False
 
-def update_test_progress(test_id, step_info=None, status=None, progress=None):
-    """Met à jour le progrès du test dans la base de données"""
+def update_test_progress(test_id, step_info=None, status=None, progress=None, fields=None, unset=None, flush=False):
+    """
+    Met à jour le progrès du test dans la base de données
+
+    Les mises à jour sont regroupées par progress_writer ; une nouvelle étape,
+    ou flush=True, déclenche l'écriture immédiate. Avec flush=True, une erreur
+    d'écriture est levée : l'état final d'un test ne doit pas être perdu.
+    """
     try:
-        rapport_collection = db_test["rapport"]
         update_data = {"last_update": datetime.now()}
         
         if status:
@@ -98,56 +149,57 @@ def update_test_progress(test_id, step_info=None, status=None, progress=None):
             
         if progress is not None:
             update_data["progress"] = progress
+
+        if fields:
+            update_data.update(fields)
             
-        if step_info:
-            # Ajouter l'étape à la liste des étapes
-            rapport_collection.update_one(
-                {"test_id": test_id},
-                {"$push": {"steps": step_info}, "$set": update_data}
-            )
-        else:
-            rapport_collection.update_one(
-                {"test_id": test_id},
-                {"$set": update_data}
-            )
+        progress_writer.update(
+            test_id,
+            set_fields=update_data,
+            push={"steps": step_info} if step_info else None,
+            unset=unset,
+            flush=flush
+        )
+        if step_info and not flush:
+            # Fin d'étape : écriture immédiate, reprise par le thread en cas d'échec
+            progress_writer.flush()
             
-        logger.info(f"Progression mise à jour pour {test_id}: {update_data}")
+        logger.debug(f"Progression mise à jour pour {test_id}: {status or ''} {progress if progress is not None else ''}")
         
     except Exception as e:
         logger.error(f"Erreur lors de la mise à jour du progrès: {str(e)}", exc_info=True)
+        if flush:
+            raise
+
+# Sessions navigateur pré-authentifiées partagées par les emplacements d'exécution
+browser_pool = BrowserPool(size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES) if BROWSER_POOL_ENABLED else None
+
 
-def execute_test_with_progress(test_id):
+def execute_test_with_progress(test_id, slot=0):
     """Exécute le test en mettant à jour la progression dans la BDD"""
-    global _test_running
-    
-    # Vérifier si un test est déjà en cours
-    with _test_lock:
-        if _test_running:
-            logger.warning(f"Test {test_id} annulé - un autre test est en cours")
-            rapport_collection = db_test["rapport"]
-            rapport_collection.update_one(
-                {"test_id": test_id},
-                {"$set": {
-                    "status": "error",
-                    "error": "Un autre test est déjà en cours d'exécution",
-                    "completed_at": datetime.now()
-                }}
-            )
-            return
-        
-        _test_running = True
-    
+    campaign_id = None
+    session = None
+    success = False
+    # Trace du test : étapes, attentes, recherches d'images et appels WebDriver
+    tracer = WaitRecorder()
     try:
         start_time = time.time()
-        logger.info(f"Démarrage du test {test_id}")
+        logger.info(f"Démarrage du test {test_id} sur l'emplacement {slot}")
         
-        # Extraire module et scénario du test_id
-        test_parts = test_id.split('_')
-        if len(test_parts) < 2:
-            raise ValueError("Format de test_id invalide")
+        # Module et scénario sont enregistrés à la création du test ; le
+        # découpage du test_id reste un repli pour les anciennes entrées
+        rapport = db_test["rapport"].find_one({"test_id": test_id}, {"module": 1, "scenario": 1, "campaign_id": 1}) or {}
+        campaign_id = rapport.get("campaign_id")
+        if rapport.get("module") and rapport.get("scenario"):
+            module = rapport["module"]
+            scenario = rapport["scenario"]
+        else:
+            test_parts = test_id.split('_')
+            if len(test_parts) < 2:
+                raise ValueError("Format de test_id invalide")
             
-        module = test_parts[0]
-        scenario = '_'.join(test_parts[1:-1])  # Exclure le timestamp final
+            module = test_parts[0]
+            scenario = '_'.join(test_parts[1:-1])  # Exclure le timestamp final
         
         # Mise à jour du statut initial
         update_test_progress(test_id, status="running", progress=0)
@@ -169,84 +221,255 @@ def execute_test_with_progress(test_id):
         )
         time.sleep(1)
         
-        # Exécution du test réel
+        # Exécution du test réel, dans une session du pool si disponible
         update_test_progress(test_id, status="running", progress=50)
-        steps_list = run_ctx_test(module, scenario)
+        if browser_pool:
+            with tracer.span("browser", "acquisition session"):
+                session = browser_pool.acquire()
+        steps_list = run_ctx_test(module, scenario, test_id=test_id, driver=session.driver if session else None, tracer=tracer)
+        # Bail perdu pendant le test : le résultat n'est pas écrit, le test
+        # appartient au worker qui l'a repris
+        check_cancelled()
         
         if not steps_list:
             raise Exception("Aucune étape de test n'a été exécutée")
         
-        # Mise à jour avec les vraies étapes
-        rapport_collection = db_test["rapport"]
-        rapport_collection.update_one(
-            {"test_id": test_id},
-            {"$set": {"steps": steps_list, "progress": 90}}
-        )
-        
-        # Génération du PDF - CORRECTION ICI
+        # Finalisation : le PDF est généré ensuite par le pool de rendu (ou
+        # au premier téléchargement), l'emplacement d'exécution est libéré sans l'attendre
         exec_time = time.time() - start_time
-        try:
-            pdf_id, pdf_filename = generate_pdf(steps_list, exec_time, module, scenario, test_id)
-        except Exception as pdf_error:
-            logger.error(f"Erreur lors de la génération du PDF: {pdf_error}")
-            pdf_id, pdf_filename = None, None
-        
-        # Finalisation
         success = all(step.get('status', '').lower() in ['succès', 'success', 'completed'] for step in steps_list)
         
+        # Étapes réelles et résultat écrits en une seule mise à jour
         update_data = {
-            "status": "completed" if success else "error",
-            "progress": 100,
+            "steps": steps_list,
             "execution_time": exec_time,
             "success": success,
             "completed_at": datetime.now(),
             "module": module,
-            "scenario": scenario
+            "scenario": scenario,
+            "trace": tracer.spans,
+            "trace_summary": tracer.summary(),
+            "trace_dropped": tracer.dropped,
+            "report_status": "on_demand" if REPORT_RENDERING == "lazy" else "pending"
         }
         
-        # Ajouter les infos PDF seulement si la génération a réussi
-        if pdf_id and pdf_filename:
-            update_data.update({
-                "pdf_id": pdf_id,
-                "filename": pdf_filename
-            })
-        
-        rapport_collection.update_one(
-            {"test_id": test_id},
-            {"$set": update_data}
+        update_test_progress(
+            test_id,
+            status="completed" if success else "error",
+            progress=100,
+            fields=update_data,
+            unset=["report_error"],
+            flush=True
         )
         
         logger.info(f"Test {test_id} terminé avec succès")
+        if REPORT_RENDERING != "lazy":
+            submit_report(test_id)
         
+    except JobCancelled:
+        progress_writer.discard(test_id)
+        raise
     except Exception as e:
         logger.error(f"Erreur pendant l'exécution du test: {str(e)}", exc_info=True)
-        update_test_progress(test_id, status="error", progress=0)
-        rapport_collection = db_test["rapport"]
+        update_test_progress(
+            test_id,
+            status="error",
+            progress=0,
+            fields={"error": str(e), "completed_at": datetime.now(), "trace": tracer.spans, "trace_summary": tracer.summary()},
+            flush=True
+        )
+    finally:
+        record_test_metrics(test_id, tracer, success)
+        if session:
+            # Une session ayant échoué est recyclée plutôt que réutilisée
+            browser_pool.release(session, failed=not success)
+        if campaign_id:
+            try:
+                refresh_campaign(db_test["campagne"], db_test["rapport"], campaign_id)
+            except Exception as e:
+                logger.error(f"Erreur lors de la mise à jour de la campagne {campaign_id}: {str(e)}")
+
+
+def submit_report(test_id):
+    """Place la génération du rapport PDF d'un test dans la file de rendu"""
+    try:
+        # Un test relancé réutilise son test_id : son ancien job de rendu est remis en file
+        report_executor.submit(test_id, requeue_finished=True)
+    except Exception as e:
+        logger.error(f"Impossible de mettre en file le rapport de {test_id}: {str(e)}", exc_info=True)
+        db_test["rapport"].update_one(
+            {"test_id": test_id},
+            {"$set": {"report_status": "error", "report_error": str(e)}}
+        )
+
+
+def render_test_report(test_id, slot=0):
+    """Génère le rapport PDF d'un test terminé (pool de rendu, hors emplacements de test)"""
+    rapport_collection = db_test["rapport"]
+    rapport = rapport_collection.find_one(
+        {"test_id": test_id},
+        {"steps": 1, "execution_time": 1, "module": 1, "scenario": 1}
+    )
+    if not rapport:
+        logger.warning(f"Rapport {test_id} introuvable, génération du PDF abandonnée")
+        return
+
+    rapport_collection.update_one({"test_id": test_id}, {"$set": {"report_status": "rendering"}})
+    socketio.emit('report_status', {"test_id": test_id, "report_status": "rendering"}, namespace='/')
+    try:
+        with PDF_BUILD.time(report="rapport"):
+            pdf_id, pdf_filename, metadata = generate_pdf(
+                rapport.get("steps") or [],
+                rapport.get("execution_time") or 0,
+                rapport.get("module") or "",
+                rapport.get("scenario") or "",
+                test_id
+            )
+    except Exception as e:
         rapport_collection.update_one(
             {"test_id": test_id},
-            {"$set": {"error": str(e), "completed_at": datetime.now()}}
+            {"$set": {"report_status": "error", "report_error": str(e), "report_completed_at": datetime.now()}}
         )
-    finally:
-        # Libérer le verrou
-        with _test_lock:
-            _test_running = False
+        socketio.emit('report_status', {"test_id": test_id, "report_status": "error", "error": str(e)}, namespace='/')
+        # Le job de rendu est marqué en échec par le pool
+        raise
+    if job_cancelled():
+        # Rendu repris par un autre worker : ce PDF ne sera pas référencé
+        fs.delete(ObjectId(pdf_id))
+        check_cancelled()
+
+    rapport_collection.update_one(
+        {"test_id": test_id},
+        {"$set": {
+            "pdf_id": pdf_id,
+            "filename": pdf_filename,
+            "steps_count": metadata["steps_count"],
+            "success_rate": metadata["success_rate"],
+            "stats": metadata["stats"],
+            "report_status": "ready",
+            "report_completed_at": datetime.now()
+        }}
+    )
+    socketio.emit('report_status', {
+        "test_id": test_id,
+        "report_status": "ready",
+        "pdf_id": pdf_id,
+        "filename": pdf_filename
+    }, namespace='/')
+    logger.info(f"Rapport PDF de {test_id} généré: {pdf_filename}")
+
+
+def handle_abandoned_report(test_id, requeued):
+    """Met à jour le statut du rapport dont le worker de rendu a été interrompu"""
+    if requeued:
+        logger.warning(f"Rendu du rapport {test_id} interrompu, remis en file")
+        update = {"report_status": "pending"}
+    else:
+        logger.error(f"Rendu du rapport {test_id} interrompu trop de fois, marqué en erreur")
+        update = {"report_status": "error", "report_error": "Génération interrompue (redémarrage du serveur)"}
+    db_test["rapport"].update_one({"test_id": test_id}, {"$set": update})
+
+
+def record_test_metrics(test_id, tracer, success):
+    """Alimente les métriques /metrics à partir de la trace d'un test terminé"""
+    try:
+        module = db_test["rapport"].find_one({"test_id": test_id}, {"module": 1}) or {}
+        module = module.get("module") or "inconnu"
+        TESTS_TOTAL.inc(module=module, status="completed" if success else "error")
+        steps = tracer.of_kind("step")
+        if steps:
+            TEST_DURATION.observe(steps[-1]["end"] - steps[0]["start"], module=module)
+        for span in steps:
+            STEP_DURATION.observe(span["duration"], module=module, step=span["name"])
+    except Exception as e:
+        logger.error(f"Erreur lors de la mise à jour des métriques du test {test_id}: {str(e)}")
+
+
+def handle_abandoned_test(test_id, requeued):
+    """Met à jour le rapport d'un test dont le worker a été interrompu"""
+    rapport_collection = db_test["rapport"]
+    if requeued:
+        logger.warning(f"Test {test_id} interrompu, remis en file")
+        rapport_collection.update_one(
+            {"test_id": test_id},
+            {"$set": {"status": "pending", "progress": 0, "steps": [], "last_update": datetime.now()}}
+        )
+    else:
+        logger.error(f"Test {test_id} interrompu trop de fois, marqué en erreur")
+        rapport_collection.update_one(
+            {"test_id": test_id},
+            {"$set": {
+                "status": "error",
+                "error": "Exécution interrompue (redémarrage du serveur)",
+                "completed_at": datetime.now()
+            }}
+        )
+
+
+# Pool d'exécution : les tests soumis sont placés dans une file persistante
+# (collection test_jobs) au lieu d'être rejetés
+test_queue = JobQueue(db_test["test_jobs"], lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS)
+test_executor = ExecutionPool(
+    execute_test_with_progress,
+    test_queue,
+    slots=TEST_WORKERS,
+    poll_interval=JOB_POLL_INTERVAL,
+    on_abandoned=handle_abandoned_test,
+    on_start=browser_pool.warm_up if browser_pool else None
+)
+
+# Pool de rendu des rapports PDF : file séparée (collection report_jobs) pour
+# qu'une génération lente n'occupe jamais un emplacement d'exécution
+report_queue = JobQueue(db_test["report_jobs"], lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS)
+report_executor = ExecutionPool(
+    render_test_report,
+    report_queue,
+    slots=REPORT_WORKERS,
+    name="reports",
+    poll_interval=JOB_POLL_INTERVAL,
+    on_abandoned=handle_abandoned_report
+)
+
+
+# Nettoyage planifié des doublons et des entrées sans scénario, hors des tests
+cleanup_scheduler = MaintenanceScheduler(
+    lambda: run_cleanup(db_test, dry_run=MAINTENANCE_DRY_RUN),
+    db_test["maintenance_locks"],
+    name="cleanup",
+    interval_seconds=MAINTENANCE_INTERVAL_MINUTES * 60
+)
+
+
+@app.before_request
+def ensure_workers_started():
+    # Sous gunicorn le bloc __main__ n'est pas exécuté : les workers démarrent
+    # à la première requête pour reprendre les jobs en attente
+    test_executor.start()
+    report_executor.start()
+    cleanup_scheduler.start()
+
+
+def new_rapport_entry(test_id, module_id, scenario_id, campaign_id=None):
+    """Construit le document rapport initial d'un test en attente"""
+    entry = {
+        "test_id": test_id,
+        "status": "pending",
+        "progress": 0,
+        "date_creation": datetime.now(),
+        "steps": [],
+        "module": module_id,
+        "scenario": scenario_id
+    }
+    if campaign_id:
+        entry["campaign_id"] = campaign_id
+    return entry
 
 
 # 3. Amélioration de l'endpoint start-test pour éviter les doublons
 @app.route('/api/start-test', methods=['POST', 'OPTIONS'])
 @cross_origin()
 def start_test():
-    """Démarre un nouveau test"""
-    global _test_running
-    
-    # Vérifier si un test est déjà en cours
-    with _test_lock:
-        if _test_running:
-            return jsonify({
-                "error": "Un test est déjà en cours d'exécution", 
-                "status": "busy"
-            }), 409  # Conflict
-    
+    """Démarre un nouveau test (mis en file si tous les emplacements sont occupés)"""
     try:
         data = request.get_json()
         module_id = data.get('moduleId')
@@ -255,8 +478,8 @@ def start_test():
         if not module_id or not scenario_id:
             return jsonify({"error": "moduleId et scenarioId requis"}), 400
             
-        # Générer un ID unique pour ce test
-        test_id = f"{module_id}_{scenario_id}_{int(time.time())}"
+        # Générer un ID unique pour ce test ; le titre brut reste dans "scenario"
+        test_id = f"{id_part(module_id)}_{id_part(scenario_id)}_{int(time.time())}"
         
         # Vérifier si ce test_id existe déjà
         rapport_collection = db_test["rapport"]
@@ -269,27 +492,16 @@ def start_test():
             }), 409
         
         # Créer l'entrée initiale dans la base
-        initial_data = {
-            "test_id": test_id,
-            "status": "pending",
-            "progress": 0,
-            "date_creation": datetime.now(),
-            "steps": [],
-            "module": module_id,
-            "scenario": scenario_id
-        }
+        rapport_collection.insert_one(new_rapport_entry(test_id, module_id, scenario_id))
         
-        rapport_collection.insert_one(initial_data)
-        
-        # Lancer le test en arrière-plan
-        thread = threading.Thread(target=execute_test_with_progress, args=(test_id,))
-        thread.daemon = True
-        thread.start()
+        # Placer le test dans la file du pool d'exécution
+        position = test_executor.submit(test_id)
         
         return jsonify({
             "test_id": test_id,
             "status": "pending",
-            "message": "Test démarré avec succès"
+            "queue_position": position,
+            "message": "Test mis en file d'exécution"
         })
         
     except Exception as e:
@@ -308,15 +520,16 @@ def get_test_results(test_id):
         logger.info(f"Requête reçue pour test_id: {test_id}")
         rapport_collection = db_test["rapport"]
         
-        # Recherche par test_id (pas par _id ObjectId)
-        result = rapport_collection.find_one({"test_id": test_id})
+        # Recherche par test_id (pas par _id ObjectId) ; la trace détaillée
+        # est servie séparément (/api/test-trace) pour alléger le suivi
+        result = rapport_collection.find_one({"test_id": test_id}, {"trace": 0})
         
         if not result:
             logger.warning(f"Test non trouvé pour test_id: {test_id}")
             # Essayer aussi de chercher par ObjectId au cas où
             try:
                 from bson import ObjectId
-                result = rapport_collection.find_one({"_id": ObjectId(test_id)})
+                result = rapport_collection.find_one({"_id": ObjectId(test_id)}, {"trace": 0})
             except:
                 pass
             
@@ -339,6 +552,12 @@ def get_test_results(test_id):
         
         # Ajouter l'objectId à la réponse
         result['objectId'] = object_id
+        if result.get('status') == 'pending':
+            result['queue_position'] = test_executor.queue_position(result.get('test_id'))
+        if result.get('report_status') == 'pending':
+            result['report_queue_position'] = report_executor.queue_position(result.get('test_id'))
+        if result.get('report_completed_at'):
+            result['report_completed_at'] = result['report_completed_at'].isoformat()
         
         logger.info(f"Données retournées pour {test_id} avec objectId: {object_id}")
         return jsonify(result)
@@ -348,19 +567,371 @@ def get_test_results(test_id):
         return jsonify({"error": str(e)}), 500
     
 
+@app.route('/api/executor/status', methods=['GET'])
+@cross_origin()
+def get_executor_status():
+    """Retourne l'occupation des emplacements d'exécution et la profondeur de la file"""
+    status = test_executor.status()
+    status["reports"] = report_executor.status()
+    if browser_pool:
+        status["browsers"] = browser_pool.status()
+    return jsonify(status)
+
+
+def serialize_campaign(campaign):
+    """Convertit un document campagne pour la réponse JSON"""
+    campaign['_id'] = str(campaign['_id'])
+    for field in ('date_creation', 'completed_at', 'last_update'):
+        if hasattr(campaign.get(field), 'isoformat'):
+            campaign[field] = campaign[field].isoformat()
+    return campaign
+
+
+@app.route('/api/campaigns', methods=['POST', 'OPTIONS'])
+@cross_origin()
+def start_campaign():
+    """Lance tous les scénarios d'un ou plusieurs modules (ou d'une feuille du cahier de recette)"""
+    try:
+        data = request.get_json() or {}
+        module_ids = data.get('modules') or ([data['moduleId']] if data.get('moduleId') else [])
+        sheet = data.get('sheet')
+        
+        if not module_ids and not sheet:
+            return jsonify({"error": "moduleId, modules ou sheet requis"}), 400
+        
+        targets = expand_campaign_targets(db_test["TestsModels"], module_ids=module_ids, sheet=sheet)
+        if not targets:
+            return jsonify({"error": "Aucun scénario trouvé pour cette campagne"}), 404
+        
+        timestamp = int(time.time())
+        campaign_id = f"campagne_{id_part(sheet or '-'.join(module_ids))}_{timestamp}"
+        
+        # Un test_id par scénario ; l'index garantit l'unicité quand un même
+        # scénario apparaît plusieurs fois dans la même seconde. Les identifiants
+        # sont utilisés dans les URL et noms de fichiers : les titres libres y
+        # sont normalisés, le titre brut reste dans le champ "scenario"
+        entries = [
+            new_rapport_entry(f"{id_part(module)}_{id_part(scenario)}_{timestamp}_{index}", module, scenario, campaign_id)
+            for index, (module, scenario) in enumerate(targets)
+        ]
+        test_ids = [entry["test_id"] for entry in entries]
+        
+        db_test["campagne"].insert_one({
+            "campaign_id": campaign_id,
+            "modules": sorted({module for module, _ in targets}),
+            "sheet": sheet,
+            "status": "pending",
+            "date_creation": datetime.now(),
+            "test_ids": test_ids,
+            "total": len(test_ids)
+        })
+        db_test["rapport"].insert_many(entries)
+        test_executor.submit_many(test_ids)
+        
+        logger.info(f"Campagne {campaign_id} lancée avec {len(test_ids)} scénario(s)")
+        return jsonify({
+            "campaign_id": campaign_id,
+            "status": "pending",
+            "total": len(test_ids),
+            "test_ids": test_ids
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur lors du lancement de la campagne: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/campaigns', methods=['GET'])
+@cross_origin()
+def list_campaigns():
+    """Liste les campagnes (sans la liste des tests)"""
+    try:
+        campaigns = db_test["campagne"].find({}, {"test_ids": 0}).sort("date_creation", -1)
+        return jsonify({"campaigns": [serialize_campaign(c) for c in campaigns]})
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération des campagnes: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/campaigns/<campaign_id>', methods=['GET'])
+@cross_origin()
+def get_campaign(campaign_id):
+    """Retourne la progression agrégée et le résultat consolidé d'une campagne"""
+    try:
+        if not db_test["campagne"].find_one({"campaign_id": campaign_id}, {"_id": 1}):
+            return jsonify({"error": "Campagne non trouvée"}), 404
+        
+        refresh_campaign(db_test["campagne"], db_test["rapport"], campaign_id)
+        campaign = db_test["campagne"].find_one({"campaign_id": campaign_id})
+        
+        # Détail par test, sans les étapes
+        tests = db_test["rapport"].find(
+            {"campaign_id": campaign_id},
+            {"_id": 0, "test_id": 1, "module": 1, "scenario": 1, "status": 1, "success": 1, "progress": 1, "pdf_id": 1}
+        )
+        campaign = serialize_campaign(campaign)
+        campaign["tests"] = list(tests)
+        return jsonify(campaign)
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération de la campagne: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+# Rapport consolidé d'une campagne, lu par curseur et produit en un seul passage
+@app.route('/api/campaigns/<campaign_id>/report', methods=['GET'])
+@cross_origin()
+def get_campaign_report(campaign_id):
+    report_format = request.args.get('format', 'pdf').lower()
+    if report_format not in CAMPAIGN_REPORT_FORMATS:
+        return jsonify({"error": f"Format non supporté (attendu: {', '.join(CAMPAIGN_REPORT_FORMATS)})"}), 400
+    try:
+        campaign = db_test["campagne"].find_one({"campaign_id": campaign_id}, {"test_ids": 0})
+        if not campaign:
+            return jsonify({"error": "Campagne non trouvée"}), 404
+        
+        if report_format == 'json':
+            return Response(
+                stream_with_context(campaign_report_json(db_test["rapport"], campaign)),
+                content_type='application/json; charset=utf-8'
+            )
+        if report_format == 'html':
+            return Response(
+                stream_with_context(campaign_report_html(db_test["rapport"], campaign)),
+                content_type='text/html; charset=utf-8'
+            )
+        
+        # Le PDF n'est lisible qu'une fois terminé : il est écrit dans un fichier
+        # temporaire (en mémoire tant qu'il reste petit) puis envoyé
+        output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        with PDF_BUILD.time(report="campagne"):
+            write_campaign_pdf(db_test["rapport"], campaign, output)
+        output.seek(0)
+        return send_file(
+            output,
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=f"rapport_{campaign_id}.pdf"
+        )
+    except Exception as e:
+        logger.error(f"Erreur lors de la génération du rapport de campagne: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/test-trace/<test_id>', methods=['GET'])
+@cross_origin()
+def get_test_trace(test_id):
+    """Retourne la trace détaillée d'un test (segments horodatés et cumul par type)"""
+    try:
+        result = db_test["rapport"].find_one(
+            {"test_id": test_id},
+            {"_id": 0, "test_id": 1, "module": 1, "scenario": 1, "trace": 1, "trace_summary": 1, "trace_dropped": 1,
+             "steps.description": 1, "steps.started_at": 1, "steps.ended_at": 1, "steps.duration": 1}
+        )
+        if not result:
+            return jsonify({"error": "Test non trouvé"}), 404
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération de la trace: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+def _pool_gauges(executor):
+    status = executor.status()
+    return {
+        ("queued",): status["queue_depth"],
+        ("running",): status["running_total"],
+        ("busy_slots",): status["busy_slots"],
+        ("free_slots",): status["free_slots"]
+    }
+
+
+def _browser_gauges():
+    if not browser_pool:
+        return {}
+    status = browser_pool.status()
+    return {("idle",): status["idle"], ("in_use",): status["in_use"]}
+
+
+registry.gauge("ikos_executor", "File de tests et emplacements d'exécution", ("state",), callback=lambda: _pool_gauges(test_executor))
+registry.gauge("ikos_report_renderer", "File de rendu des rapports PDF", ("state",), callback=lambda: _pool_gauges(report_executor))
+registry.gauge("ikos_browser_sessions", "Sessions du pool de navigateurs", ("state",), callback=_browser_gauges)
+
+
+@app.route('/api/maintenance/indexes', methods=['GET', 'POST'])
+@cross_origin()
+def index_status():
+    """État des index déclarés ; POST (repair=1) recrée ceux dont les options diffèrent"""
+    try:
+        if request.method == 'POST':
+            return jsonify(ensure_indexes(force=True, repair=request.args.get('repair') == '1'))
+        return jsonify(ensure_indexes())
+    except Exception as e:
+        logger.error(f"Erreur lors de l'application des index: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/maintenance/cleanup', methods=['GET', 'POST'])
+@cross_origin()
+def cleanup_status():
+    """Dernier nettoyage planifié ; POST lance un nettoyage (dry_run=1 : comptage seul)"""
+    try:
+        if request.method == 'POST':
+            return jsonify(run_cleanup(db_test, dry_run=request.args.get('dry_run') == '1'))
+        return jsonify({
+            "interval_minutes": MAINTENANCE_INTERVAL_MINUTES,
+            "dry_run": MAINTENANCE_DRY_RUN,
+            "last_report": cleanup_scheduler.last_report
+        })
+    except Exception as e:
+        logger.error(f"Erreur lors du nettoyage de la base: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métriques au format texte Prometheus"""
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/api/metrics/steps', methods=['GET'])
+@cross_origin()
+def get_step_metrics():
+    """Durées p50/p95 et histogramme par module et par étape (tests récents)"""
+    try:
+        module = request.args.get('module')
+        days = request.args.get('days', type=int)
+        limit = min(request.args.get('limit', 500, type=int), 5000)
+        since = datetime.now() - timedelta(days=days) if days else None
+        return jsonify({"steps": step_latency_stats(db_test["rapport"], module=module, since=since, limit=limit)})
+    except Exception as e:
+        logger.error(f"Erreur lors du calcul des durées d'étapes: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/scenarios', methods=['GET'])
+@cross_origin()
+def list_scenarios():
+    """Liste les scénarios déclaratifs enregistrés (sans leurs étapes)"""
+    try:
+        scenarios = []
+        for document in scenario_store.collection.find({}, {"_id": 0}).sort([("module", 1), ("scenario", 1)]):
+            scenarios.append({
+                "module": document.get("module"),
+                "scenario": document.get("scenario"),
+                "steps": len(document.get("steps") or []),
+                "digest": document.get("digest"),
+                "updated_at": document["updated_at"].isoformat() if hasattr(document.get("updated_at"), "isoformat") else None
+            })
+        return jsonify({"scenarios": scenarios})
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération des scénarios: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/scenarios/<module>/<path:scenario>', methods=['GET'])
+@cross_origin()
+def get_scenario(module, scenario):
+    """Retourne la définition d'un scénario (ou celle du module, scenario = "*")"""
+    try:
+        document = scenario_store.find(module, scenario)
+        if not document:
+            return jsonify({"error": "Scénario non trouvé"}), 404
+        if hasattr(document.get("updated_at"), "isoformat"):
+            document["updated_at"] = document["updated_at"].isoformat()
+        return jsonify(document)
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération du scénario: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/scenarios', methods=['PUT', 'OPTIONS'])
+@cross_origin()
+def save_scenario():
+    """Valide et enregistre un scénario (JSON, ou YAML envoyé en texte)"""
+    try:
+        source = request.get_json(silent=True)
+        if source is None:
+            source = request.get_data(as_text=True)
+        plan = scenario_store.save(source)
+        logger.info(f"Scénario {plan.module} / {plan.scenario} enregistré ({len(plan.steps)} étape(s))")
+        return jsonify({
+            "module": plan.module,
+            "scenario": plan.scenario,
+            "steps": [step.description for step in plan.steps],
+            "digest": plan.digest
+        })
+    except ScenarioError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erreur lors de l'enregistrement du scénario: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+def rapport_query(args):
+    """Filtre de la liste des rapports à partir des paramètres de la requête"""
+    success = args.get('success')
+    return rapport_filters(
+        module=args.get('module'),
+        scenario=args.get('scenario'),
+        status=args.get('status'),
+        success=None if success is None else success.lower() in ('1', 'true', 'oui'),
+        since=parse_date(args['since'], 'since') if args.get('since') else None,
+        until=parse_date(args['until'], 'until') if args.get('until') else None,
+        search=args.get('search')
+    )
+
+
 @app.route('/api/rapport', methods=['GET'])
 def list_rapports():
+    """
+    Liste paginée des rapports, du plus récent au plus ancien (order=asc pour l'inverse)
+
+    Paramètres : module, scenario, status (liste séparée par des virgules),
+    success (true/false), since/until (dates ISO), search (module, scénario
+    ou test_id), view (summary/full), limit, cursor (valeur next_cursor de
+    la page précédente)
+    """
     try:
-        rapport_collection = db_test["rapport"]
-        rapports = list(rapport_collection.find())
+        args = request.args
+        query = rapport_query(args)
+        rapports, next_cursor = list_rapports_page(
+            db_test["rapport"],
+            query,
+            view=args.get('view', 'summary'),
+            limit=args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+            cursor=args.get('cursor'),
+            descending=args.get('order', 'desc').lower() != 'asc'
+        )
         for r in rapports:
             r['_id'] = str(r['_id'])
-            if 'date_creation' in r and hasattr(r['date_creation'], 'isoformat'):
-                r['date_creation'] = r['date_creation'].isoformat()
-        return jsonify({"rapports": rapports})
+            for field in ('date_creation', 'completed_at', 'last_update', 'report_completed_at'):
+                if hasattr(r.get(field), 'isoformat'):
+                    r[field] = r[field].isoformat()
+        return jsonify({"rapports": rapports, "count": len(rapports), "next_cursor": next_cursor})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des rapports: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/rapport/stats', methods=['GET'])
+def get_rapport_stats():
+    """
+    Totaux de la liste des rapports (mêmes filtres que /api/rapport) et
+    modules disponibles pour le filtre
+    """
+    try:
+        collection = db_test["rapport"]
+        stats = rapport_stats(collection, rapport_query(request.args))
+        stats["modules"] = sorted(m for m in collection.distinct("module") if m)
+        return jsonify(stats)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erreur lors du calcul des statistiques des rapports: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
     
 @app.route('/api/reports/<report_id>', methods=['GET'])
 def get_report_by_id(report_id):
@@ -407,12 +978,7 @@ def download_pdf(pdf_id):
     try:
         # Récupérer le fichier PDF depuis GridFS
         file_obj = fs.get(ObjectId(pdf_id))
-        return send_file(
-            io.BytesIO(file_obj.read()),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=file_obj.filename
-        )
+        return send_gridfs_file(file_obj, mimetype='application/pdf')
     except NoFile:
         logger.error(f"PDF non trouvé dans GridFS pour l'ID: {pdf_id}")
         return jsonify({"error": "PDF non trouvé"}), 404
@@ -420,6 +986,51 @@ def download_pdf(pdf_id):
         logger.error(f"Erreur lors du téléchargement du PDF: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+def cached_test_report(test_id, rapport):
+    """Retourne le rapport PDF d'un test depuis le cache GridFS, rendu au besoin"""
+    steps = rapport.get("steps") or []
+    execution_time = rapport.get("execution_time") or 0
+    module_name = rapport.get("module") or ""
+    scenario_name = rapport.get("scenario") or ""
+    key = report_cache.key(
+        steps, execution_time=execution_time, module=module_name, scenario=scenario_name, test_id=test_id
+    )
+
+    def render():
+        with PDF_BUILD.time(report="rapport"):
+            buffer, metadata = build_report_pdf(steps, execution_time, module_name, scenario_name, test_id)
+        return buffer.getvalue(), f"rapport_{test_id}.pdf", metadata
+
+    return report_cache.get_or_render(key, render)
+
+
+# Rapport d'un test : PDF déjà généré s'il existe, sinon rendu à la demande
+@app.route('/api/test-report/<test_id>/pdf', methods=['GET'])
+@cross_origin()
+def download_test_report(test_id):
+    try:
+        rapport = db_test["rapport"].find_one(
+            {"test_id": test_id},
+            {"pdf_id": 1, "steps": 1, "execution_time": 1, "module": 1, "scenario": 1, "status": 1}
+        )
+        if not rapport:
+            return jsonify({"error": "Test non trouvé"}), 404
+        if rapport.get("status") in ("pending", "running"):
+            return jsonify({"error": "Test en cours d'exécution"}), 409
+
+        file_obj = None
+        if rapport.get("pdf_id") and ObjectId.is_valid(str(rapport["pdf_id"])):
+            try:
+                file_obj = fs.get(ObjectId(str(rapport["pdf_id"])))
+            except NoFile:
+                logger.warning(f"PDF {rapport['pdf_id']} absent de GridFS, nouveau rendu pour {test_id}")
+        if file_obj is None:
+            file_obj = cached_test_report(test_id, rapport)
+        return send_gridfs_file(file_obj, mimetype='application/pdf')
+    except Exception as e:
+        logger.error(f"Erreur lors du téléchargement du rapport de {test_id}: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/download_pdf_by_filename/<filename>', methods=['GET'])
 def download_pdf_by_filename(filename):
     try:
@@ -428,16 +1039,27 @@ def download_pdf_by_filename(filename):
         if not file_obj:
             logger.error(f"PDF non trouvé dans GridFS pour le nom: {filename}")
             return jsonify({"error": "PDF non trouvé"}), 404
-        return send_file(
-            io.BytesIO(file_obj.read()),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=file_obj.filename
-        )
+        return send_gridfs_file(file_obj, mimetype='application/pdf')
     except Exception as e:
         logger.error(f"Erreur lors du téléchargement du PDF par nom: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+# Artefacts stockés dans GridFS (vidéos, captures...) : affichage en ligne,
+# avec lecture partielle (Range) pour les lecteurs vidéo
+@app.route('/api/artifacts/<file_id>', methods=['GET'])
+@cross_origin()
+def download_artifact(file_id):
+    if not ObjectId.is_valid(file_id):
+        return jsonify({"error": "Identifiant de fichier invalide"}), 400
+    try:
+        return send_gridfs_file(fs.get(ObjectId(file_id)), as_attachment=False)
+    except NoFile:
+        logger.error(f"Artefact non trouvé dans GridFS pour l'ID: {file_id}")
+        return jsonify({"error": "Fichier non trouvé"}), 404
+    except Exception as e:
+        logger.error(f"Erreur lors du téléchargement de l'artefact: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 def start_screen_recording(output_file="test_recording.mp4"):
     cmd = [
         "ffmpeg",
@@ -451,8 +1073,13 @@ def start_screen_recording(output_file="test_recording.mp4"):
     return subprocess.Popen(cmd)
 
 # --- PDF generation avec temps et étapes ---
-def generate_pdf(steps_list, execution_time, module_name="", scenario_name="", test_id=""):
-    """Génère un rapport PDF esthétique avec mise en forme optimisée"""
+def build_report_pdf(steps_list, execution_time, module_name="", scenario_name="", test_id=""):
+    """
+    Construit un rapport PDF esthétique avec mise en forme optimisée
+
+    Returns:
+        tuple: (buffer PDF, métadonnées du rapport)
+    """
     
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     buffer = io.BytesIO()
@@ -468,63 +1095,10 @@ def generate_pdf(steps_list, execution_time, module_name="", scenario_name="", t
         title="Rapport de Test auto"
     )
     
-    # Styles personnalisés optimisés
-    styles = getSampleStyleSheet()
-    
-    # Style pour le titre principal
-    styles.add(ParagraphStyle(
-        name='MainTitle',
-        fontSize=24,
-        spaceAfter=20,
-        spaceBefore=10,
-        textColor=colors.HexColor("#1a365d"),
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    ))
-    
-    # Style pour les sous-titres (SANS BACKGROUND pour éviter superposition)
-    styles.add(ParagraphStyle(
-        name='SectionTitle',
-        fontSize=14,
-        spaceAfter=10,
-        spaceBefore=15,
-        textColor=colors.HexColor("#2d3748"),
-        fontName='Helvetica-Bold',
-        leftIndent=0
-    ))
-    
-    # Style pour le titre des étapes
-    styles.add(ParagraphStyle(
-        name='StepTitle',
-        fontSize=12,
-        spaceAfter=5,
-        spaceBefore=10,
-        textColor=colors.HexColor("#2d3748"),
-        fontName='Helvetica-Bold'
-    ))
-    
-    # Style pour le contenu normal
-    styles.add(ParagraphStyle(
-        name='Content',
-        fontSize=10,
-        leading=14,
-        textColor=colors.HexColor("#4a5568"),
-        fontName='Helvetica'
-    ))
-    
-    # Style pour le pied de page
-    styles.add(ParagraphStyle(
-        name='Footer',
-        fontSize=9,
-        textColor=colors.HexColor("#718096"),
-        alignment=TA_CENTER,
-        fontName='Helvetica-Oblique'
-    ))
-
     # Calcul des statistiques
     total_steps = len(steps_list)
-    success_steps = sum(1 for step in steps_list if step.get('status', '').lower() in ['succès', 'success', 'completed'])
-    error_steps = sum(1 for step in steps_list if step.get('status', '').lower() in ['échec', 'error', 'failed', 'failure'])
+    success_steps = sum(1 for step in steps_list if step.get('status', '').lower() in SUCCESS_STATUSES)
+    error_steps = sum(1 for step in steps_list if step.get('status', '').lower() in ERROR_STATUSES)
     warning_steps = total_steps - success_steps - error_steps
     
     success_rate = (success_steps / total_steps * 100) if total_steps > 0 else 0
@@ -533,22 +1107,11 @@ def generate_pdf(steps_list, execution_time, module_name="", scenario_name="", t
     # Construction du contenu
     story = []
     
-    # Ligne décorative supérieure
-    line_drawing = Drawing(400, 15)
-    line_drawing.add(Line(0, 7, 400, 7, strokeColor=colors.HexColor("#4299e1"), strokeWidth=2))
-    story.append(line_drawing)
-
-    # Titre principal
-    story.append(Spacer(1, 10))  # Ajoute un espace avant le titre
-    story.append(Paragraph("RAPPORT D'AUTOMATISATION DE TEST", styles['MainTitle']))
-    story.append(Spacer(1, 10))  # Ajoute un espace après le titre
-
-    # Ligne décorative inférieure
-    story.append(line_drawing)
-    story.append(Spacer(1, 20))
+    # Bandeau de titre
+    story.extend(header_flowables())
     
     # Section informations générales
-    story.append(Paragraph("INFORMATIONS GÉNÉRALES", styles['SectionTitle']))
+    story.append(section_title("INFORMATIONS GÉNÉRALES"))
     
     # Tableau des informations générales avec style simplifié
     info_data = [
@@ -560,47 +1123,21 @@ def generate_pdf(steps_list, execution_time, module_name="", scenario_name="", t
         ['Nombre d\'étapes', str(total_steps)]
     ]
     
-    info_table = Table(info_data, colWidths=[4*cm, 8*cm])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor("#f8f9fa")),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor("#2d3748")),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#dee2e6")),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6)
-    ]))
+    info_table = Table(info_data, colWidths=[4*cm, 8*cm], style=INFO_TABLE_STYLE)
     
     story.append(info_table)
     story.append(Spacer(1, 20))
     
     # Section résumé
-    story.append(Paragraph("RÉSUMÉ EXÉCUTIF", styles['SectionTitle']))
+    story.append(section_title("RÉSUMÉ EXÉCUTIF"))
     
     # Résumé dans un tableau simple
     if all_success:
         summary_text = "SUCCÈS COMPLET - Tous les tests ont été exécutés avec succès"
-        summary_bg = colors.HexColor("#d4edda")
     else:
         summary_text = f"TESTS PARTIELS - {error_steps} échec(s) détecté(s) sur {total_steps} étapes"
-        summary_bg = colors.HexColor("#f8d7da")
     
-    summary_table = Table([[summary_text]], colWidths=[14*cm])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), summary_bg),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor("#2d3748")),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor("#adb5bd")),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10)
-    ]))
+    summary_table = Table([[summary_text]], colWidths=[14*cm], style=SUMMARY_TABLE_STYLES[all_success])
     
     story.append(summary_table)
     story.append(Spacer(1, 15))
@@ -613,123 +1150,50 @@ def generate_pdf(steps_list, execution_time, module_name="", scenario_name="", t
         ['Avertissements', str(warning_steps), f"{(warning_steps/total_steps*100):.1f}%" if total_steps > 0 else "0%"]
     ]
     
-    stats_table = Table(stats_data, colWidths=[4*cm, 3*cm, 3*cm])
-    stats_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#6c757d")),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor("#2d3748")),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#dee2e6")),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        # Alternance de couleurs pour les lignes
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#f8f9fa")])
-    ]))
+    stats_table = Table(stats_data, colWidths=[4*cm, 3*cm, 3*cm], style=STATS_TABLE_STYLE)
     
     story.append(stats_table)
     story.append(Spacer(1, 25))
     
     # Section détails des étapes avec espacement réduit
-    story.append(Paragraph("DÉTAIL DES ÉTAPES", styles['SectionTitle']))
-    
-    for i, step in enumerate(steps_list, 1):
-        status = step.get('status', 'inconnu').lower()
-        description = step.get('description', f'Étape {i}')
-        result = step.get('result', 'Aucun résultat disponible')
-        
-        # Déterminer la couleur selon le statut
-        if status in ['succès', 'success', 'completed']:
-            status_text = "SUCCÈS"
-            status_color = colors.HexColor("#28a745")
-        elif status in ['échec', 'error', 'failed', 'failure']:
-            status_text = "ÉCHEC" 
-            status_color = colors.HexColor("#dc3545")
-        else:
-            status_text = "AVERTISSEMENT"
-            status_color = colors.HexColor("#ffc107")
-        
-        # Titre de l'étape (SANS ESPACE EXCESSIF)
-        story.append(Paragraph(f"ÉTAPE {i}", styles['StepTitle']))
-        
-        # Contenu de l'étape dans un tableau compact
-        step_data = [
-            ['Description', description],
-            ['Statut', status_text],
-            ['Résultat', result]
-        ]
-        
-        step_table = Table(step_data, colWidths=[3*cm, 10*cm])
-        step_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor("#f8f9fa")),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor("#2d3748")),
-            ('TEXTCOLOR', (1, 1), (1, 1), status_color),  # Couleur du statut
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTNAME', (1, 1), (1, 1), 'Helvetica-Bold'),  # Statut en gras
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#dee2e6")),
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4)
-        ]))
-        
-        story.append(step_table)
-        
-        # ESPACEMENT RÉDUIT entre les étapes
-        if i < len(steps_list):
-            story.append(Spacer(1, 8))  # Réduit de 15 à 8
-        
-        # Ajouter la capture d'écran si elle existe
-        screenshot_path = step.get('screenshot')
-        if screenshot_path and os.path.exists(screenshot_path):
-            try:
-                story.append(Spacer(1, 4))
-                story.append(Paragraph("Capture d'écran :", styles['Content']))
-                story.append(Image(screenshot_path, width=10*cm, height=6*cm))
-                story.append(Spacer(1, 8))
-            except Exception as img_err:
-                story.append(Paragraph(f"Erreur lors de l'ajout de la capture : {img_err}", styles['Content']))
+    story.append(section_title("DÉTAIL DES ÉTAPES"))
+    story.extend(step_flowables(steps_list))
     
     # Pied de page
-    story.append(Spacer(1, 25))
-    story.append(Paragraph("─" * 60, styles['Footer']))
-    story.append(Spacer(1, 5))
-    story.append(Paragraph(f"Document généré automatiquement le {timestamp}", styles['Footer']))
-    story.append(Paragraph("Système d'automatisation de tests", styles['Footer']))
+    story.extend(footer_flowables(timestamp))
     
     # Construction du PDF
     doc.build(story)
     buffer.seek(0)
     
+    metadata = {
+        "date_creation": datetime.now(),
+        "execution_time": execution_time,
+        "success": all_success,
+        "steps_count": total_steps,
+        "success_rate": success_rate,
+        "module": module_name,
+        "scenario": scenario_name,
+        "test_id": test_id,
+        "stats": {
+            "success": success_steps,
+            "error": error_steps,
+            "warning": warning_steps
+        }
+    }
+    return buffer, metadata
+
+
+def generate_pdf(steps_list, execution_time, module_name="", scenario_name="", test_id=""):
+    """Génère le rapport PDF d'un test et le stocke dans GridFS"""
+    buffer, metadata = build_report_pdf(steps_list, execution_time, module_name, scenario_name, test_id)
+    
     try:
         # Reste du code MongoDB identique...
         if not check_mongodb_connection():
             raise Exception("Impossible de se connecter à MongoDB")
         
         pdf_filename = f"rapport_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        metadata = {
-            "date_creation": datetime.now(),
-            "execution_time": execution_time,
-            "success": all_success,
-            "steps_count": total_steps,
-            "success_rate": success_rate,
-            "module": module_name,
-            "scenario": scenario_name,
-            "test_id": test_id,
-            "stats": {
-                "success": success_steps,
-                "error": error_steps,
-                "warning": warning_steps
-            }
-        }
-        
         logger.info(f"Stockage du PDF '{pdf_filename}' dans GridFS...")
         pdf_id = fs.put(
             buffer, 
@@ -737,29 +1201,11 @@ def generate_pdf(steps_list, execution_time, module_name="", scenario_name="", t
             metadata=metadata,
             content_type="application/pdf"
         )
+        GRIDFS_WRITE_BYTES.inc(buffer.getbuffer().nbytes)
         logger.info(f"PDF stocké avec succès. ID: {pdf_id}")
         
-        rapport_collection = db_test["rapport"]
-        rapport_info = {
-            "test_id": test_id,
-            "pdf_id": str(pdf_id),
-            "filename": pdf_filename,
-            "date_creation": metadata["date_creation"],
-            "execution_time": metadata["execution_time"],
-            "success": metadata["success"],
-            "steps_count": metadata["steps_count"],
-            "success_rate": metadata["success_rate"],
-            "module": module_name,
-            "scenario": scenario_name,
-            "status": "completed",
-            "stats": metadata["stats"],
-            "steps": steps_list
-        }
-        
-        result = rapport_collection.insert_one(rapport_info)
-        logger.info(f"Rapport sauvegardé avec succès. ID: {result.inserted_id}")
-        
-        return str(pdf_id), pdf_filename
+        # Le document rapport est complété par render_test_report
+        return str(pdf_id), pdf_filename, metadata
         
     except Exception as e:
         logger.error(f"Erreur lors de la génération du rapport PDF: {str(e)}", exc_info=True)
@@ -776,6 +1222,9 @@ def run_test():
 # Ajouter la vérification de la connexion au démarrage
 if __name__ == '__main__':
     check_mongodb_connection()
+    test_executor.start()
+    report_executor.start()
+    cleanup_scheduler.start()
     socketio.run(
         app, 
         debug=False, 
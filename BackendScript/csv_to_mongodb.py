@@ -1,14 +1,14 @@
 import pandas as pd
-from pymongo import MongoClient
+from shared.config import MONGO_DB, MONGO_COLLECTION
+from shared.mongo import get_database
 from datetime import datetime
 import os
 from pathlib import Path
 
-def connect_mongodb(database_name="TestIkos", collection_name="TestsModels"):
+def connect_mongodb(database_name=MONGO_DB, collection_name=MONGO_COLLECTION):
     """Établit la connexion avec MongoDB"""
     try:
-        client = MongoClient('mongodb://10.110.6.139:27017/')
-        db = client[database_name]
+        db = get_database(database_name)
         collection = db[collection_name]
         return collection
     except Exception as e:
@@ -21,6 +21,11 @@ def clean_data(value):
         return ""
     return str(value).strip()
 
+def sheet_name(file_path):
+    """Nom de la feuille du cahier de recette (suffixe du nom de fichier exporté)"""
+    stem = Path(file_path).stem
+    return stem.split("non-regression_", 1)[-1]
+
 def csv_to_mongodb(csv_file_path):
     """Convert CSV to MongoDB documents"""
     try:
@@ -83,6 +88,8 @@ def csv_to_mongodb(csv_file_path):
                 # Ajouter des métadonnées
                 module_data["date_creation"] = datetime.now()
                 module_data["nombre_formations"] = len(module_data["formations"])
+                # Feuille d'origine, utilisée pour lancer une campagne sur toute la feuille
+                module_data["feuille"] = sheet_name(file_path)
                 
                 # Insérer ou mettre à jour le document
                 collection.update_one(
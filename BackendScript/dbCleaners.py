@@ -1,27 +1,34 @@
-from pymongo import MongoClient
+import argparse
 import logging
+from shared.maintenance import delete_entries_without_module as delete_without_module, run_cleanup
+from shared.mongo import get_database, close_client
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def delete_entries_without_module():
-    
-    client = MongoClient("mongodb://10.110.6.139:27017/")  
-    db = client["TestIkos"]
-    test_collection = db["rapport"]
+# Nettoyage ponctuel de la base ; l'application exécute le même nettoyage
+# périodiquement (MAINTENANCE_INTERVAL_MINUTES)
 
-    # Compter les enregistrements supprimés
-    count_deleted = 0
+def delete_entries_without_module(dry_run=False):
+    """Supprime (ou compte, en dry_run) les rapports sans scénario"""
+    deleted = delete_without_module(get_database()["rapport"], dry_run=dry_run)
+    logger.info(f"Supprimé {deleted} enregistrements sans module.")
 
-    # Suppression des enregistrements sans nom de module
-    result = test_collection.delete_many({"scenario": None})  # Supprime tous les documents où 'module' est None
-    count_deleted += result.deleted_count
+    # Déconnexion
+    close_client()
+    return deleted
 
-    logger.info(f"Supprimé {count_deleted} enregistrements sans module.")
+def run_maintenance_cleanup(dry_run=False):
+    """Nettoyage complet : entrées sans scénario et doublons de résultats de tests"""
+    report = run_cleanup(get_database(), dry_run=dry_run)
+    logger.info(f"Nettoyage terminé : {report}")
 
     # Déconnexion
-    client.close()
+    close_client()
+    return report
 
 if __name__ == "__main__":
-    delete_entries_without_module()
+    parser = argparse.ArgumentParser(description="Nettoyage des rapports et résultats de tests")
+    parser.add_argument("--dry-run", action="store_true", help="Compter les documents sans les supprimer")
+    run_maintenance_cleanup(dry_run=parser.parse_args().dry_run)
@@ -0,0 +1,163 @@
+import threading
+import time
+from datetime import datetime
+from shared.browser_utils import initialize_browser, login_ikos, open_home
+from shared.logger import logger
+
+
+class BrowserSession:
+    """Session navigateur gérée par le pool"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = datetime.now()
+        self.last_used = None
+
+
+class BrowserPool:
+    """
+    Pool de sessions navigateur pré-démarrées et pré-authentifiées.
+
+    Une session empruntée est vérifiée (health-check) puis rendue après le
+    test : elle est alors réinitialisée (frames, fenêtres, retour à l'accueil)
+    ou recyclée après `max_uses` utilisations ou en cas d'échec.
+    """
+
+    def __init__(self, size=1, max_uses=20, factory=initialize_browser, login=login_ikos):
+        self.size = max(1, int(size))
+        self.max_uses = max_uses
+        self.factory = factory
+        self.login = login
+        self._idle = []
+        self._total = 0
+        self._cond = threading.Condition()
+
+    def _create(self):
+        """Démarre un navigateur et l'authentifie"""
+        driver = self.factory()
+        try:
+            self.login(driver)
+        except Exception:
+            self._quit(driver)
+            raise
+        logger.info("Nouvelle session navigateur prête")
+        return BrowserSession(driver)
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.error(f"Erreur lors de la fermeture du navigateur: {str(e)}")
+
+    def _healthy(self, session):
+        try:
+            session.driver.execute_script("return document.readyState")
+            return len(session.driver.window_handles) > 0
+        except Exception:
+            return False
+
+    def _reset(self, session):
+        """Remet la session dans un état propre ; retourne False si elle doit être recyclée"""
+        driver = session.driver
+        try:
+            # Fermer les fenêtres ouvertes par le test
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            if not open_home(driver):
+                # Session expirée : on repart d'une authentification propre
+                driver.delete_all_cookies()
+                self.login(driver)
+            return True
+        except Exception as e:
+            logger.warning(f"Réinitialisation de la session navigateur impossible: {str(e)}")
+            return False
+
+    def warm_up(self):
+        """Pré-démarre les sessions en arrière-plan"""
+        def fill():
+            while True:
+                with self._cond:
+                    if self._total >= self.size:
+                        return
+                    self._total += 1
+                try:
+                    session = self._create()
+                except Exception as e:
+                    logger.error(f"Pré-démarrage d'une session navigateur impossible: {str(e)}")
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    return
+                with self._cond:
+                    self._idle.append(session)
+                    self._cond.notify()
+        threading.Thread(target=fill, name="browser-pool-warmup", daemon=True).start()
+
+    def acquire(self, timeout=None):
+        """
+        Emprunte une session authentifiée
+
+        Args:
+            timeout (float): Temps maximum d'attente d'une session libre (None = illimité)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._total >= self.size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("Aucune session navigateur disponible")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    session = self._idle.pop()
+                else:
+                    session = None
+                    self._total += 1
+
+            if session is None:
+                try:
+                    session = self._create()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._healthy(session):
+                logger.warning("Session navigateur défaillante, remplacement")
+                self._discard(session)
+                continue
+
+            session.uses += 1
+            session.last_used = datetime.now()
+            return session
+
+    def release(self, session, failed=False):
+        """Rend une session au pool, ou la recycle si nécessaire"""
+        if failed or session.uses >= self.max_uses or not self._reset(session):
+            reason = "échec du test" if failed else f"{session.uses} utilisation(s)"
+            logger.info(f"Recyclage de la session navigateur ({reason})")
+            self._discard(session)
+            self.warm_up()
+            return
+        with self._cond:
+            self._idle.append(session)
+            self._cond.notify()
+
+    def _discard(self, session):
+        self._quit(session.driver)
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def status(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "started": self._total,
+                "idle": len(self._idle),
+                "in_use": self._total - len(self._idle)
+            }
@@ -1,25 +1,130 @@
 from selenium import webdriver
-from selenium.webdriver.edge.service import Service
-from selenium.webdriver.edge.options import Options
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
 from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.common.by import By
+from shared.config import IKOS_URL, IKOS_USER, IKOS_PASSWORD, BROWSER, BROWSER_HEADLESS
+from shared.driver_cache import resolve_driver_path
+from shared.logger import logger
+from shared.wait_utils import wait_for_element, wait_for_frame, wait_until
 
+# Taille de fenêtre fixe en mode sans affichage (pas d'écran à maximiser)
+WINDOW_SIZE = (1920, 1080)
 
-def initialize_browser():
+
+def _start_edge(headless):
+    from selenium.webdriver.edge.service import Service
+    from selenium.webdriver.edge.options import Options
     edge_options = Options()
     edge_options.set_capability('ms:edgeChromium', True)
     edge_options.set_capability('ms:loggingPrefs', {'browser': 'ALL'})
     edge_options.page_load_strategy = 'normal'
+    if headless:
+        edge_options.add_argument('--headless=new')
+        edge_options.add_argument(f'--window-size={WINDOW_SIZE[0]},{WINDOW_SIZE[1]}')
+
+    service = Service(resolve_driver_path("edge"))
+    return webdriver.Edge(service=service, options=edge_options)
+
+
+def _start_chromium(headless):
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    chrome_options = Options()
+    chrome_options.page_load_strategy = 'normal'
+    # Options nécessaires dans les conteneurs (pas de sandbox, /dev/shm limité)
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    if headless:
+        chrome_options.add_argument('--headless=new')
+        chrome_options.add_argument(f'--window-size={WINDOW_SIZE[0]},{WINDOW_SIZE[1]}')
+
+    service = Service(resolve_driver_path("chromium"))
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+
+def _start_firefox(headless):
+    from selenium.webdriver.firefox.service import Service
+    from selenium.webdriver.firefox.options import Options
+    firefox_options = Options()
+    firefox_options.page_load_strategy = 'normal'
+    if headless:
+        firefox_options.add_argument('-headless')
+        firefox_options.add_argument(f'--width={WINDOW_SIZE[0]}')
+        firefox_options.add_argument(f'--height={WINDOW_SIZE[1]}')
+
+    service = Service(resolve_driver_path("firefox"))
+    return webdriver.Firefox(service=service, options=firefox_options)
+
+
+# Navigateurs disponibles, sélectionnés par la variable BROWSER
+BROWSER_BACKENDS = {
+    "edge": _start_edge,
+    "chromium": _start_chromium,
+    "firefox": _start_firefox
+}
+
+
+def initialize_browser(browser=None, headless=None):
+    """
+    Démarre un navigateur configuré pour les tests
+
+    Args:
+        browser (str): Navigateur (edge, chromium, firefox) ; BROWSER par défaut
+        headless (bool): Sans affichage ; BROWSER_HEADLESS par défaut
+    """
+    browser = (browser or BROWSER).lower()
+    headless = BROWSER_HEADLESS if headless is None else headless
+    if browser not in BROWSER_BACKENDS:
+        raise ValueError(f"Navigateur non supporté: {browser} (choix: {', '.join(BROWSER_BACKENDS)})")
 
-    service = Service(EdgeChromiumDriverManager().install())
-    driver = webdriver.Edge(service=service, options=edge_options)
+    logger.info(f"Démarrage du navigateur {browser}{' sans affichage' if headless else ''}")
+    driver = BROWSER_BACKENDS[browser](headless)
 
-    driver.maximize_window()
+    if not headless:
+        driver.maximize_window()
     driver.set_page_load_timeout(30)
     driver.implicitly_wait(10)
     return driver
 
 
+def login_ikos(driver, recorder=None):
+    """
+    Ouvre Ikos et se connecte avec le compte de test
+
+    Le driver reste positionné dans le frame de l'application (fappli).
+    """
+    driver.get(IKOS_URL)
+    if not wait_for_frame(driver, "fappli", timeout=10, recorder=recorder):
+        raise Exception("Le frame de l'application n'est pas disponible")
+    if not wait_for_element(driver, By.NAME, "userID", timeout=10, recorder=recorder):
+        raise Exception("Formulaire de connexion introuvable")
+    driver.find_element(By.NAME, "userID").send_keys(IKOS_USER)
+    driver.find_element(By.NAME, "userPWD").send_keys(IKOS_PASSWORD)
+    driver.find_element(By.NAME, "userPWD").send_keys(Keys.RETURN)
+
+
+def open_home(driver, recorder=None):
+    """
+    Revient à l'accueil d'Ikos dans une session existante
+
+    Returns:
+        bool: True si la session est toujours authentifiée
+    """
+    driver.switch_to.default_content()
+    driver.get(IKOS_URL)
+    if not wait_for_frame(driver, "fappli", timeout=10, recorder=recorder):
+        return False
+    wait_until(
+        lambda: driver.execute_script("return document.readyState") == "complete",
+        timeout=10, description="chargement de l'accueil", recorder=recorder
+    )
+    # Le formulaire de connexion réapparaît quand la session a expiré
+    previous = driver.timeouts.implicit_wait
+    driver.implicitly_wait(0)
+    try:
+        return not driver.find_elements(By.NAME, "userID")
+    finally:
+        driver.implicitly_wait(previous)
+
 
 def keyboard_shortcut(key):
     """
@@ -0,0 +1,260 @@
+import html
+import json
+from datetime import datetime
+from xml.sax.saxutils import escape
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from shared.campaigns import compute_campaign_progress
+from shared.report_template import (
+    STYLES, INFO_TABLE_STYLE, STATS_TABLE_STYLE, STEP_STATUS, status_kind, header_flowables, footer_flowables
+)
+
+# Rapport consolidé d'une campagne (PDF, HTML ou JSON) produit en un seul
+# passage : les documents rapport sont lus par curseur, par lots, et chaque
+# test est rendu puis libéré avant de lire le suivant.
+
+CAMPAIGN_REPORT_FORMATS = ("pdf", "html", "json")
+
+# Champs lus pour chaque test (ni trace ni captures)
+TEST_PROJECTION = {
+    "_id": 0, "test_id": 1, "module": 1, "scenario": 1, "status": 1, "success": 1,
+    "execution_time": 1, "completed_at": 1, "error": 1, "pdf_id": 1,
+    "steps.description": 1, "steps.status": 1, "steps.result": 1, "steps.duration": 1
+}
+
+CAMPAIGN_STEP_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#6c757d")),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor("#2d3748")),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#dee2e6")),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3)
+])
+CAMPAIGN_STEP_COL_WIDTHS = [6*cm, 2.5*cm, 6.5*cm, 2*cm]
+
+
+def iter_campaign_tests(rapport_collection, campaign_id, batch_size=100):
+    """Curseur sur les tests d'une campagne, dans l'ordre de lancement"""
+    return rapport_collection.find(
+        {"campaign_id": campaign_id}, TEST_PROJECTION
+    ).sort("_id", 1).batch_size(batch_size)
+
+
+def summarize_by_module(rapport_collection, campaign_id):
+    """Synthèse par module calculée côté serveur (agrégation)"""
+    pipeline = [
+        {"$match": {"campaign_id": campaign_id}},
+        {"$group": {
+            "_id": "$module",
+            "total": {"$sum": 1},
+            "success": {"$sum": {"$cond": [{"$eq": ["$success", True]}, 1, 0]}},
+            "errors": {"$sum": {"$cond": [{"$eq": ["$status", "error"]}, 1, 0]}},
+            "execution_time": {"$sum": {"$ifNull": ["$execution_time", 0]}}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+    return [
+        {
+            "module": group["_id"],
+            "total": group["total"],
+            "success": group["success"],
+            "errors": group["errors"],
+            "execution_time": round(group["execution_time"], 2)
+        }
+        for group in rapport_collection.aggregate(pipeline)
+    ]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _test_status(test):
+    if test.get("success"):
+        return "succès"
+    return test.get("status") or "inconnu"
+
+
+def campaign_report_json(rapport_collection, campaign):
+    """Génère le rapport JSON par morceaux : synthèse puis un test à la fois"""
+    campaign_id = campaign["campaign_id"]
+    header = {
+        "campaign_id": campaign_id,
+        "modules": campaign.get("modules"),
+        "sheet": campaign.get("sheet"),
+        "date_creation": campaign.get("date_creation"),
+        "generated_at": datetime.now(),
+        "progress": compute_campaign_progress(rapport_collection, campaign_id),
+        "by_module": summarize_by_module(rapport_collection, campaign_id)
+    }
+    # L'objet d'en-tête est ouvert pour y ajouter la liste des tests
+    yield json.dumps(header, default=_json_default, ensure_ascii=False)[:-1] + ', "tests": ['
+    for index, test in enumerate(iter_campaign_tests(rapport_collection, campaign_id)):
+        yield ("," if index else "") + json.dumps(test, default=_json_default, ensure_ascii=False)
+    yield "]}"
+
+
+_HTML_STYLE = (
+    "body{font-family:Helvetica,Arial,sans-serif;color:#2d3748;margin:2em}"
+    "h1{color:#1a365d}table{border-collapse:collapse;margin-bottom:1em}"
+    "th,td{border:1px solid #dee2e6;padding:4px 8px;font-size:13px;text-align:left}"
+    "th{background:#6c757d;color:#fff}.success{color:#28a745}.error{color:#dc3545}.warning{color:#b8860b}"
+)
+
+
+def campaign_report_html(rapport_collection, campaign):
+    """Génère le rapport HTML par morceaux : synthèse puis une section par test"""
+    campaign_id = campaign["campaign_id"]
+    e = lambda value: html.escape(str(value if value is not None else ""))
+    progress = compute_campaign_progress(rapport_collection, campaign_id)
+
+    yield (
+        f"<!DOCTYPE html><html lang=\"fr\"><head><meta charset=\"utf-8\"><title>Campagne {e(campaign_id)}</title>"
+        f"<style>{_HTML_STYLE}</style></head><body>"
+        f"<h1>Rapport de campagne {e(campaign_id)}</h1>"
+        f"<p>{e(progress['total'])} test(s), {e(progress['success'])} succès, {e(progress['failed'])} échec(s)"
+        f" - taux de réussite {e(progress['success_rate'])}%</p>"
+        "<h2>Synthèse par module</h2><table><tr><th>Module</th><th>Tests</th><th>Succès</th>"
+        "<th>Erreurs</th><th>Durée (s)</th></tr>"
+    )
+    for row in summarize_by_module(rapport_collection, campaign_id):
+        yield (
+            f"<tr><td>{e(row['module'])}</td><td>{row['total']}</td><td>{row['success']}</td>"
+            f"<td>{row['errors']}</td><td>{row['execution_time']}</td></tr>"
+        )
+    yield "</table><h2>Détail des tests</h2>"
+
+    for test in iter_campaign_tests(rapport_collection, campaign_id):
+        kind = "success" if test.get("success") else status_kind(test.get("status"))
+        parts = [
+            f"<section><h3>{e(test.get('module'))} - {e(test.get('scenario'))}</h3>"
+            f"<p class=\"{kind}\">{e(_test_status(test))}"
+            f" - {e(round(test.get('execution_time') or 0, 2))} s - {e(test.get('test_id'))}</p>"
+        ]
+        if test.get("error"):
+            parts.append(f"<p class=\"error\">{e(test['error'])}</p>")
+        steps = test.get("steps") or []
+        if steps:
+            parts.append("<table><tr><th>Étape</th><th>Statut</th><th>Résultat</th><th>Durée (s)</th></tr>")
+            for step in steps:
+                parts.append(
+                    f"<tr><td>{e(step.get('description'))}</td>"
+                    f"<td class=\"{status_kind(step.get('status'))}\">{e(step.get('status'))}</td>"
+                    f"<td>{e(step.get('result'))}</td><td>{e(step.get('duration'))}</td></tr>"
+                )
+            parts.append("</table>")
+        parts.append("</section>")
+        yield "".join(parts)
+    yield f"<footer>Document généré automatiquement le {e(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))}</footer></body></html>"
+
+
+class StreamingStory(list):
+    """
+    Liste de flowables alimentée à la demande.
+
+    doc.build() consomme la liste par le début et teste sa longueur à chaque
+    tour : la section du test suivant n'est construite que lorsque la
+    précédente a été mise en page.
+    """
+
+    def __init__(self, sections):
+        super().__init__()
+        self._sections = iter(sections)
+
+    def __len__(self):
+        while not super().__len__():
+            section = next(self._sections, None)
+            if section is None:
+                break
+            self.extend(section)
+        return super().__len__()
+
+
+def _test_section(test):
+    kind = "success" if test.get("success") else status_kind(test.get("status"))
+    label, color = STEP_STATUS[kind]
+    title = f"{escape(str(test.get('module') or ''))} - {escape(str(test.get('scenario') or ''))}"
+    section = [
+        Paragraph(title, STYLES['StepTitle']),
+        Paragraph(
+            f"<font color=\"{color.hexval().replace('0x', '#')}\"><b>{label}</b></font>"
+            f" - {round(test.get('execution_time') or 0, 2)} s - {escape(str(test.get('test_id') or ''))}",
+            STYLES['Content']
+        )
+    ]
+    if test.get("error"):
+        section.append(Paragraph(escape(str(test["error"])), STYLES['Content']))
+
+    steps = test.get("steps") or []
+    if steps:
+        data = [["Étape", "Statut", "Résultat", "Durée (s)"]]
+        status_colors = []
+        for row, step in enumerate(steps, 1):
+            step_kind = status_kind(step.get("status"))
+            data.append([
+                str(step.get("description") or "")[:80],
+                STEP_STATUS[step_kind][0],
+                str(step.get("result") or "")[:80],
+                "" if step.get("duration") is None else f"{step['duration']:.2f}"
+            ])
+            status_colors.append(('TEXTCOLOR', (1, row), (1, row), STEP_STATUS[step_kind][1]))
+        table = Table(data, colWidths=CAMPAIGN_STEP_COL_WIDTHS, style=CAMPAIGN_STEP_TABLE_STYLE, repeatRows=1)
+        table.setStyle(TableStyle(status_colors))
+        section.append(table)
+    section.append(Spacer(1, 10))
+    return section
+
+
+def write_campaign_pdf(rapport_collection, campaign, output):
+    """Écrit le rapport PDF de la campagne dans `output` (fichier ou flux binaire)"""
+    campaign_id = campaign["campaign_id"]
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    progress = compute_campaign_progress(rapport_collection, campaign_id)
+
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=A4,
+        rightMargin=2*cm,
+        leftMargin=2*cm,
+        topMargin=2.5*cm,
+        bottomMargin=2*cm,
+        title=f"Rapport de campagne {campaign_id}"
+    )
+
+    head = header_flowables()
+    head.append(Paragraph(f"CAMPAGNE {escape(campaign_id)}", STYLES['SectionTitle']))
+    created = campaign.get("date_creation")
+    head.append(Table([
+        ['Date de lancement', created.strftime('%Y-%m-%d %H:%M:%S') if hasattr(created, 'strftime') else "Non spécifiée"],
+        ['Modules', ", ".join(campaign.get("modules") or []) or "Non spécifié"],
+        ['Tests', str(progress["total"])],
+        ['Taux de réussite', f"{progress['success_rate']}%"],
+        ['Durée cumulée', f"{progress['execution_time']:.2f} secondes"]
+    ], colWidths=[4*cm, 12*cm], style=INFO_TABLE_STYLE))
+    head.append(Spacer(1, 15))
+
+    modules = [["Module", "Tests", "Succès", "Erreurs", "Durée (s)"]]
+    for row in summarize_by_module(rapport_collection, campaign_id):
+        modules.append([str(row["module"] or ""), str(row["total"]), str(row["success"]),
+                        str(row["errors"]), f"{row['execution_time']:.2f}"])
+    head.append(Paragraph("SYNTHÈSE PAR MODULE", STYLES['SectionTitle']))
+    head.append(Table(modules, colWidths=[6*cm, 2.5*cm, 2.5*cm, 2.5*cm, 3*cm], style=STATS_TABLE_STYLE, repeatRows=1))
+    head.append(Spacer(1, 20))
+    head.append(Paragraph("DÉTAIL DES TESTS", STYLES['SectionTitle']))
+
+    def sections():
+        yield head
+        for test in iter_campaign_tests(rapport_collection, campaign_id):
+            yield _test_section(test)
+        yield footer_flowables(timestamp)
+
+    doc.build(StreamingStory(sections()))
+    return progress
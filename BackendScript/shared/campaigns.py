@@ -0,0 +1,118 @@
+import hashlib
+import re
+import unicodedata
+from datetime import datetime
+from shared.logger import logger
+
+# Statuts terminaux d'un test dans la collection rapport
+FINISHED_STATUSES = ["completed", "error"]
+
+_UNSAFE_ID_CHARS = re.compile(r"[^A-Za-z0-9-]+")
+
+
+def id_part(text, max_length=40):
+    """
+    Partie d'identifiant sûre dans une URL et un nom de fichier
+
+    Les titres libres (scénario, feuille) sont réduits à [A-Za-z0-9-] ; si le
+    texte a dû être modifié, un court hachage du texte d'origine est ajouté
+    pour que deux titres différents ne donnent pas le même identifiant.
+    """
+    text = str(text)
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    slug = _UNSAFE_ID_CHARS.sub("-", ascii_text).strip("-")[:max_length].rstrip("-")
+    if slug == text:
+        return slug
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+    return f"{slug}-{digest}" if slug else digest
+
+
+def expand_campaign_targets(models_collection, module_ids=None, sheet=None):
+    """
+    Développe une campagne en liste de scénarios à partir des modules importés
+    du cahier de recette (collection TestsModels).
+
+    Args:
+        models_collection: Collection TestsModels remplie par csv_to_mongodb
+        module_ids (list): Modules à inclure
+        sheet (str): Feuille du cahier de recette dont on prend tous les modules
+
+    Returns:
+        list: Couples (module, scénario) dans l'ordre du cahier de recette
+    """
+    query = {}
+    if module_ids:
+        query["module"] = {"$in": list(module_ids)}
+    if sheet:
+        query["feuille"] = sheet
+    if not query:
+        raise ValueError("Un module ou une feuille du cahier de recette est requis")
+
+    targets = []
+    projection = {"module": 1, "formations.titre": 1}
+    for model in models_collection.find(query, projection).sort("module", 1):
+        seen = set()
+        for formation in model.get("formations", []):
+            # Plusieurs lignes du cahier peuvent partager le même titre de formation
+            titre = formation.get("titre")
+            if titre and titre not in seen:
+                seen.add(titre)
+                targets.append((model["module"], titre))
+    return targets
+
+
+def compute_campaign_progress(rapport_collection, campaign_id):
+    """Agrège côté serveur l'état des tests d'une campagne"""
+    pipeline = [
+        {"$match": {"campaign_id": campaign_id}},
+        {"$group": {
+            "_id": "$status",
+            "count": {"$sum": 1},
+            "success": {"$sum": {"$cond": [{"$eq": ["$success", True]}, 1, 0]}},
+            "execution_time": {"$sum": {"$ifNull": ["$execution_time", 0]}}
+        }}
+    ]
+    by_status = {}
+    success = 0
+    execution_time = 0
+    for group in rapport_collection.aggregate(pipeline):
+        by_status[group["_id"] or "unknown"] = group["count"]
+        success += group["success"]
+        execution_time += group["execution_time"]
+
+    total = sum(by_status.values())
+    finished = sum(by_status.get(status, 0) for status in FINISHED_STATUSES)
+    return {
+        "total": total,
+        "finished": finished,
+        "by_status": by_status,
+        "success": success,
+        "failed": finished - success,
+        "progress": round(finished / total * 100, 1) if total else 0,
+        "success_rate": round(success / finished * 100, 1) if finished else 0,
+        "execution_time": execution_time
+    }
+
+
+def refresh_campaign(campaign_collection, rapport_collection, campaign_id):
+    """
+    Recalcule la progression d'une campagne et enregistre le résultat
+    consolidé lorsque tous ses tests sont terminés.
+    """
+    progress = compute_campaign_progress(rapport_collection, campaign_id)
+    update = {"progress": progress, "last_update": datetime.now()}
+    if progress["total"] and progress["finished"] == progress["total"]:
+        update["status"] = "completed" if progress["failed"] == 0 else "error"
+        update["success"] = progress["failed"] == 0
+        update["completed_at"] = datetime.now()
+    else:
+        update["status"] = "running" if progress["finished"] or progress["by_status"].get("running") else "pending"
+
+    # Le statut terminal n'est écrit qu'une fois
+    campaign_collection.update_one(
+        {"campaign_id": campaign_id, "completed_at": {"$exists": False}},
+        {"$set": update}
+    )
+    if "completed_at" in update:
+        logger.info(f"Campagne {campaign_id} terminée: {progress['success']}/{progress['total']} succès")
+    return progress
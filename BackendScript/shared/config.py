@@ -0,0 +1,95 @@
+import os
+
+# Configuration du backend, surchargeable par variables d'environnement
+# (voir docker-compose.yml)
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_boxes(name):
+    """Lit une liste de zones "left,top,width,height;left,top,width,height" """
+    boxes = []
+    for chunk in os.environ.get(name, "").split(";"):
+        try:
+            box = tuple(int(v) for v in chunk.split(","))
+        except ValueError:
+            continue
+        if len(box) == 4:
+            boxes.append(box)
+    return boxes
+
+
+# MongoDB : un client par processus, partagé par tous les modules (shared/mongo.py)
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://10.110.6.139:27017/")
+MONGO_DB = os.environ.get("MONGO_DB", "TestIkos")
+MONGO_COLLECTION = os.environ.get("MONGO_COLLECTION", "TestsModels")
+MONGO_MAX_POOL_SIZE = max(1, _env_int("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = max(0, _env_int("MONGO_MIN_POOL_SIZE", 0))
+MONGO_CONNECT_TIMEOUT_MS = max(100, _env_int("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = max(100, _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+# 0 : pas de délai maximum sur les lectures/écritures réseau
+MONGO_SOCKET_TIMEOUT_MS = max(0, _env_int("MONGO_SOCKET_TIMEOUT_MS", 0))
+# Write concern : nombre de nœuds ("1") ou "majority"
+MONGO_WRITE_CONCERN = os.environ.get("MONGO_WRITE_CONCERN", "1")
+
+# Nombre d'emplacements d'exécution parallèles (un navigateur isolé par emplacement)
+TEST_WORKERS = max(1, _env_int("TEST_WORKERS", 1))
+
+# Emplacements de rendu des rapports PDF (file séparée des tests)
+REPORT_WORKERS = max(1, _env_int("REPORT_WORKERS", 1))
+
+# Rendu des rapports : "eager" (à la fin du test) ou "lazy" (au premier
+# téléchargement, avec un cache GridFS limité à REPORT_CACHE_MB)
+REPORT_RENDERING = os.environ.get("REPORT_RENDERING", "eager").lower()
+REPORT_CACHE_MB = max(1, _env_int("REPORT_CACHE_MB", 512))
+
+# Captures d'écran des rapports : résolution d'impression et qualité JPEG
+REPORT_IMAGE_DPI = max(72, _env_int("REPORT_IMAGE_DPI", 150))
+REPORT_IMAGE_QUALITY = min(95, max(10, _env_int("REPORT_IMAGE_QUALITY", 75)))
+
+# File de jobs persistante : durée du bail, nombre de tentatives et scrutation
+JOB_LEASE_SECONDS = max(5, _env_int("JOB_LEASE_SECONDS", 60))
+JOB_MAX_ATTEMPTS = max(1, _env_int("JOB_MAX_ATTEMPTS", 2))
+JOB_POLL_INTERVAL = max(1, _env_int("JOB_POLL_INTERVAL", 2))
+# Conservation des jobs terminés avant purge automatique (index TTL)
+JOB_RETENTION_DAYS = max(1, _env_int("JOB_RETENTION_DAYS", 30))
+
+# Écritures de progression des tests regroupées : délai maximum (ms) avant
+# écriture en base d'une mise à jour ; fins d'étape et fins de test sont immédiates
+PROGRESS_FLUSH_MS = max(10, _env_int("PROGRESS_FLUSH_MS", 250))
+
+# Nettoyage de la base (doublons de résultats, entrées sans scénario) :
+# intervalle en minutes (0 désactive) ; en dry run, les suppressions sont
+# seulement comptées
+MAINTENANCE_INTERVAL_MINUTES = max(0, _env_int("MAINTENANCE_INTERVAL_MINUTES", 60))
+MAINTENANCE_DRY_RUN = os.environ.get("MAINTENANCE_DRY_RUN", "0") == "1"
+
+# Application Ikos testée
+IKOS_URL = os.environ.get("IKOS_URL", "http://ikostst.maisonsetcites.local")
+IKOS_USER = os.environ.get("IKOS_USER", "BLASZYKCO")
+IKOS_PASSWORD = os.environ.get("IKOS_PASSWORD", "7WLv7ldBaLnvrpq")
+
+# Pool de sessions navigateur pré-démarrées et pré-authentifiées
+BROWSER_POOL_ENABLED = os.environ.get("BROWSER_POOL", "1") != "0"
+BROWSER_POOL_SIZE = max(1, _env_int("BROWSER_POOL_SIZE", TEST_WORKERS))
+BROWSER_MAX_USES = max(1, _env_int("BROWSER_MAX_USES", 20))
+
+# Navigateur utilisé pour les tests : edge, chromium ou firefox
+BROWSER = os.environ.get("BROWSER", "edge").lower()
+# Chromium est prévu pour les conteneurs CI : sans affichage par défaut
+BROWSER_HEADLESS = os.environ.get("BROWSER_HEADLESS", "1" if BROWSER == "chromium" else "0") == "1"
+# Mode hors-ligne : aucun téléchargement de driver, seul le cache local est utilisé
+BROWSER_OFFLINE = os.environ.get("BROWSER_OFFLINE", "0") == "1"
+DRIVER_CACHE_DIR = os.environ.get("DRIVER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "test-ikos", "drivers"))
+
+# Zones variables ignorées lors de la comparaison d'écrans (horloge, utilisateur...)
+SCREEN_MASKS = _env_boxes("SCREEN_MASKS")
+
+# Motifs (expressions régulières, séparées par ";") signalant une erreur dans
+# la page ; un scénario peut ajouter ses propres motifs (error_patterns)
+ERROR_PATTERNS = [p for p in os.environ.get("ERROR_PATTERNS", "erreur").split(";") if p]
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+from datetime import datetime
+from shared.config import DRIVER_CACHE_DIR, BROWSER_OFFLINE
+from shared.logger import logger
+
+_CACHE_FILE = "drivers.json"
+_lock = threading.Lock()
+# Résolutions déjà faites dans ce processus : navigateur -> chemin
+# (évite de relancer la détection de version à chaque démarrage)
+_resolved = {}
+
+
+def _driver_manager(browser):
+    """Retourne le gestionnaire webdriver_manager d'un navigateur"""
+    from webdriver_manager.core.driver_cache import DriverCacheManager
+    cache_manager = DriverCacheManager(root_dir=DRIVER_CACHE_DIR)
+    if browser == "edge":
+        from webdriver_manager.microsoft import EdgeChromiumDriverManager
+        return EdgeChromiumDriverManager(cache_manager=cache_manager)
+    if browser == "chromium":
+        from webdriver_manager.chrome import ChromeDriverManager
+        from webdriver_manager.core.os_manager import ChromeType
+        return ChromeDriverManager(chrome_type=ChromeType.CHROMIUM, cache_manager=cache_manager)
+    if browser == "firefox":
+        from webdriver_manager.firefox import GeckoDriverManager
+        return GeckoDriverManager(cache_manager=cache_manager)
+    raise ValueError(f"Navigateur non supporté: {browser}")
+
+
+def _cache_path():
+    return os.path.join(DRIVER_CACHE_DIR, _CACHE_FILE)
+
+
+def _load_cache():
+    try:
+        with open(_cache_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache):
+    os.makedirs(DRIVER_CACHE_DIR, exist_ok=True)
+    tmp_path = _cache_path() + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, _cache_path())
+
+
+def _browser_version(manager):
+    # Lecture locale de la version installée (aucun accès réseau)
+    try:
+        return manager.driver.get_browser_version_from_os()
+    except Exception as e:
+        logger.warning(f"Version du navigateur introuvable: {str(e)}")
+        return None
+
+
+def resolve_driver_path(browser):
+    """
+    Retourne le chemin du WebDriver d'un navigateur.
+
+    L'ordre de résolution est : variable WEBDRIVER_PATH, cache local indexé
+    par version du navigateur, puis téléchargement via webdriver_manager.
+    En mode hors-ligne (BROWSER_OFFLINE=1), aucun accès réseau n'est tenté :
+    le dernier driver mis en cache pour ce navigateur est utilisé.
+    """
+    explicit = os.environ.get("WEBDRIVER_PATH")
+    if explicit:
+        return explicit
+
+    with _lock:
+        if browser in _resolved:
+            return _resolved[browser]
+
+        manager = _driver_manager(browser)
+        version = _browser_version(manager)
+        key = f"{browser}-{version or 'inconnue'}"
+
+        cache = _load_cache()
+        entry = cache.get(key)
+        if entry and os.path.exists(entry["path"]):
+            _resolved[browser] = entry["path"]
+            return entry["path"]
+
+        if BROWSER_OFFLINE:
+            # Repli sur le driver le plus récemment résolu pour ce navigateur
+            entries = sorted(
+                (e for name, e in cache.items() if name.startswith(f"{browser}-") and os.path.exists(e["path"])),
+                key=lambda e: e["resolved_at"],
+                reverse=True
+            )
+            candidates = [e["path"] for e in entries]
+            if not candidates:
+                raise RuntimeError(
+                    f"Mode hors-ligne : aucun driver {browser} en cache dans {DRIVER_CACHE_DIR} "
+                    f"(définir WEBDRIVER_PATH)"
+                )
+            logger.warning(f"Mode hors-ligne : driver {candidates[0]} utilisé pour {key}")
+            _resolved[browser] = candidates[0]
+            return candidates[0]
+
+        logger.info(f"Résolution du driver {key} via webdriver_manager")
+        path = manager.install()
+        cache[key] = {"path": path, "resolved_at": datetime.now().isoformat()}
+        _save_cache(cache)
+        _resolved[browser] = path
+        return path
@@ -0,0 +1,185 @@
+import re
+from shared.logger import logger
+
+# Installe (une fois par document) un MutationObserver qui conserve les textes
+# ajoutés correspondant aux motifs d'erreur, puis retourne le tampon. Les
+# frames de même origine sont surveillés aussi. Un seul aller-retour WebDriver
+# par vérification, sans sérialiser le DOM.
+_POLL_JS = """
+var sources = arguments[0], key = arguments[1], limit = arguments[2];
+var found = [], invalid = [], failures = [];
+
+// Motifs compilés une fois par appel ; un motif refusé par le navigateur est
+// signalé et ignoré sans désactiver les autres
+var patterns = [];
+for (var p = 0; p < sources.length; p++) {
+    try {
+        patterns.push(new RegExp(sources[p], 'i'));
+    } catch (e) {
+        invalid.push(sources[p] + ' : ' + e.message);
+    }
+}
+
+function matcher(patterns) {
+    return function (text) {
+        if (!text) { return null; }
+        text = text.slice(0, 2000);
+        for (var i = 0; i < patterns.length; i++) {
+            var m = patterns[i].exec(text);
+            if (m) {
+                var start = Math.max(0, m.index - 60);
+                return text.slice(start, m.index + m[0].length + 60).replace(/\\s+/g, ' ').trim();
+            }
+        }
+        return null;
+    };
+}
+
+function install(win) {
+    var doc = win.document;
+    if (!doc || !doc.documentElement) { return null; }
+    var state = win.__ikosErrorWatch;
+    if (state && state.key === key && state.doc === doc) { return state; }
+    if (state && state.observer) { state.observer.disconnect(); }
+    var test = matcher(patterns);
+    state = {key: key, doc: doc, errors: []};
+    var push = function (text) {
+        var hit = test(text);
+        if (hit && state.errors.length < limit && state.errors.indexOf(hit) < 0) { state.errors.push(hit); }
+    };
+    // Texte visible déjà présent au moment de l'installation
+    push(doc.body ? doc.body.innerText : '');
+    state.observer = new win.MutationObserver(function (mutations) {
+        for (var i = 0; i < mutations.length; i++) {
+            var m = mutations[i];
+            if (m.type === 'characterData') {
+                push(m.target.nodeValue);
+            } else {
+                for (var j = 0; j < m.addedNodes.length; j++) {
+                    var node = m.addedNodes[j];
+                    if (!/^(SCRIPT|STYLE|TEMPLATE|NOSCRIPT)$/.test(node.nodeName)) { push(node.textContent); }
+                }
+            }
+        }
+    });
+    state.observer.observe(doc.documentElement, {childList: true, subtree: true, characterData: true});
+    win.__ikosErrorWatch = state;
+    return state;
+}
+
+function visit(win) {
+    try {
+        // Frame d'une autre origine : l'accès au document est refusé, il est ignoré
+        if (!win.document) { return; }
+    } catch (e) {
+        return;
+    }
+    try {
+        var state = install(win);
+        if (state) { found = found.concat(state.errors); }
+    } catch (e) {
+        failures.push(String(e && e.message || e));
+    }
+    for (var i = 0; i < win.frames.length; i++) { visit(win.frames[i]); }
+}
+
+visit(window);
+return {errors: found, invalid: invalid, failures: failures};
+"""
+
+# Syntaxe Python sans équivalent dans les RegExp JavaScript du navigateur
+_PYTHON_ONLY_SYNTAX = [
+    (re.compile(r"\(\?P[<=>]"), "groupe nommé (?P...)"),
+    (re.compile(r"\(\?[aiLmsux-]+[:)]"), "option en ligne (?...)"),
+    (re.compile(r"\(\?#"), "commentaire (?#...)"),
+    (re.compile(r"\\[AZ]"), "ancre \\A ou \\Z"),
+]
+
+
+def browser_pattern(pattern):
+    """
+    Motif d'erreur tel qu'exécuté par le navigateur (RegExp, insensible à la casse)
+
+    Un "(?i)" initial est retiré (la recherche ignore déjà la casse) ; les
+    autres constructions propres à Python sont refusées.
+
+    Raises:
+        ValueError: Motif invalide ou non transposable en JavaScript
+    """
+    if not isinstance(pattern, str):
+        raise ValueError("le motif doit être une chaîne")
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        raise ValueError(str(e))
+    if pattern.startswith("(?i)"):
+        pattern = pattern[4:]
+    for syntax, label in _PYTHON_ONLY_SYNTAX:
+        if syntax.search(pattern):
+            raise ValueError(f"syntaxe non supportée par le navigateur : {label}")
+    return pattern
+
+_RESET_JS = """
+function visit(win) {
+    try {
+        if (win.__ikosErrorWatch) { win.__ikosErrorWatch.errors = []; }
+        for (var i = 0; i < win.frames.length; i++) { visit(win.frames[i]); }
+    } catch (e) {}
+}
+visit(window);
+"""
+
+
+class ErrorWatcher:
+    """
+    Détection des messages d'erreur affichés par Ikos.
+
+    S'utilise comme une fonction driver -> bool (remplace check_for_errors) ;
+    les messages trouvés sont disponibles dans `errors`.
+    """
+
+    def __init__(self, patterns, limit=20):
+        """
+        Args:
+            patterns (list): Expressions régulières (insensibles à la casse)
+            limit (int): Nombre maximum de messages conservés par document
+        """
+        self.patterns = []
+        for pattern in patterns:
+            try:
+                self.patterns.append(browser_pattern(pattern))
+            except ValueError as e:
+                logger.error(f"Motif d'erreur ignoré '{pattern}': {str(e)}")
+        self.limit = limit
+        self._reported = set()
+        # Change quand les motifs changent : l'observateur est alors réinstallé
+        self.key = "|".join(self.patterns)
+        self.errors = []
+
+    def poll(self, driver):
+        """Retourne les messages d'erreur apparus dans le frame courant et ses sous-frames"""
+        if not self.patterns:
+            return []
+        result = driver.execute_script(_POLL_JS, self.patterns, self.key, self.limit) or {}
+        for problem in (result.get("invalid") or []) + (result.get("failures") or []):
+            # Signalé une fois : la détection continue avec les autres motifs et frames
+            if problem not in self._reported:
+                self._reported.add(problem)
+                logger.error(f"Surveillance des erreurs : {problem}")
+        self.errors = result.get("errors") or []
+        return self.errors
+
+    def reset(self, driver):
+        """Oublie les erreurs déjà vues (ex. après un message attendu)"""
+        self.errors = []
+        driver.execute_script(_RESET_JS)
+
+    def __call__(self, driver):
+        try:
+            errors = self.poll(driver)
+        except Exception as e:
+            logger.error(f"Erreur lors de la vérification des erreurs: {str(e)}")
+            return False
+        if errors:
+            logger.warning(f"Erreur(s) détectée(s) dans la page: {' | '.join(errors)}")
+        return bool(errors)
@@ -0,0 +1,215 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from shared.logger import logger
+
+
+class JobCancelled(Exception):
+    """Job interrompu : son bail a été perdu et il peut être repris par un autre worker"""
+
+
+# Job en cours du thread worker : permet au handler de vérifier son bail
+_current_job = threading.local()
+
+
+def job_cancelled():
+    """True si le job exécuté par le thread courant a perdu son bail"""
+    event = getattr(_current_job, "cancel", None)
+    return event is not None and event.is_set()
+
+
+def check_cancelled():
+    """Lève JobCancelled si le job du thread courant a perdu son bail"""
+    if job_cancelled():
+        raise JobCancelled(f"Bail perdu pour le job {getattr(_current_job, 'job_id', '')}")
+
+
+class ExecutionPool:
+    """
+    Pool borné d'exécution des tests.
+
+    Les test_id soumis sont placés dans une file persistante (JobQueue) et pris
+    en charge, dans l'ordre FIFO, par `slots` workers. Chaque worker correspond
+    à un emplacement (slot) qui dispose de sa propre session navigateur.
+    Plusieurs processus (workers gunicorn, machines) peuvent partager la même
+    file : chaque job n'est réservé que par un seul worker à la fois.
+    """
+
+    def __init__(self, handler, job_queue, slots=1, name="tests", poll_interval=2.0, on_abandoned=None, on_start=None):
+        """
+        Args:
+            handler (callable): Fonction handler(test_id, slot) exécutant un test ;
+                elle appelle check_cancelled() entre ses étapes pour s'arrêter
+                si son bail est perdu
+            job_queue (JobQueue): File persistante partagée entre les processus
+            slots (int): Nombre d'emplacements d'exécution parallèles
+            name (str): Nom du pool (utilisé pour les threads et les logs)
+            poll_interval (float): Délai entre deux scrutations de la file (secondes)
+            on_abandoned (callable): Rappel on_abandoned(test_id, requeued) pour
+                les jobs dont le worker a disparu
+            on_start (callable): Rappel exécuté une fois au démarrage des workers
+                du processus (ex. pré-démarrage des navigateurs)
+        """
+        self.handler = handler
+        self.job_queue = job_queue
+        self.slots = max(1, int(slots))
+        self.name = name
+        self.poll_interval = poll_interval
+        self.on_abandoned = on_abandoned
+        self.on_start = on_start
+        self._running = {}
+        self._cancel = {}
+        self._cond = threading.Condition()
+        self._workers = []
+        self._owner = None
+
+    def _worker_id(self, slot):
+        return f"{self._owner}:{self.name}:{slot}"
+
+    def start(self):
+        """Démarre les workers et le thread de heartbeat (idempotent)"""
+        with self._cond:
+            # Le pid fait partie de l'identité : après un fork, le processus
+            # enfant démarre ses propres threads
+            owner = f"{socket.gethostname()}:{os.getpid()}"
+            if self._workers and self._owner == owner:
+                return
+            self._owner = owner
+            self._workers = []
+            self._running = {}
+            try:
+                self.job_queue.ensure_indexes()
+            except Exception as e:
+                logger.error(f"Impossible de créer les index de la file '{self.name}': {str(e)}")
+            self.recover()
+            if self.on_start:
+                self.on_start()
+            for slot in range(self.slots):
+                worker = threading.Thread(
+                    target=self._work,
+                    args=(slot,),
+                    name=f"{self.name}-slot-{slot}",
+                    daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+            threading.Thread(target=self._heartbeat, name=f"{self.name}-heartbeat", daemon=True).start()
+        logger.info(f"Pool '{self.name}' démarré avec {self.slots} emplacement(s) ({owner})")
+
+    def recover(self):
+        """Remet en file ou marque en échec les jobs dont le bail a expiré"""
+        try:
+            requeued, failed = self.job_queue.recover_stale()
+        except Exception as e:
+            logger.error(f"Erreur lors de la reprise des jobs du pool '{self.name}': {str(e)}", exc_info=True)
+            return
+        if self.on_abandoned:
+            for test_id in requeued:
+                self.on_abandoned(test_id, True)
+            for test_id in failed:
+                self.on_abandoned(test_id, False)
+        if requeued:
+            with self._cond:
+                self._cond.notify_all()
+
+    def submit(self, test_id, payload=None, requeue_finished=False):
+        """Ajoute un test à la file et retourne sa position (1 = prochain)"""
+        self.start()
+        self.job_queue.enqueue(test_id, payload, requeue_finished=requeue_finished)
+        position = self.job_queue.position(test_id)
+        with self._cond:
+            self._cond.notify()
+        logger.info(f"Test {test_id} mis en file d'attente (position {position})")
+        return position
+
+    def submit_many(self, test_ids):
+        """Ajoute une série de tests à la file en une seule écriture"""
+        self.start()
+        count = self.job_queue.enqueue_many(test_ids)
+        with self._cond:
+            self._cond.notify_all()
+        logger.info(f"{count} test(s) mis en file d'attente")
+        return count
+
+    def queue_position(self, test_id):
+        """Retourne la position d'un test dans la file, ou None s'il n'y est pas"""
+        return self.job_queue.position(test_id)
+
+    def status(self):
+        """Retourne l'état du pool : occupation des emplacements et file d'attente"""
+        with self._cond:
+            running = [
+                {"slot": slot, "test_id": test_id, "started_at": started_at.isoformat()}
+                for slot, (test_id, started_at) in sorted(self._running.items())
+            ]
+        return {
+            "slots": self.slots,
+            "busy_slots": len(running),
+            "free_slots": self.slots - len(running),
+            "queue_depth": self.job_queue.depth(),
+            "queued": self.job_queue.queued_ids(),
+            "running": running,
+            "running_total": self.job_queue.running_count(),
+            "worker": self._owner
+        }
+
+    def _work(self, slot):
+        worker_id = self._worker_id(slot)
+        while True:
+            try:
+                job = self.job_queue.claim(worker_id)
+            except Exception as e:
+                logger.error(f"Erreur lors de la réservation d'un job ({worker_id}): {str(e)}")
+                job = None
+
+            if not job:
+                with self._cond:
+                    self._cond.wait(self.poll_interval)
+                continue
+
+            test_id = job["job_id"]
+            cancel = threading.Event()
+            _current_job.job_id, _current_job.cancel = test_id, cancel
+            with self._cond:
+                self._running[slot] = (test_id, datetime.now())
+                self._cancel[slot] = cancel
+
+            error = None
+            try:
+                self.handler(test_id, slot)
+            except JobCancelled:
+                # Le job appartient désormais à un autre worker : il n'est pas clôturé ici
+                logger.warning(f"Job {test_id} interrompu dans l'emplacement {slot} (bail perdu)")
+            except Exception as e:
+                error = str(e)
+                logger.error(f"Erreur non gérée dans l'emplacement {slot} pour {test_id}: {error}", exc_info=True)
+            finally:
+                _current_job.job_id, _current_job.cancel = None, None
+                with self._cond:
+                    self._running.pop(slot, None)
+                    self._cancel.pop(slot, None)
+                try:
+                    self.job_queue.complete(test_id, worker_id, error=error)
+                except Exception as e:
+                    logger.error(f"Impossible de clôturer le job {test_id}: {str(e)}")
+
+    def _heartbeat(self):
+        interval = max(1.0, self.job_queue.lease_seconds / 3)
+        while True:
+            time.sleep(interval)
+            with self._cond:
+                running = [(slot, test_id, self._cancel.get(slot)) for slot, (test_id, _) in self._running.items()]
+            for slot, test_id, cancel in running:
+                try:
+                    if not self.job_queue.heartbeat(test_id, self._worker_id(slot)):
+                        # Le job peut être repris ailleurs : le handler est
+                        # interrompu à sa prochaine vérification (check_cancelled)
+                        logger.warning(f"Bail perdu pour le job {test_id} (emplacement {slot}), interruption demandée")
+                        if cancel is not None:
+                            cancel.set()
+                except Exception as e:
+                    logger.error(f"Erreur de heartbeat pour {test_id}: {str(e)}")
+            # Reprise des jobs abandonnés par d'autres processus
+            self.recover()
@@ -1,4 +1,14 @@
 # extensions.py
 from flask_socketio import SocketIO
+from shared.metrics import SOCKETIO_EMITS
 
-socketio = SocketIO(cors_allowed_origins="*", async_mode='threading')
+
+class InstrumentedSocketIO(SocketIO):
+    """SocketIO qui compte les événements émis (métrique ikos_socketio_emits_total)"""
+
+    def emit(self, event, *args, **kwargs):
+        SOCKETIO_EMITS.inc(event=event)
+        return super().emit(event, *args, **kwargs)
+
+
+socketio = InstrumentedSocketIO(cors_allowed_origins="*", async_mode='threading')
@@ -0,0 +1,95 @@
+import unicodedata
+from urllib.parse import quote
+from flask import Response, request
+from shared.metrics import GRIDFS_READ_BYTES
+
+# Envoi de fichiers GridFS (rapports, vidéos, captures) en streaming :
+# lecture chunk par chunk sans copie en mémoire, requêtes Range et ETag.
+
+
+def _etag(file_obj):
+    # md5 n'est plus calculé par les versions récentes de pymongo : repli sur l'ObjectId
+    return getattr(file_obj, "md5", None) or str(file_obj._id)
+
+
+def _disposition(download_name, as_attachment):
+    disposition = "attachment" if as_attachment else "inline"
+    try:
+        download_name.encode("ascii")
+        return disposition, {"filename": download_name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", download_name).encode("ascii", "ignore").decode("ascii")
+        return disposition, {"filename": simple, "filename*": f"UTF-8''{quote(download_name, safe='')}"}
+
+
+def _iter_chunks(file_obj, start, stop):
+    """Lit le fichier GridFS de `start` à `stop` (exclu) par blocs de la taille des chunks"""
+    file_obj.seek(start)
+    remaining = stop - start
+    block = file_obj.chunk_size or 255 * 1024
+    try:
+        while remaining > 0:
+            data = file_obj.read(min(block, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            GRIDFS_READ_BYTES.inc(len(data))
+            yield data
+    finally:
+        file_obj.close()
+
+
+def send_gridfs_file(file_obj, mimetype=None, as_attachment=True, download_name=None, max_age=3600):
+    """
+    Réponse Flask diffusant un fichier GridFS en streaming
+
+    Gère If-None-Match (304) et une plage d'octets Range (206 / 416) ; une
+    requête de plusieurs plages reçoit le fichier complet (200).
+
+    Args:
+        file_obj (GridOut): Fichier GridFS ouvert
+        mimetype (str): Type MIME (par défaut celui stocké avec le fichier)
+        as_attachment (bool): Téléchargement (attachment) ou affichage (inline)
+        download_name (str): Nom proposé au navigateur (par défaut celui du fichier)
+        max_age (int): Durée de cache côté client (secondes)
+    """
+    length = file_obj.length
+    etag = _etag(file_obj)
+    mimetype = mimetype or getattr(file_obj, "content_type", None) or "application/octet-stream"
+    download_name = download_name or file_obj.filename or str(file_obj._id)
+
+    response = Response(mimetype=mimetype, direct_passthrough=True)
+    response.set_etag(etag)
+    response.headers["Accept-Ranges"] = "bytes"
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    if getattr(file_obj, "upload_date", None):
+        response.last_modified = file_obj.upload_date
+    disposition, options = _disposition(download_name, as_attachment)
+    response.headers.set("Content-Disposition", disposition, **options)
+
+    if request.if_none_match.contains(etag):
+        file_obj.close()
+        response.status_code = 304
+        return response
+
+    start, stop = 0, length
+    # If-Range : la plage n'est servie que si l'ETag correspond (une date
+    # seule ne permet pas de garantir la version : fichier complet)
+    if_range = request.if_range
+    range_allowed = if_range.etag == etag if (if_range.etag or if_range.date) else True
+    # Plusieurs plages (multipart/byteranges) ne sont pas gérées : fichier complet
+    if request.range and range_allowed and len(request.range.ranges) == 1:
+        byte_range = request.range.range_for_length(length)
+        if byte_range is None:
+            file_obj.close()
+            response.status_code = 416
+            response.headers["Content-Range"] = f"bytes */{length}"
+            return response
+        start, stop = byte_range
+        response.status_code = 206
+        response.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{length}"
+
+    response.response = _iter_chunks(file_obj, start, stop)
+    response.content_length = stop - start
+    return response
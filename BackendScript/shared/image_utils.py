@@ -1,36 +1,195 @@
-import pyautogui
 import cv2
 import numpy as np
+from selenium.webdriver.common.action_chains import ActionChains
 from shared.logger import logger
+from shared.template_matcher import matcher, to_grayscale
 
-def click_on_image(image_path, confidence=0.9, timeout=10):
+# Script exécuté dans le frame courant : convertit un point de la capture
+# (coordonnées de la fenêtre principale) en élément + décalage depuis son centre
+_ELEMENT_AT_POINT_JS = """
+var x = arguments[0], y = arguments[1], w = window;
+while (w.frameElement) {
+    var r = w.frameElement.getBoundingClientRect();
+    x -= r.left + w.frameElement.clientLeft;
+    y -= r.top + w.frameElement.clientTop;
+    w = w.parent;
+}
+var el = document.elementFromPoint(x, y);
+if (!el) { return null; }
+var b = el.getBoundingClientRect();
+return [el, x - (b.left + b.width / 2), y - (b.top + b.height / 2)];
+"""
+
+
+def _pyautogui():
+    # Import différé : pyautogui exige un affichage, absent en mode headless
+    import pyautogui
+    return pyautogui
+
+
+def _desktop_capture():
+    """Capture du bureau en niveaux de gris"""
+    return to_grayscale(_pyautogui().screenshot())
+
+
+def _page_capture(driver):
+    """Capture de la page en niveaux de gris"""
+    png = np.frombuffer(driver.get_screenshot_as_png(), dtype=np.uint8)
+    return cv2.imdecode(png, cv2.IMREAD_GRAYSCALE)
+
+
+def _capture_source(driver):
+    """Source de capture : le dernier résultat d'une image est mémorisé par bureau ou session"""
+    return "desktop" if driver is None else getattr(driver, "session_id", None) or id(driver)
+
+
+def _device_pixel_ratio(driver):
+    return float(driver.execute_script("return window.devicePixelRatio || 1") or 1)
+
+
+def locate_on_screen(image_path, confidence=0.9, driver=None, region=None, timeout=0, poll_interval=0.2):
+    """
+    Cherche une image à l'écran sans cliquer
+
+    Args:
+        image_path (str): Chemin vers l'image à trouver
+        confidence (float): Niveau de confiance pour la correspondance (0-1)
+        driver: Si fourni, la recherche se fait dans la capture de la page
+            (mode headless) et la position est exprimée en pixels CSS
+        region (tuple): Zone de recherche (left, top, width, height)
+        timeout (float): Temps maximum de recherche en secondes (0 = une tentative)
+        poll_interval (float): Délai entre deux tentatives en secondes
+
+    Returns:
+        Match (left, top, width, height, confidence) ou None si l'image n'est pas visible
+    """
+    if driver is None:
+        return matcher.locate(_desktop_capture, image_path, confidence, region, timeout, poll_interval,
+                              source=_capture_source(None))
+
+    ratio = _device_pixel_ratio(driver)
+    if region is not None:
+        region = tuple(value * ratio for value in region)
+    found = matcher.locate(lambda: _page_capture(driver), image_path, confidence, region, timeout, poll_interval,
+                           source=_capture_source(driver))
+    return found.scaled(ratio) if found else None
+
+
+def locate_images_on_screen(image_paths, confidence=0.9, driver=None, region=None, timeout=0, poll_interval=0.2, require_all=False):
+    """
+    Cherche plusieurs images dans une seule capture d'écran
+
+    Permet de savoir quelle boîte de dialogue est apparue parmi plusieurs
+    possibles sans refaire une capture par image.
+
+    Args:
+        image_paths (list): Chemins des images à trouver
+        confidence (float | dict): Niveau de confiance, commun ou par image
+        driver: Si fourni, la recherche se fait dans la capture de la page
+            (mode headless) et les positions sont exprimées en pixels CSS
+        region (tuple): Zone de recherche (left, top, width, height)
+        timeout (float): Temps maximum de recherche en secondes (0 = une tentative)
+        poll_interval (float): Délai entre deux tentatives en secondes
+        require_all (bool): Attendre que toutes les images soient visibles
+
+    Returns:
+        dict: chemin -> Match (left, top, width, height, confidence) des images trouvées
+    """
+    if driver is None:
+        return matcher.locate_many(_desktop_capture, image_paths, confidence, region, timeout, poll_interval, require_all,
+                                   source=_capture_source(None))
+
+    ratio = _device_pixel_ratio(driver)
+    if region is not None:
+        region = tuple(value * ratio for value in region)
+    hits = matcher.locate_many(lambda: _page_capture(driver), image_paths, confidence, region, timeout, poll_interval, require_all,
+                               source=_capture_source(driver))
+    return {path: found.scaled(ratio) for path, found in hits.items()}
+
+
+def click_in_page(driver, x, y):
+    """Clique dans la page à une position de la fenêtre principale (pixels CSS)"""
+    target = driver.execute_script(_ELEMENT_AT_POINT_JS, x, y)
+    if not target:
+        return False
+    element, offset_x, offset_y = target
+    ActionChains(driver).move_to_element_with_offset(element, int(offset_x), int(offset_y)).click().perform()
+    return True
+
+
+def click_at(location, driver=None):
+    """Clique au centre d'une image déjà localisée (Match)"""
+    center_x, center_y = location.center
+    if driver is not None:
+        return click_in_page(driver, center_x, center_y)
+    _pyautogui().click(center_x, center_y)
+    return True
+
+
+def click_on_image(image_path, confidence=0.9, timeout=10, driver=None, region=None):
     """
     Cherche et clique sur une image à l'écran
-    
+
     Args:
         image_path (str): Chemin vers l'image à trouver
         confidence (float): Niveau de confiance pour la correspondance (0-1)
         timeout (int): Temps maximum d'attente en secondes
+        driver: Si fourni, l'image est cherchée dans la capture de la page et
+            le clic est envoyé au navigateur (mode headless)
+        region (tuple): Zone de recherche (left, top, width, height)
     """
     try:
-        # Localise l'image à l'écran
-        location = pyautogui.locateOnScreen(
-            image_path,
-            confidence=confidence,
-            grayscale=True
-        )
-        
+        # Localise l'image à l'écran, en réessayant jusqu'au délai
+        location = locate_on_screen(image_path, confidence=confidence, driver=driver, region=region, timeout=timeout)
+
         if location:
-            # Calcule le centre de l'image
-            center = pyautogui.center(location)
-            # Clique sur l'image
-            pyautogui.click(center)
-            logger.info(f"Clic réussi sur l'image: {image_path}")
+            # Clique au centre de l'image
+            if not click_at(location, driver):
+                logger.error(f"Aucun élément cliquable sous l'image: {image_path}")
+                return False
+            logger.info(f"Clic réussi sur l'image: {image_path} (confiance {location.confidence:.2f})")
             return True
         else:
-            logger.error(f"Image non trouvée: {image_path}")
+            logger.error(f"Image non trouvée après {timeout}s: {image_path}")
             return False
-            
+
     except Exception as e:
         logger.error(f"Erreur lors du clic sur l'image {image_path}: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+
+def click_best_hit(hits, driver=None):
+    """
+    Clique sur l'image de meilleur score parmi les résultats de
+    locate_images_on_screen
+
+    Returns:
+        str: Chemin de l'image cliquée, ou None
+    """
+    if not hits:
+        return None
+    image_path, location = max(hits.items(), key=lambda item: item[1].confidence)
+    if not click_at(location, driver):
+        logger.error(f"Aucun élément cliquable sous l'image: {image_path}")
+        return None
+    logger.info(f"Clic réussi sur l'image: {image_path} (confiance {location.confidence:.2f})")
+    return image_path
+
+
+def click_first_image(image_paths, confidence=0.9, timeout=10, driver=None, region=None):
+    """
+    Attend qu'une des images apparaisse et clique sur celle de meilleur score
+
+    Returns:
+        str: Chemin de l'image cliquée, ou None si aucune n'est apparue
+    """
+    try:
+        hits = locate_images_on_screen(image_paths, confidence=confidence, driver=driver, region=region, timeout=timeout)
+        if not hits:
+            logger.error(f"Aucune image trouvée après {timeout}s parmi: {', '.join(image_paths)}")
+            return None
+        return click_best_hit(hits, driver)
+
+    except Exception as e:
+        logger.error(f"Erreur lors du clic sur les images {', '.join(image_paths)}: {str(e)}")
+        return None
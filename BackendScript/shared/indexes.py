@@ -0,0 +1,140 @@
+from typing import NamedTuple
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from shared.config import JOB_RETENTION_DAYS
+from shared.job_queue import JOB_INDEXES
+from shared.logger import logger
+from shared.rapport_listing import RAPPORT_LIST_INDEXES
+from shared.report_cache import ReportCache
+
+# Index requis par le backend, déclarés en un seul endroit et appliqués au
+# démarrage (apply_indexes). La création est idempotente : un index déjà
+# présent avec les mêmes clés et options n'est pas recréé.
+
+DUPLICATE_KEY = 11000
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: list
+    options: dict = {}
+
+
+def _specs(collection, indexes):
+    return [IndexSpec(collection, keys, options) for keys, options in indexes]
+
+
+INDEXES = [
+    # Chaque mise à jour de progression et chaque lecture d'état cible un test_id
+    IndexSpec("rapport", [("test_id", ASCENDING)], {"unique": True}),
+    IndexSpec("rapport", [("campaign_id", ASCENDING)], {"sparse": True}),
+    *[IndexSpec("rapport", keys) for keys in RAPPORT_LIST_INDEXES],
+    IndexSpec("campagne", [("campaign_id", ASCENDING)], {"unique": True}),
+    IndexSpec("scenarios", [("module", ASCENDING), ("scenario", ASCENDING)], {"unique": True}),
+    # Recherche des doublons (clean_duplicate_tests) et historique par scénario
+    IndexSpec("test_results", [("module", ASCENDING), ("scenario", ASCENDING), ("execution_time", ASCENDING)]),
+    IndexSpec("test_results", [("test_id", ASCENDING)]),
+    IndexSpec("test_results", [("execution_date", DESCENDING)]),
+    # GridFS : téléchargement par nom de fichier et cache des rapports
+    IndexSpec("fs.files", [("filename", ASCENDING), ("uploadDate", ASCENDING)]),
+    *_specs("fs.files", ReportCache.INDEXES),
+    IndexSpec("fs.chunks", [("files_id", ASCENDING), ("n", ASCENDING)], {"unique": True}),
+    # Files de jobs ; les jobs terminés sont purgés après JOB_RETENTION_DAYS
+    *_specs("test_jobs", JOB_INDEXES),
+    *_specs("report_jobs", JOB_INDEXES),
+    IndexSpec("test_jobs", [("finished_at", ASCENDING)], {"expireAfterSeconds": JOB_RETENTION_DAYS * 86400}),
+    IndexSpec("report_jobs", [("finished_at", ASCENDING)], {"expireAfterSeconds": JOB_RETENTION_DAYS * 86400}),
+]
+
+
+# Options comparées entre la déclaration et l'index existant
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds")
+
+
+def _pattern(keys):
+    return tuple((field, int(direction) if isinstance(direction, float) else direction) for field, direction in keys)
+
+
+def _existing(collection):
+    """Index existants : motif de clés -> (nom, informations)"""
+    return {_pattern(info["key"]): (name, info) for name, info in collection.index_information().items()}
+
+
+def _options_differ(spec, info):
+    return any(
+        bool(spec.options.get(option)) != bool(info.get(option))
+        if option != "expireAfterSeconds" else spec.options.get(option) != info.get(option)
+        for option in COMPARED_OPTIONS
+    )
+
+
+def _create(collection, spec, entry):
+    try:
+        name = collection.create_index(spec.keys, **spec.options)
+        entry["created"].append(name)
+        return name, dict(spec.options)
+    except OperationFailure as e:
+        if e.code == DUPLICATE_KEY and spec.options.get("unique"):
+            # Des doublons empêchent l'index unique : index simple en
+            # attendant le nettoyage, pour ne pas garder un parcours complet
+            options = {k: v for k, v in spec.options.items() if k != "unique"}
+            name = collection.create_index(spec.keys, **options)
+            entry["failed"].append({"index": name, "error": "doublons : index créé sans unicité"})
+            return name, options
+        entry["failed"].append({"keys": spec.keys, "error": str(e)})
+        return None, None
+
+
+def apply_indexes(db, specs=INDEXES, repair=False):
+    """
+    Crée les index manquants et signale les écarts avec la déclaration
+
+    Args:
+        repair (bool): Recréer les index dont les options diffèrent de la
+            déclaration (ex. index unique après suppression des doublons)
+
+    Returns:
+        dict: Par collection, index créés, présents, aux options différentes,
+            en échec et non déclarés
+    """
+    report = {}
+    existing_by_collection = {}
+    for spec in specs:
+        entry = report.setdefault(
+            spec.collection, {"created": [], "present": [], "mismatched": [], "failed": [], "extra": []}
+        )
+        collection = db[spec.collection]
+        existing = existing_by_collection.setdefault(spec.collection, _existing(collection))
+        pattern = _pattern(spec.keys)
+
+        if pattern in existing:
+            name, info = existing[pattern]
+            if not _options_differ(spec, info):
+                entry["present"].append(name)
+                continue
+            if not repair:
+                entry["mismatched"].append(name)
+                continue
+            collection.drop_index(name)
+            logger.warning(f"Index {name} de {spec.collection} recréé avec les options {spec.options}")
+
+        name, options = _create(collection, spec, entry)
+        if name:
+            existing[pattern] = (name, options)
+
+    for collection_name, existing in existing_by_collection.items():
+        declared = {_pattern(spec.keys) for spec in specs if spec.collection == collection_name}
+        report[collection_name]["extra"] = sorted(
+            name for pattern, (name, _) in existing.items() if pattern not in declared and name != "_id_"
+        )
+
+    for collection_name, entry in report.items():
+        if entry["created"]:
+            logger.info(f"Index créés sur {collection_name}: {entry['created']}")
+        if entry["mismatched"]:
+            logger.warning(f"Index aux options différentes de la déclaration sur {collection_name}: {entry['mismatched']}")
+        if entry["failed"]:
+            logger.warning(f"Index en échec sur {collection_name}: {entry['failed']}")
+        if entry["extra"]:
+            logger.info(f"Index non déclarés sur {collection_name}: {entry['extra']}")
+    return report
@@ -0,0 +1,192 @@
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from shared.logger import logger
+
+# Statuts d'un job dans la file persistante
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Index de la file : unicité du job et réservation du plus ancien job en attente
+JOB_INDEXES = [
+    ([("job_id", ASCENDING)], {"unique": True}),
+    ([("status", ASCENDING), ("created_at", ASCENDING)], {}),
+    ([("status", ASCENDING), ("lease_expires", ASCENDING)], {}),
+]
+
+
+def utcnow():
+    """Horodatage UTC : les baux sont comparés entre machines aux fuseaux différents"""
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """
+    File de jobs persistante stockée dans une collection MongoDB.
+
+    Les workers réservent un job de façon atomique (find_one_and_update) et
+    obtiennent un bail (lease) qu'ils doivent renouveler par heartbeat. Un bail
+    expiré signifie que le worker a disparu : le job est alors remis en file ou
+    marqué en échec après `max_attempts` tentatives.
+    """
+
+    def __init__(self, collection, lease_seconds=60, max_attempts=2):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def ensure_indexes(self):
+        for keys, options in JOB_INDEXES:
+            self.collection.create_index(keys, **options)
+
+    def _lease_deadline(self):
+        return utcnow() + timedelta(seconds=self.lease_seconds)
+
+    def _new_job(self, job_id, payload=None):
+        return {
+            "job_id": job_id,
+            "status": JOB_QUEUED,
+            "payload": payload or {},
+            "attempts": 0,
+            "created_at": utcnow(),
+            "lease_owner": None,
+            "lease_expires": None
+        }
+
+    def enqueue(self, job_id, payload=None, requeue_finished=False):
+        """
+        Ajoute un job en fin de file. Retourne False si le job existe déjà.
+
+        Args:
+            requeue_finished (bool): Remettre en file un job déjà terminé
+                (ou en échec) au lieu de l'ignorer
+        """
+        try:
+            self.collection.insert_one(self._new_job(job_id, payload))
+            return True
+        except DuplicateKeyError:
+            if requeue_finished:
+                fields = self._new_job(job_id, payload)
+                result = self.collection.update_one(
+                    {"job_id": job_id, "status": {"$in": [JOB_DONE, JOB_FAILED]}},
+                    {"$set": fields, "$unset": {"error": "", "finished_at": ""}}
+                )
+                if result.modified_count:
+                    return True
+            logger.warning(f"Job {job_id} déjà présent dans la file")
+            return False
+
+    def enqueue_many(self, job_ids):
+        """Ajoute plusieurs jobs en une seule écriture, dans l'ordre donné"""
+        if not job_ids:
+            return 0
+        try:
+            result = self.collection.insert_many([self._new_job(job_id) for job_id in job_ids], ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            logger.warning(f"Jobs déjà présents dans la file ignorés: {len(e.details.get('writeErrors', []))}")
+            return e.details.get("nInserted", 0)
+
+    def claim(self, worker_id):
+        """Réserve atomiquement le plus ancien job en attente, ou retourne None"""
+        now = utcnow()
+        return self.collection.find_one_and_update(
+            {"status": JOB_QUEUED},
+            {
+                "$set": {
+                    "status": JOB_RUNNING,
+                    "lease_owner": worker_id,
+                    "lease_expires": self._lease_deadline(),
+                    "claimed_at": now,
+                    "heartbeat_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", ASCENDING), ("_id", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def heartbeat(self, job_id, worker_id):
+        """Prolonge le bail d'un job. Retourne False si le bail a été perdu."""
+        result = self.collection.update_one(
+            {"job_id": job_id, "status": JOB_RUNNING, "lease_owner": worker_id},
+            {"$set": {"lease_expires": self._lease_deadline(), "heartbeat_at": utcnow()}}
+        )
+        return result.matched_count == 1
+
+    def complete(self, job_id, worker_id, error=None):
+        """Marque un job comme terminé (ou en échec si `error` est fourni)"""
+        update = {
+            "status": JOB_FAILED if error else JOB_DONE,
+            "finished_at": utcnow(),
+            "lease_expires": None
+        }
+        if error:
+            update["error"] = error
+        self.collection.update_one(
+            {"job_id": job_id, "lease_owner": worker_id},
+            {"$set": update}
+        )
+
+    def recover_stale(self):
+        """
+        Traite les jobs dont le bail a expiré (worker arrêté ou planté).
+
+        Returns:
+            tuple: (liste des job_id remis en file, liste des job_id en échec)
+        """
+        requeued, failed = [], []
+        stale_query = {"status": JOB_RUNNING, "lease_expires": {"$lt": utcnow()}}
+        for job in self.collection.find(stale_query, {"job_id": 1, "attempts": 1, "lease_expires": 1}):
+            # Le filtre sur lease_expires évite d'écraser un job repris entre-temps
+            guard = {"_id": job["_id"], "status": JOB_RUNNING, "lease_expires": job["lease_expires"]}
+            if job.get("attempts", 0) < self.max_attempts:
+                result = self.collection.update_one(
+                    guard,
+                    {"$set": {"status": JOB_QUEUED, "lease_owner": None, "lease_expires": None}}
+                )
+                if result.modified_count:
+                    requeued.append(job["job_id"])
+            else:
+                result = self.collection.update_one(
+                    guard,
+                    {"$set": {
+                        "status": JOB_FAILED,
+                        "error": "Bail expiré : le worker a été interrompu",
+                        "finished_at": utcnow(),
+                        "lease_expires": None
+                    }}
+                )
+                if result.modified_count:
+                    failed.append(job["job_id"])
+        if requeued or failed:
+            logger.warning(f"Jobs interrompus - remis en file: {requeued}, en échec: {failed}")
+        return requeued, failed
+
+    def depth(self):
+        return self.collection.count_documents({"status": JOB_QUEUED})
+
+    def running_count(self):
+        return self.collection.count_documents({"status": JOB_RUNNING})
+
+    def queued_ids(self, limit=50):
+        cursor = self.collection.find(
+            {"status": JOB_QUEUED}, {"job_id": 1}
+        ).sort([("created_at", ASCENDING), ("_id", ASCENDING)]).limit(limit)
+        return [job["job_id"] for job in cursor]
+
+    def position(self, job_id):
+        """Position d'un job en attente dans la file (1 = prochain), ou None"""
+        job = self.collection.find_one({"job_id": job_id, "status": JOB_QUEUED}, {"created_at": 1})
+        if not job:
+            return None
+        # Les dates MongoDB sont à la milliseconde : départage par _id
+        return self.collection.count_documents({
+            "status": JOB_QUEUED,
+            "$or": [
+                {"created_at": {"$lt": job["created_at"]}},
+                {"created_at": job["created_at"], "_id": {"$lt": job["_id"]}}
+            ]
+        }) + 1
@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from shared.job_queue import utcnow
+from shared.logger import logger
+from shared.metrics import MAINTENANCE_DELETED
+
+# Nettoyage périodique des résultats de tests, exécuté côté serveur :
+# les identifiants à supprimer sont calculés par agrégation (sans charger les
+# documents) puis supprimés par lots avec delete_many.
+
+# Un résultat est un doublon d'un autre s'il a le même module, le même
+# scénario et la même durée d'exécution ; le plus récent est conservé
+DUPLICATE_KEY_FIELDS = ("module", "scenario", "execution_time")
+DEFAULT_BATCH_SIZE = 1000
+
+
+def delete_entries_without_module(collection, dry_run=False):
+    """Supprime (ou compte, en dry_run) les documents sans scénario"""
+    query = {"scenario": None}
+    if dry_run:
+        return collection.count_documents(query)
+    deleted = collection.delete_many(query).deleted_count
+    MAINTENANCE_DELETED.inc(deleted, kind="without_module")
+    return deleted
+
+
+def duplicate_ids(collection, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Identifiants des doublons à supprimer, par lots
+
+    Le tri et le regroupement sont faits par MongoDB et seuls les _id sont
+    conservés dans les groupes ; le document le plus récent (execution_date)
+    de chaque groupe est exclu.
+    """
+    pipeline = [
+        {"$match": {"scenario": {"$ne": None}}},
+        {"$sort": {"execution_date": -1}},
+        {"$group": {
+            "_id": {field: f"${field}" for field in DUPLICATE_KEY_FIELDS},
+            "keep": {"$first": "$_id"},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$unwind": "$ids"},
+        {"$match": {"$expr": {"$ne": ["$ids", "$keep"]}}},
+        {"$project": {"_id": 0, "drop": "$ids"}}
+    ]
+    batch = []
+    for doc in collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size):
+        batch.append(doc["drop"])
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def delete_duplicates(collection, dry_run=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Supprime (ou compte, en dry_run) les doublons ; un delete_many par lot"""
+    total = 0
+    for batch in duplicate_ids(collection, batch_size):
+        if dry_run:
+            total += len(batch)
+            continue
+        deleted = collection.delete_many({"_id": {"$in": batch}}).deleted_count
+        MAINTENANCE_DELETED.inc(deleted, kind="duplicate")
+        total += deleted
+    return total
+
+
+def run_cleanup(db, dry_run=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Nettoyage complet : résultats sans scénario et doublons de test_results,
+    rapports sans scénario
+
+    Returns:
+        dict: Nombre de documents supprimés (ou à supprimer en dry_run) par
+            collection et par type
+    """
+    started = datetime.now()
+    test_results = db["test_results"]
+    report = {
+        "dry_run": dry_run,
+        "started_at": started,
+        "test_results": {
+            "without_module": delete_entries_without_module(test_results, dry_run),
+            "duplicates": delete_duplicates(test_results, dry_run, batch_size)
+        },
+        "rapport": {
+            "without_module": delete_entries_without_module(db["rapport"], dry_run)
+        }
+    }
+    report["duration"] = round((datetime.now() - started).total_seconds(), 3)
+    action = "à supprimer (dry run)" if dry_run else "supprimés"
+    logger.info(
+        f"Nettoyage : test_results {report['test_results']} et rapport {report['rapport']} {action}"
+        f" en {report['duration']} s"
+    )
+    return report
+
+
+class MaintenanceScheduler:
+    """
+    Exécute une tâche de maintenance à intervalle régulier.
+
+    Avec plusieurs processus (workers gunicorn), un verrou à durée limitée
+    dans la collection `locks` garantit qu'une seule exécution a lieu par
+    intervalle.
+    """
+
+    def __init__(self, task, locks, name, interval_seconds):
+        """
+        Args:
+            task (callable): Tâche exécutée, sans argument
+            locks: Collection des verrous de maintenance
+            name (str): Nom de la tâche (identifiant du verrou)
+            interval_seconds (int): Intervalle entre deux exécutions ; 0 désactive
+        """
+        self.task = task
+        self.locks = locks
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.last_report = None
+        self._owner = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if not self.interval_seconds:
+            return
+        # Après un fork, le processus enfant démarre son propre thread
+        pid = os.getpid()
+        if self._owner == pid:
+            return
+        with self._lock:
+            if self._owner != pid:
+                self._owner = pid
+                threading.Thread(target=self._run, name=f"maintenance-{self.name}", daemon=True).start()
+
+    def _acquire(self):
+        """Réserve l'exécution de l'intervalle en cours ; False si déjà prise"""
+        # Verrou partagé entre machines : dates en UTC
+        now = utcnow()
+        try:
+            self.locks.update_one(
+                {"_id": self.name, "until": {"$lte": now}},
+                {"$set": {"until": now + timedelta(seconds=self.interval_seconds), "owner": os.getpid()}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # Verrou encore valide : l'upsert entre en conflit avec le document existant
+            return False
+
+    def run_once(self):
+        if not self._acquire():
+            return None
+        try:
+            self.last_report = self.task()
+        except Exception as e:
+            logger.error(f"Erreur de la tâche de maintenance {self.name}: {str(e)}", exc_info=True)
+        return self.last_report
+
+    def _run(self):
+        while True:
+            self.run_once()
+            time.sleep(self.interval_seconds)
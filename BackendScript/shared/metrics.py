@@ -0,0 +1,208 @@
+import bisect
+import threading
+import time
+from pymongo import monitoring
+
+# Métriques exposées au format texte Prometheus (/metrics), sans dépendance :
+# compteurs, jauges et histogrammes en mémoire, protégés par un verrou par métrique.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Jauge ; `callback` (optionnel) est appelé à chaque collecte et retourne {labels tuple: valeur}"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        if self.callback is not None:
+            values = self.callback()
+            with self._lock:
+                self._values = dict(values)
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """Mesure la durée d'un bloc `with`"""
+        return _Timer(self, labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, ('le', _number(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # Un nom en double (ex. module importé deux fois) fausserait l'exposition
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # Une jauge en échec (ex. MongoDB indisponible) ne bloque pas la collecte
+                lines.append(f"# {metric.name} indisponible: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+TESTS_TOTAL = registry.counter(
+    "ikos_tests_total", "Tests exécutés, par module et statut final", ("module", "status"))
+TEST_DURATION = registry.histogram(
+    "ikos_test_duration_seconds", "Durée totale d'un test", ("module",),
+    buckets=(5, 10, 20, 30, 60, 90, 120, 180, 300, 600))
+STEP_DURATION = registry.histogram(
+    "ikos_step_duration_seconds", "Durée des étapes de test", ("module", "step"),
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300))
+PDF_BUILD = registry.histogram(
+    "ikos_pdf_build_seconds", "Durée de génération d'un rapport PDF", ("report",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30))
+REPORT_CACHE = registry.counter(
+    "ikos_report_cache_total", "Cache des rapports PDF : lectures (hit/miss) et suppressions", ("outcome",))
+GRIDFS_READ_BYTES = registry.counter("ikos_gridfs_read_bytes_total", "Octets lus depuis GridFS")
+GRIDFS_WRITE_BYTES = registry.counter("ikos_gridfs_write_bytes_total", "Octets écrits dans GridFS")
+MAINTENANCE_DELETED = registry.counter(
+    "ikos_maintenance_deleted_total", "Documents supprimés par le nettoyage de la base", ("kind",))
+SOCKETIO_EMITS = registry.counter("ikos_socketio_emits_total", "Événements Socket.IO émis", ("event",))
+HTTP_REQUESTS = registry.histogram(
+    "ikos_http_request_duration_seconds", "Durée des requêtes HTTP", ("method", "endpoint", "status"))
+MONGO_COMMANDS = registry.histogram(
+    "ikos_mongodb_command_seconds", "Durée des commandes MongoDB", ("command", "outcome"))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Mesure la latence des commandes MongoDB (pymongo event_listeners)"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMANDS.observe(event.duration_micros / 1e6, command=event.command_name, outcome="success")
+
+    def failed(self, event):
+        MONGO_COMMANDS.observe(event.duration_micros / 1e6, command=event.command_name, outcome="failure")
@@ -0,0 +1,123 @@
+import os
+import threading
+import gridfs
+from pymongo import MongoClient
+from shared.config import (
+    MONGO_URI, MONGO_DB, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS, MONGO_WRITE_CONCERN
+)
+from shared.logger import logger
+from shared.metrics import MongoCommandMetrics
+
+# Client MongoDB partagé par l'application, les tests et les scripts.
+#
+# Le client est créé au premier appel avec connect=False : aucune connexion
+# n'est ouverte à l'import, ni dans le processus maître avant le fork des
+# workers gunicorn. Un processus issu d'un fork obtient son propre client
+# (et son propre pool de connexions) au lieu de réutiliser celui du parent.
+#
+# Les modules gardent des DatabaseProxy / CollectionProxy / GridFSProxy au
+# niveau module : ces objets résolvent le client à chaque utilisation, et
+# jamais à l'import.
+
+_client = None
+_client_pid = None
+_gridfs = {}
+_lock = threading.Lock()
+
+
+def _write_concern():
+    return int(MONGO_WRITE_CONCERN) if MONGO_WRITE_CONCERN.isdigit() else MONGO_WRITE_CONCERN
+
+
+def get_client():
+    """Client MongoDB du processus courant (créé à la demande)"""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _client = MongoClient(
+                MONGO_URI,
+                connect=False,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS or None,
+                w=_write_concern(),
+                appname="test-ikos",
+                # Les commandes sont chronométrées pour /metrics
+                event_listeners=[MongoCommandMetrics()]
+            )
+            _client_pid = pid
+            _gridfs.clear()
+            logger.info(f"Client MongoDB créé pour le processus {pid} (pool max {MONGO_MAX_POOL_SIZE})")
+    return _client
+
+
+def get_database(name=None):
+    """Base MongoDB (MONGO_DB par défaut)"""
+    return get_client()[name or MONGO_DB]
+
+
+def get_gridfs(name=None):
+    """Instance GridFS de la base (client du processus courant)"""
+    database = get_database(name)
+    # Le cache est vidé à chaque création de client (voir get_client)
+    fs = _gridfs.get(database.name)
+    if fs is None:
+        fs = _gridfs.setdefault(database.name, gridfs.GridFS(database))
+    return fs
+
+
+class CollectionProxy:
+    """Collection résolue à chaque utilisation sur le client du processus courant"""
+
+    def __init__(self, name, database=None):
+        self.name = name
+        self.database_name = database
+
+    def __getattr__(self, attribute):
+        return getattr(get_database(self.database_name)[self.name], attribute)
+
+    def __getitem__(self, name):
+        return CollectionProxy(f"{self.name}.{name}", self.database_name)
+
+    def __repr__(self):
+        return f"CollectionProxy({self.database_name or MONGO_DB}.{self.name})"
+
+
+class DatabaseProxy:
+    """Base résolue à chaque utilisation ; db[nom] retourne un CollectionProxy"""
+
+    def __init__(self, name=None):
+        self.database_name = name
+
+    def __getitem__(self, name):
+        return CollectionProxy(name, self.database_name)
+
+    def __getattr__(self, attribute):
+        return getattr(get_database(self.database_name), attribute)
+
+
+class GridFSProxy:
+    """GridFS résolu à chaque utilisation sur le client du processus courant"""
+
+    def __init__(self, name=None):
+        self.database_name = name
+
+    def __getattr__(self, attribute):
+        return getattr(get_gridfs(self.database_name), attribute)
+
+
+def close_client():
+    """Ferme le client du processus (fin des scripts en ligne de commande uniquement)"""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+        _gridfs.clear()
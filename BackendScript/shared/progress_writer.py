@@ -0,0 +1,158 @@
+import os
+import threading
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from shared.logger import logger
+
+
+class _PendingUpdate:
+    """Modifications en attente pour un test, fusionnées en un seul update"""
+
+    def __init__(self):
+        self.set = {}
+        self.push = {}
+        self.unset = set()
+
+    def merge(self, set_fields=None, push=None, unset=None):
+        for field, value in (set_fields or {}).items():
+            # Un $set remplace les ajouts en attente sur le même champ
+            self.push.pop(field, None)
+            self.unset.discard(field)
+            self.set[field] = value
+        for field, value in (push or {}).items():
+            if field in self.set and isinstance(self.set[field], list):
+                # Le champ est déjà réécrit : l'ajout est fusionné dans la valeur
+                self.set[field] = self.set[field] + [value]
+            else:
+                self.push.setdefault(field, []).append(value)
+        for field in unset or ():
+            self.set.pop(field, None)
+            self.push.pop(field, None)
+            self.unset.add(field)
+
+    def absorb(self, newer):
+        """Applique par-dessus les modifications plus récentes d'une autre mise à jour"""
+        self.merge(newer.set, None, newer.unset)
+        for field, values in newer.push.items():
+            for value in values:
+                self.merge(push={field: value})
+
+    def to_update(self):
+        update = {}
+        if self.set:
+            update["$set"] = self.set
+        if self.push:
+            update["$push"] = {field: {"$each": values} for field, values in self.push.items()}
+        if self.unset:
+            update["$unset"] = {field: "" for field in self.unset}
+        return update
+
+
+class ProgressWriter:
+    """
+    Écritures de progression des tests regroupées.
+
+    Les mises à jour sont gardées en mémoire par test et fusionnées ($set,
+    $push, $unset), puis envoyées en un seul bulk_write pour tous les tests en
+    cours, toutes les `interval` secondes ou immédiatement avec flush=True
+    (fin d'étape, fin de test).
+    """
+
+    def __init__(self, collection, interval=0.25, key="test_id"):
+        """
+        Args:
+            collection: Collection des documents de test (rapport)
+            interval (float): Délai maximum avant écriture d'une mise à jour (secondes)
+            key (str): Champ identifiant le document d'un test
+        """
+        self.collection = collection
+        self.interval = interval
+        self.key = key
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._owner = None
+
+    def _ensure_thread(self):
+        # Après un fork (workers gunicorn), le processus enfant démarre son propre thread
+        pid = os.getpid()
+        if self._owner == pid:
+            return
+        with self._lock:
+            if self._owner != pid:
+                self._owner = pid
+                threading.Thread(target=self._run, name="progress-writer", daemon=True).start()
+
+    def update(self, test_id, set_fields=None, push=None, unset=None, flush=False):
+        """
+        Ajoute une mise à jour pour un test
+
+        Args:
+            set_fields (dict): Champs à écrire ($set)
+            push (dict): Valeur à ajouter par champ tableau ($push)
+            unset (iterable): Champs à supprimer ($unset)
+            flush (bool): Écrire immédiatement toutes les mises à jour en attente ;
+                une erreur d'écriture est alors levée à l'appelant
+        """
+        with self._lock:
+            self._pending.setdefault(test_id, _PendingUpdate()).merge(set_fields, push, unset)
+        # Le thread reprend aussi les écritures en échec d'un flush immédiat
+        self._ensure_thread()
+        if flush:
+            self.flush(raise_errors=True)
+
+    def discard(self, test_id):
+        """Abandonne les mises à jour en attente d'un test (test repris par un autre worker)"""
+        with self._lock:
+            self._pending.pop(test_id, None)
+
+    def _restore(self, failed):
+        """Remet en attente les mises à jour non écrites, avant celles arrivées depuis"""
+        with self._lock:
+            for test_id, update in failed.items():
+                newer = self._pending.get(test_id)
+                if newer is not None:
+                    update.absorb(newer)
+                self._pending[test_id] = update
+
+    def flush(self, raise_errors=False):
+        """
+        Écrit toutes les mises à jour en attente en un seul bulk_write
+
+        En cas d'erreur, les mises à jour sont conservées pour la tentative
+        suivante ; l'erreur est levée si `raise_errors`.
+        """
+        # Un seul flush à la fois : les écritures d'un même test restent ordonnées
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            operations = [
+                UpdateOne({self.key: test_id}, update.to_update())
+                for test_id, update in pending.items()
+            ]
+            try:
+                self.collection.bulk_write(operations, ordered=False)
+            except Exception as e:
+                if isinstance(e, BulkWriteError):
+                    # Seules les opérations en erreur sont rejouées : un $push
+                    # déjà appliqué ne doit pas l'être deux fois
+                    failed = {error["index"] for error in e.details.get("writeErrors", [])}
+                    pending = {test_id: update for index, (test_id, update) in enumerate(pending.items()) if index in failed}
+                self._restore(pending)
+                logger.error(f"Erreur lors de l'écriture de la progression ({len(operations)} test(s)): {str(e)}")
+                if raise_errors:
+                    raise
+                return 0
+            return len(operations)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erreur du thread d'écriture de la progression: {str(e)}")
@@ -0,0 +1,152 @@
+import base64
+import json
+import re
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from shared.campaigns import FINISHED_STATUSES
+
+# Liste paginée des rapports : filtres, projection et pagination par curseur
+# (keyset sur date_creation puis _id), servie par les index de la collection.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Vues disponibles : la synthèse n'inclut ni les étapes ni la trace
+PROJECTIONS = {
+    "summary": {"steps": 0, "trace": 0, "trace_summary": 0},
+    "full": {"trace": 0},
+}
+
+# Index utilisés par le tri et les filtres de la liste
+RAPPORT_LIST_INDEXES = [
+    [("date_creation", DESCENDING), ("_id", DESCENDING)],
+    [("module", ASCENDING), ("date_creation", DESCENDING), ("_id", DESCENDING)],
+    [("module", ASCENDING), ("scenario", ASCENDING), ("date_creation", DESCENDING)],
+    [("status", ASCENDING), ("date_creation", DESCENDING), ("_id", DESCENDING)],
+]
+
+
+def parse_date(value, name):
+    """Date ISO 8601 (ex. 2024-05-01 ou 2024-05-01T08:30:00)"""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Date invalide pour '{name}': {value}")
+
+
+def encode_cursor(doc):
+    payload = {
+        "d": doc["date_creation"].isoformat() if isinstance(doc.get("date_creation"), datetime) else None,
+        "id": str(doc["_id"])
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(token):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        date = datetime.fromisoformat(payload["d"]) if payload.get("d") else None
+        return date, ObjectId(payload["id"])
+    except Exception:
+        raise ValueError("Curseur de pagination invalide")
+
+
+def rapport_filters(module=None, scenario=None, status=None, success=None, since=None, until=None, search=None):
+    """
+    Construit le filtre MongoDB de la liste
+
+    Args:
+        status (str): Un ou plusieurs statuts séparés par des virgules
+        success (bool): Tests réussis (True) ou non (False)
+        since, until (datetime): Bornes sur date_creation
+        search (str): Texte recherché (sans casse) dans module, scénario et test_id
+    """
+    query = {}
+    if module:
+        query["module"] = module
+    if scenario:
+        query["scenario"] = scenario
+    if status:
+        statuses = [s.strip() for s in status.split(",") if s.strip()]
+        query["status"] = statuses[0] if len(statuses) == 1 else {"$in": statuses}
+    if success is not None:
+        query["success"] = True if success else {"$ne": True}
+    if since or until:
+        query["date_creation"] = {}
+        if since:
+            query["date_creation"]["$gte"] = since
+        if until:
+            query["date_creation"]["$lt"] = until
+    if search and search.strip():
+        pattern = {"$regex": re.escape(search.strip()), "$options": "i"}
+        query["$or"] = [{field: pattern} for field in ("module", "scenario", "test_id")]
+    return query
+
+
+# Tests pas encore terminés, ni réussis ni en échec
+IN_PROGRESS_STATUSES = ["pending", "running"]
+
+
+def rapport_stats(collection, query):
+    """
+    Totaux de la liste filtrée, calculés par MongoDB
+
+    Un échec est un test terminé (FINISHED_STATUSES) sans succès ; les tests en
+    attente ou en cours sont comptés à part (in_progress).
+    """
+    finished = {"$in": ["$status", FINISHED_STATUSES]}
+    # success absent (test en erreur avant la fin) : non réussi
+    failed = {"$ne": [{"$ifNull": ["$success", False]}, True]}
+    pipeline = [
+        {"$match": query},
+        {"$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            "success": {"$sum": {"$cond": [{"$eq": ["$success", True]}, 1, 0]}},
+            "fail": {"$sum": {"$cond": [{"$and": [finished, failed]}, 1, 0]}},
+            "in_progress": {"$sum": {"$cond": [{"$in": ["$status", IN_PROGRESS_STATUSES]}, 1, 0]}},
+            "avg_execution_time": {"$avg": "$execution_time"}
+        }},
+        {"$project": {"_id": 0}}
+    ]
+    return next(collection.aggregate(pipeline), None) or {
+        "total": 0, "success": 0, "fail": 0, "in_progress": 0, "avg_execution_time": None
+    }
+
+
+def _after(date, object_id, descending):
+    """Filtre des documents qui suivent (date, _id) dans l'ordre de tri"""
+    # Les rapports sans date_creation (anciens documents) se trouvent en fin
+    # de liste en ordre décroissant et en début en ordre croissant
+    op = "$lt" if descending else "$gt"
+    if date is None:
+        same = {"date_creation": None, "_id": {op: object_id}}
+        return same if descending else {"$or": [same, {"date_creation": {"$ne": None}}]}
+    conditions = [
+        {"date_creation": {op: date}},
+        {"date_creation": date, "_id": {op: object_id}}
+    ]
+    if descending:
+        conditions.append({"date_creation": None})
+    return {"$or": conditions}
+
+
+def list_rapports_page(collection, query, view="summary", limit=DEFAULT_PAGE_SIZE, cursor=None, descending=True):
+    """
+    Retourne une page de rapports et le curseur de la page suivante (ou None)
+    """
+    if view not in PROJECTIONS:
+        raise ValueError(f"Vue inconnue '{view}' (attendu: {', '.join(PROJECTIONS)})")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    if cursor:
+        query = {"$and": [query, _after(*decode_cursor(cursor), descending)]}
+
+    direction = DESCENDING if descending else ASCENDING
+    docs = list(
+        collection.find(query, PROJECTIONS[view])
+        .sort([("date_creation", direction), ("_id", direction)])
+        .limit(limit + 1)
+    )
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
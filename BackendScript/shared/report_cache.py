@@ -0,0 +1,143 @@
+import hashlib
+import json
+import threading
+from datetime import datetime
+from gridfs.errors import NoFile
+from pymongo import ASCENDING
+from shared.logger import logger
+from shared.metrics import REPORT_CACHE, GRIDFS_WRITE_BYTES
+
+
+class ReportCache:
+    """
+    Cache des rapports PDF dans GridFS, adressé par le contenu.
+
+    La clé est un hash des données du rapport (étapes, en-tête) et de la
+    version du gabarit : un rapport n'est rendu qu'au premier téléchargement,
+    puis servi depuis GridFS. Au-delà de `budget_bytes`, les rapports les
+    moins récemment lus sont supprimés (LRU).
+    """
+
+    INDEXES = [
+        ([("metadata.cache_key", ASCENDING)], {"sparse": True}),
+        ([("metadata.last_access", ASCENDING)], {"sparse": True}),
+    ]
+
+    def __init__(self, fs, database, budget_bytes, version=1, bucket="fs"):
+        """
+        Args:
+            fs (GridFS): Instance GridFS où sont stockés les rapports
+            database: Base MongoDB de l'instance GridFS
+            budget_bytes (int): Taille maximale cumulée des rapports en cache
+            version (int): Version du gabarit PDF (invalide le cache si modifiée)
+            bucket (str): Nom du bucket GridFS
+        """
+        self.fs = fs
+        self.files = database[f"{bucket}.files"]
+        self.budget_bytes = budget_bytes
+        self.version = version
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def ensure_indexes(self):
+        for keys, options in self.INDEXES:
+            self.files.create_index(keys, **options)
+
+    def key(self, steps, **context):
+        """Hash SHA-256 des étapes, du contexte d'en-tête et de la version du gabarit"""
+        content = json.dumps(
+            {"version": self.version, "steps": steps, "context": context},
+            sort_keys=True, default=str, ensure_ascii=False
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Retourne le fichier GridFS en cache (et met à jour sa date d'accès), ou None"""
+        doc = self.files.find_one_and_update(
+            {"metadata.cache_key": key},
+            {"$set": {"metadata.last_access": datetime.now()}},
+            projection={"_id": 1}
+        )
+        if not doc:
+            return None
+        try:
+            return self.fs.get(doc["_id"])
+        except NoFile:
+            # Supprimé par evict() entre la mise à jour et la lecture : absent du cache
+            return None
+
+    def put(self, key, data, filename, metadata=None):
+        """Stocke un rapport rendu et applique le budget ; retourne l'id GridFS"""
+        metadata = dict(metadata or {})
+        metadata.update({"cache_key": key, "template_version": self.version, "last_access": datetime.now()})
+        file_id = self.fs.put(data, filename=filename, metadata=metadata, content_type="application/pdf")
+        GRIDFS_WRITE_BYTES.inc(len(data))
+        self.evict(keep=file_id)
+        return file_id
+
+    def _acquire(self, key):
+        # Verrou compté : il n'est supprimé que lorsque plus aucun appelant ne l'attend
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        return entry
+
+    def _release(self, key, entry):
+        entry[0].release()
+        with self._locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(key, None)
+
+    def get_or_render(self, key, render):
+        """
+        Retourne le rapport en cache, ou le rend avec `render()` puis le met en cache.
+
+        Args:
+            render (callable): Retourne (données PDF, nom de fichier, métadonnées)
+
+        Returns:
+            GridOut: Fichier GridFS du rapport
+        """
+        # Deux téléchargements simultanés du même rapport ne le rendent qu'une fois
+        entry = self._acquire(key)
+        try:
+            cached = self.get(key)
+            if cached is not None:
+                REPORT_CACHE.inc(outcome="hit")
+                return cached
+            REPORT_CACHE.inc(outcome="miss")
+            data, filename, metadata = render()
+            return self.fs.get(self.put(key, data, filename, metadata))
+        finally:
+            self._release(key, entry)
+
+    def size(self):
+        """Taille cumulée (octets) des rapports en cache"""
+        result = list(self.files.aggregate([
+            {"$match": {"metadata.cache_key": {"$exists": True}}},
+            {"$group": {"_id": None, "total": {"$sum": "$length"}}}
+        ]))
+        return result[0]["total"] if result else 0
+
+    def evict(self, keep=None):
+        """Supprime les rapports les moins récemment lus jusqu'à revenir sous le budget"""
+        excess = self.size() - self.budget_bytes
+        if excess <= 0:
+            return 0
+        removed = 0
+        cursor = self.files.find(
+            {"metadata.cache_key": {"$exists": True}, "_id": {"$ne": keep}},
+            {"_id": 1, "length": 1}
+        ).sort("metadata.last_access", ASCENDING)
+        for doc in cursor:
+            if excess <= 0:
+                break
+            self.fs.delete(doc["_id"])
+            excess -= doc.get("length", 0)
+            removed += 1
+        if removed:
+            REPORT_CACHE.inc(removed, outcome="evicted")
+            logger.info(f"Cache des rapports : {removed} rapport(s) supprimé(s) (budget {self.budget_bytes} octets)")
+        return removed
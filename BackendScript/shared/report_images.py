@@ -0,0 +1,92 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from PIL import Image as PILImage
+from shared.config import REPORT_IMAGE_DPI, REPORT_IMAGE_QUALITY
+from shared.logger import logger
+
+# Préparation des captures d'écran avant insertion dans les rapports PDF :
+# redimensionnement à la résolution d'impression, recompression JPEG et cache
+# des versions traitées. Deux captures identiques donnent les mêmes octets,
+# que ReportLab n'intègre qu'une fois dans le PDF.
+
+CM_PER_INCH = 2.54
+
+
+class ScreenshotCache:
+    """Cache LRU des captures traitées, indexé par le hash du fichier source et la taille cible"""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_cache = ScreenshotCache()
+
+
+def target_size(width_cm, height_cm, dpi=REPORT_IMAGE_DPI):
+    """Taille en pixels d'une image imprimée sur width_cm x height_cm à `dpi`"""
+    return (
+        max(1, round(width_cm / CM_PER_INCH * dpi)),
+        max(1, round(height_cm / CM_PER_INCH * dpi))
+    )
+
+
+def prepare_screenshot(path, width_cm, height_cm, dpi=REPORT_IMAGE_DPI, quality=REPORT_IMAGE_QUALITY):
+    """
+    Retourne la capture redimensionnée et recompressée en JPEG
+
+    Args:
+        path (str): Chemin de la capture d'origine
+        width_cm, height_cm (float): Dimensions d'affichage dans le rapport
+        dpi (int): Résolution d'impression visée
+        quality (int): Qualité JPEG (1-95)
+
+    Returns:
+        bytes: Image JPEG, ou None si la capture ne peut pas être lue
+    """
+    try:
+        with open(path, "rb") as f:
+            source = f.read()
+    except OSError as e:
+        logger.error(f"Capture illisible {path}: {str(e)}")
+        return None
+
+    size = target_size(width_cm, height_cm, dpi)
+    key = (hashlib.sha1(source).hexdigest(), size, quality)
+    data = _cache.get(key)
+    if data is not None:
+        return data
+
+    try:
+        with PILImage.open(io.BytesIO(source)) as image:
+            image = image.convert("RGB")
+            # Les captures sont affichées dans un cadre fixe : chaque axe est réduit
+            # indépendamment (comme à l'affichage), sans jamais agrandir l'image
+            resized = (min(size[0], image.width), min(size[1], image.height))
+            if resized != image.size:
+                image = image.resize(resized, PILImage.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=quality, optimize=True)
+    except (OSError, ValueError) as e:
+        logger.error(f"Impossible de traiter la capture {path}: {str(e)}")
+        return None
+    data = output.getvalue()
+    _cache.put(key, data)
+    return data
@@ -0,0 +1,268 @@
+import copy
+import io
+import os
+import threading
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import Paragraph, Spacer, Table, TableStyle, Image
+from reportlab.graphics.shapes import Drawing, Line
+from shared.report_images import prepare_screenshot
+
+# Gabarit des rapports PDF : styles et styles de tableaux construits une seule
+# fois par processus et partagés entre les rapports (ils ne sont que lus
+# pendant doc.build()). Les flowables, eux, reçoivent un état de mise en page
+# (canv, _frame, _postponed...) : les Paragraph au texte fixe sont analysés une
+# fois par thread puis copiés pour chaque rapport, les autres sont créés à
+# chaque rapport.
+
+SUCCESS_STATUSES = ('succès', 'success', 'completed')
+ERROR_STATUSES = ('échec', 'error', 'failed', 'failure')
+
+# Libellé et couleur affichés selon le statut d'une étape
+STEP_STATUS = {
+    "success": ("SUCCÈS", colors.HexColor("#28a745")),
+    "error": ("ÉCHEC", colors.HexColor("#dc3545")),
+    "warning": ("AVERTISSEMENT", colors.HexColor("#ffc107")),
+}
+
+
+def status_kind(status):
+    """Classe un statut d'étape : success, error ou warning"""
+    status = (status or '').lower()
+    if status in SUCCESS_STATUSES:
+        return "success"
+    if status in ERROR_STATUSES:
+        return "error"
+    return "warning"
+
+
+def _build_styles():
+    styles = getSampleStyleSheet()
+
+    # Style pour le titre principal
+    styles.add(ParagraphStyle(
+        name='MainTitle',
+        fontSize=24,
+        spaceAfter=20,
+        spaceBefore=10,
+        textColor=colors.HexColor("#1a365d"),
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    ))
+
+    # Style pour les sous-titres (SANS BACKGROUND pour éviter superposition)
+    styles.add(ParagraphStyle(
+        name='SectionTitle',
+        fontSize=14,
+        spaceAfter=10,
+        spaceBefore=15,
+        textColor=colors.HexColor("#2d3748"),
+        fontName='Helvetica-Bold',
+        leftIndent=0
+    ))
+
+    # Style pour le titre des étapes
+    styles.add(ParagraphStyle(
+        name='StepTitle',
+        fontSize=12,
+        spaceAfter=5,
+        spaceBefore=10,
+        textColor=colors.HexColor("#2d3748"),
+        fontName='Helvetica-Bold'
+    ))
+
+    # Style pour le contenu normal
+    styles.add(ParagraphStyle(
+        name='Content',
+        fontSize=10,
+        leading=14,
+        textColor=colors.HexColor("#4a5568"),
+        fontName='Helvetica'
+    ))
+
+    # Style pour le pied de page
+    styles.add(ParagraphStyle(
+        name='Footer',
+        fontSize=9,
+        textColor=colors.HexColor("#718096"),
+        alignment=TA_CENTER,
+        fontName='Helvetica-Oblique'
+    ))
+    return styles
+
+
+STYLES = _build_styles()
+
+INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor("#f8f9fa")),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor("#2d3748")),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#dee2e6")),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6)
+])
+
+
+def _summary_style(background):
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor(background)),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor("#2d3748")),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 11),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor("#adb5bd")),
+        ('TOPPADDING', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 10)
+    ])
+
+
+# Résumé : vert si toutes les étapes ont réussi, rouge sinon
+SUMMARY_TABLE_STYLES = {True: _summary_style("#d4edda"), False: _summary_style("#f8d7da")}
+
+STATS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#6c757d")),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor("#2d3748")),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#dee2e6")),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    # Alternance de couleurs pour les lignes
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#f8f9fa")])
+])
+
+
+def _step_style(status_color):
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor("#f8f9fa")),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor("#2d3748")),
+        ('TEXTCOLOR', (1, 1), (1, 1), status_color),  # Couleur du statut
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTNAME', (1, 1), (1, 1), 'Helvetica-Bold'),  # Statut en gras
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#dee2e6")),
+        ('LEFTPADDING', (0, 0), (-1, -1), 6),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4)
+    ])
+
+
+STEP_TABLE_STYLES = {kind: _step_style(color) for kind, (_, color) in STEP_STATUS.items()}
+STEP_COL_WIDTHS = [3*cm, 10*cm]
+
+HEADER_LINE_COLOR = colors.HexColor("#4299e1")
+
+
+def _header_line():
+    """Ligne décorative qui encadre le titre principal"""
+    drawing = Drawing(400, 15)
+    drawing.add(Line(0, 7, 400, 7, strokeColor=HEADER_LINE_COLOR, strokeWidth=2))
+    return drawing
+
+_local = threading.local()
+
+
+def _static_paragraphs():
+    """Paragraphes au texte fixe, analysés une fois par thread de rendu (modèles, à copier)"""
+    cached = getattr(_local, "paragraphs", None)
+    if cached is None:
+        cached = _local.paragraphs = {
+            "title": Paragraph("RAPPORT D'AUTOMATISATION DE TEST", STYLES['MainTitle']),
+            "footer_rule": Paragraph("─" * 60, STYLES['Footer']),
+            "footer_system": Paragraph("Système d'automatisation de tests", STYLES['Footer']),
+        }
+        for section in ("INFORMATIONS GÉNÉRALES", "RÉSUMÉ EXÉCUTIF", "DÉTAIL DES ÉTAPES"):
+            cached[section] = Paragraph(section, STYLES['SectionTitle'])
+    return cached
+
+
+def header_flowables():
+    """Bandeau de titre du rapport"""
+    static = _static_paragraphs()
+    return [
+        _header_line(),
+        Spacer(1, 10),  # Ajoute un espace avant le titre
+        copy.copy(static["title"]),
+        Spacer(1, 10),  # Ajoute un espace après le titre
+        _header_line(),
+        Spacer(1, 20),
+    ]
+
+
+def section_title(title):
+    return copy.copy(_static_paragraphs()[title])
+
+
+def footer_flowables(timestamp):
+    static = _static_paragraphs()
+    return [
+        Spacer(1, 25),
+        copy.copy(static["footer_rule"]),
+        Spacer(1, 5),
+        Paragraph(f"Document généré automatiquement le {timestamp}", STYLES['Footer']),
+        copy.copy(static["footer_system"]),
+    ]
+
+
+SCREENSHOT_SIZE_CM = (10, 6)
+
+
+def screenshot_image(path):
+    """Capture redimensionnée et recompressée (un message la remplace si elle est illisible)"""
+    width, height = SCREENSHOT_SIZE_CM
+    data = prepare_screenshot(path, width, height)
+    if data is None:
+        return Paragraph(f"Capture d'écran illisible : {os.path.basename(path)}", STYLES['Content'])
+    return Image(io.BytesIO(data), width=width*cm, height=height*cm)
+
+
+def step_flowables(steps_list):
+    """
+    Détail des étapes : titre, tableau et capture d'écran éventuelle de chaque étape
+
+    Les tableaux d'étapes partagent les styles précalculés (un par statut).
+    """
+    story = []
+    last = len(steps_list)
+    for i, step in enumerate(steps_list, 1):
+        kind = status_kind(step.get('status', 'inconnu'))
+        status_text = STEP_STATUS[kind][0]
+        step_data = [
+            ['Description', step.get('description', f'Étape {i}')],
+            ['Statut', status_text],
+            ['Résultat', step.get('result', 'Aucun résultat disponible')]
+        ]
+        story.append(Paragraph(f"ÉTAPE {i}", STYLES['StepTitle']))
+        story.append(Table(step_data, colWidths=STEP_COL_WIDTHS, style=STEP_TABLE_STYLES[kind]))
+
+        # ESPACEMENT RÉDUIT entre les étapes
+        if i < last:
+            story.append(Spacer(1, 8))
+
+        # Ajouter la capture d'écran si elle existe
+        screenshot_path = step.get('screenshot')
+        if screenshot_path and os.path.exists(screenshot_path):
+            try:
+                story.append(Spacer(1, 4))
+                story.append(Paragraph("Capture d'écran :", STYLES['Content']))
+                story.append(screenshot_image(screenshot_path))
+                story.append(Spacer(1, 8))
+            except Exception as img_err:
+                story.append(Paragraph(f"Erreur lors de l'ajout de la capture : {img_err}", STYLES['Content']))
+    return story
@@ -0,0 +1,434 @@
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urljoin
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from shared.browser_utils import keyboard_shortcut
+from shared.config import IKOS_URL, SCREEN_MASKS
+from shared.error_watch import browser_pattern
+from shared.image_utils import click_best_hit
+from shared.logger import logger
+from shared.screen_compare import compare_screens
+from shared.template_matcher import matcher
+from shared.test_types import create_test_step
+from shared.wait_utils import (wait_for_element, wait_for_frame, wait_for_images,
+                               wait_for_screen_stable)
+
+# Format des scénarios (JSON, ou YAML si PyYAML est installé) :
+#
+#   module: CTX
+#   scenario: Modification contrat
+#   variables: {contrat: "118218"}
+#   error_patterns: ["accès refusé", "code retour \\d+"]
+#   steps:
+#     - description: Navigation et saisie
+#       actions:
+#         - {action: type, text: "{contrat}"}
+#         - {action: key, key: enter}
+#         - {action: wait-for, screen: stable, timeout: 6}
+#         - {action: click-image, images: [image\BoutonValider.PNG, image\BoutonRetour.PNG],
+#            on: {image\BoutonValider.PNG: [{action: click-image, image: image\BoutonRetour.PNG}]}}
+#         - {action: assert-no-error}
+
+SCENARIO_ACTIONS = {}
+
+_LOCATORS = {"css": By.CSS_SELECTOR, "xpath": By.XPATH, "id": By.ID, "name": By.NAME}
+
+
+class ScenarioError(ValueError):
+    """Définition de scénario invalide"""
+
+
+class StepFailure(Exception):
+    """Échec d'une action pendant l'exécution d'un scénario"""
+
+
+def scenario_action(name):
+    """Enregistre le compilateur d'une action du langage de scénario"""
+    def register(compiler):
+        SCENARIO_ACTIONS[name] = compiler
+        return compiler
+    return register
+
+
+class ScenarioContext:
+    """État partagé par les actions pendant l'exécution d'un scénario"""
+
+    def __init__(self, driver, screen=None, recorder=None, capture=None, check_errors=None, test_id=None):
+        """
+        Args:
+            driver: Session Selenium
+            screen: Driver si les captures passent par le navigateur (headless), sinon None
+            recorder (WaitRecorder): Enregistreur des durées d'attente
+            capture (callable): Fonction retournant une capture PIL de l'écran
+            check_errors (callable): Fonction driver -> True si une erreur est affichée
+        """
+        self.driver = driver
+        self.screen = screen
+        self.recorder = recorder
+        self.capture = capture
+        self.check_errors = check_errors
+        self.test_id = test_id
+        self.snapshots = {}
+        self.step = None
+
+
+class ScenarioStep:
+    """Étape compilée : une description et la suite d'actions à exécuter"""
+
+    def __init__(self, description, actions):
+        self.description = description
+        self.actions = actions
+
+    def run(self, context):
+        for action in self.actions:
+            action(context)
+
+
+class ScenarioPlan:
+    """Scénario compilé, prêt à être exécuté autant de fois que nécessaire"""
+
+    def __init__(self, module, scenario, steps, digest, error_patterns=None):
+        self.module = module
+        self.scenario = scenario
+        self.steps = steps
+        self.digest = digest
+        # Motifs d'erreur propres au scénario, en plus de ERROR_PATTERNS
+        self.error_patterns = error_patterns or []
+
+    def test_steps(self):
+        """Étapes au format TestStep, en attente d'exécution"""
+        return [create_test_step(step.description, "pending", "En attente") for step in self.steps]
+
+
+def _require(spec, *fields):
+    missing = [field for field in fields if spec.get(field) in (None, "")]
+    if missing:
+        raise ScenarioError(f"Action '{spec.get('action')}' : champ(s) manquant(s) {', '.join(missing)}")
+
+
+def _format(value, variables):
+    if isinstance(value, str) and variables:
+        try:
+            return value.format_map(variables)
+        except (KeyError, ValueError) as e:
+            raise ScenarioError(f"Variable inconnue dans '{value}': {str(e)}")
+    return value
+
+
+def _resolve_key(name):
+    key = keyboard_shortcut(name)
+    if key != name:
+        return key
+    key = getattr(Keys, name.upper(), None)
+    if key is None:
+        raise ScenarioError(f"Touche inconnue: {name}")
+    return key
+
+
+def _load_images(images):
+    """Charge les modèles d'image à la compilation : un chemin erroné est signalé avant l'exécution"""
+    for image in images:
+        try:
+            matcher.template(image)
+        except FileNotFoundError:
+            raise ScenarioError(f"Image introuvable: {image}")
+
+
+def _compile_actions(specs, variables):
+    if not isinstance(specs, list):
+        raise ScenarioError("Les actions d'une étape doivent former une liste")
+    actions = []
+    for spec in specs:
+        if not isinstance(spec, dict) or "action" not in spec:
+            raise ScenarioError(f"Action invalide: {spec!r}")
+        compiler = SCENARIO_ACTIONS.get(spec["action"])
+        if compiler is None:
+            raise ScenarioError(f"Action inconnue: {spec['action']}")
+        actions.append(compiler(spec, variables))
+    return actions
+
+
+@scenario_action("navigate")
+def _navigate(spec, variables):
+    """Ouvre une URL (relative à IKOS_URL) ou bascule dans un frame"""
+    if spec.get("url"):
+        url = urljoin(IKOS_URL + "/", _format(spec["url"], variables))
+
+        def run(context):
+            context.driver.get(url)
+        return run
+
+    _require(spec, "frame")
+    frame = spec["frame"]
+    timeout = spec.get("timeout", 10)
+
+    def run(context):
+        if frame == "default":
+            context.driver.switch_to.default_content()
+        elif not wait_for_frame(context.driver, frame, timeout=timeout, recorder=context.recorder):
+            raise StepFailure(f"Frame {frame} introuvable")
+    return run
+
+
+@scenario_action("type")
+def _type(spec, variables):
+    """Saisit du texte dans l'élément actif"""
+    _require(spec, "text")
+    text = str(_format(spec["text"], variables))
+
+    def run(context):
+        ActionChains(context.driver).send_keys(text).perform()
+    return run
+
+
+@scenario_action("key")
+def _key(spec, variables):
+    """Appuie sur une touche, éventuellement plusieurs fois"""
+    _require(spec, "key")
+    key = _resolve_key(spec["key"])
+    repeat = int(spec.get("repeat", 1))
+    interval = float(spec.get("interval", 0.1 if repeat > 1 else 0))
+
+    def run(context):
+        actions = ActionChains(context.driver)
+        for index in range(repeat):
+            actions.send_keys(key).perform()
+            if interval and index < repeat - 1:
+                time.sleep(interval)
+    return run
+
+
+@scenario_action("click-image")
+def _click_image(spec, variables):
+    """
+    Clique sur la première image visible parmi `image`/`images`.
+    `on` associe à une image les actions à exécuter si c'est elle qui a été cliquée.
+    """
+    images = spec.get("images") or ([spec["image"]] if spec.get("image") else [])
+    if not images:
+        raise ScenarioError("Action 'click-image' : champ image ou images manquant")
+    _load_images(images)
+    confidence = spec.get("confidence", 0.9)
+    timeout = spec.get("timeout", 10)
+    optional = spec.get("optional", False)
+    branches = {image: _compile_actions(actions, variables) for image, actions in (spec.get("on") or {}).items()}
+    unknown = set(branches) - set(images)
+    if unknown:
+        raise ScenarioError(f"Action 'click-image' : branche(s) sans image correspondante {', '.join(unknown)}")
+
+    def run(context):
+        hits = wait_for_images(images, confidence=confidence, timeout=timeout, recorder=context.recorder, driver=context.screen)
+        clicked = click_best_hit(hits, context.screen)
+        if clicked is None:
+            if optional:
+                return
+            raise StepFailure(f"Image(s) non trouvée(s) après {timeout}s: {', '.join(images)}")
+        for action in branches.get(clicked, []):
+            action(context)
+    return run
+
+
+@scenario_action("wait-for")
+def _wait_for(spec, variables):
+    """Attend la stabilité de l'écran, une image, un élément ou un frame"""
+    timeout = spec.get("timeout", 10)
+    optional = spec.get("optional", False)
+
+    if spec.get("screen") == "stable":
+        def condition(context):
+            return wait_for_screen_stable(context.capture, timeout=timeout, recorder=context.recorder)
+        # Un écran qui continue de bouger n'est pas une erreur en soi
+        optional = spec.get("optional", True)
+    elif spec.get("image") or spec.get("images"):
+        images = spec.get("images") or [spec["image"]]
+        _load_images(images)
+        confidence = spec.get("confidence", 0.9)
+
+        def condition(context):
+            return wait_for_images(images, confidence=confidence, timeout=timeout, recorder=context.recorder, driver=context.screen)
+    elif spec.get("frame"):
+        frame = spec["frame"]
+
+        def condition(context):
+            return wait_for_frame(context.driver, frame, timeout=timeout, recorder=context.recorder)
+    else:
+        locator = next((name for name in _LOCATORS if spec.get(name)), None)
+        if locator is None:
+            raise ScenarioError("Action 'wait-for' : préciser screen, image(s), frame, css, xpath, id ou name")
+        by, value = _LOCATORS[locator], _format(spec[locator], variables)
+
+        def condition(context):
+            return wait_for_element(context.driver, by, value, timeout=timeout, recorder=context.recorder)
+
+    description = json.dumps({k: v for k, v in spec.items() if k != "action"}, ensure_ascii=False)
+
+    def run(context):
+        if not condition(context) and not optional:
+            raise StepFailure(f"Attente expirée après {timeout}s: {description}")
+    return run
+
+
+@scenario_action("assert-no-error")
+def _assert_no_error(spec, variables):
+    """Échoue si la page affiche une erreur"""
+    def run(context):
+        if context.check_errors and context.check_errors(context.driver):
+            details = getattr(context.check_errors, "errors", None)
+            raise StepFailure("Erreur détectée dans la page" + (f" : {' | '.join(details)}" if details else ""))
+    return run
+
+
+@scenario_action("snapshot")
+def _snapshot(spec, variables):
+    """Mémorise une capture de l'écran sous un nom"""
+    _require(spec, "name")
+    name = spec["name"]
+
+    def run(context):
+        context.snapshots[name] = context.capture()
+    return run
+
+
+@scenario_action("compare")
+def _compare(spec, variables):
+    """
+    Compare l'écran courant à une capture mémorisée ; `expect` (changed ou
+    unchanged) fait échouer l'étape si le résultat ne correspond pas
+    """
+    _require(spec, "since")
+    since = spec["since"]
+    expect = spec.get("expect")
+    if expect not in (None, "changed", "unchanged"):
+        raise ScenarioError(f"Action 'compare' : expect invalide {expect}")
+    threshold = spec.get("threshold", 0.95)
+
+    def run(context):
+        before = context.snapshots.get(since)
+        if before is None:
+            raise StepFailure(f"Capture '{since}' absente")
+        diff = compare_screens(before, context.capture(), masks=SCREEN_MASKS)
+        changed = diff.score < threshold
+        if context.step is not None:
+            context.step.setdefault("comparisons", []).append(dict(diff.to_dict(), since=since, changed=changed))
+        if expect and changed != (expect == "changed"):
+            raise StepFailure(f"Écran {'inchangé' if not changed else 'modifié'} depuis '{since}' (SSIM {diff.score:.3f})")
+    return run
+
+
+def parse_scenario(source):
+    """Lit une définition de scénario JSON ou YAML (texte) ou déjà décodée (dict)"""
+    if isinstance(source, dict):
+        return source
+    if not isinstance(source, (str, bytes)):
+        raise ScenarioError("La définition doit être un objet")
+    try:
+        definition = json.loads(source)
+    except ValueError:
+        try:
+            import yaml
+        except ImportError:
+            raise ScenarioError("Définition non JSON et PyYAML indisponible")
+        try:
+            definition = yaml.safe_load(source)
+        except yaml.YAMLError as e:
+            raise ScenarioError(f"YAML invalide: {str(e)}")
+    # Un JSON ou YAML valide peut être une liste ou un scalaire
+    if not isinstance(definition, dict):
+        raise ScenarioError("La définition doit être un objet")
+    return definition
+
+
+def _canonical(definition):
+    keys = ("module", "scenario", "variables", "error_patterns", "steps")
+    return json.dumps({k: definition.get(k) for k in keys}, sort_keys=True, ensure_ascii=False, default=str)
+
+
+@lru_cache(maxsize=128)
+def _compile_canonical(canonical):
+    definition = json.loads(canonical)
+    steps = definition.get("steps")
+    if not isinstance(steps, list) or not steps:
+        raise ScenarioError("Le scénario doit contenir au moins une étape")
+    variables = definition.get("variables") or {}
+    error_patterns = definition.get("error_patterns") or []
+    if not isinstance(error_patterns, list):
+        raise ScenarioError("error_patterns doit être une liste")
+    for pattern in error_patterns:
+        # Les motifs sont exécutés par le navigateur (RegExp JavaScript)
+        try:
+            browser_pattern(pattern)
+        except ValueError as e:
+            raise ScenarioError(f"Motif d'erreur invalide '{pattern}': {str(e)}")
+    compiled = []
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict) or not step.get("description"):
+            raise ScenarioError(f"Étape {index} : description manquante")
+        compiled.append(ScenarioStep(step["description"], _compile_actions(step.get("actions", []), variables)))
+    digest = hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+    return ScenarioPlan(definition.get("module"), definition.get("scenario"), compiled, digest, error_patterns)
+
+
+def compile_scenario(source):
+    """
+    Compile une définition en plan exécutable.
+
+    Les plans sont mis en cache par contenu : une définition inchangée n'est
+    compilée qu'une fois par processus.
+    """
+    return _compile_canonical(_canonical(parse_scenario(source)))
+
+
+class ScenarioStore:
+    """Définitions de scénarios stockées dans MongoDB, avec un scénario par défaut"""
+
+    def __init__(self, collection, default_path=None):
+        self.collection = collection
+        self.default_path = default_path
+
+    def ensure_indexes(self):
+        self.collection.create_index([("module", 1), ("scenario", 1)], unique=True)
+
+    def find(self, module, scenario):
+        """Définition du scénario, sinon celle du module (scenario = "*")"""
+        for name in (scenario, "*"):
+            document = self.collection.find_one({"module": module, "scenario": name}, {"_id": 0})
+            if document:
+                return document
+        return None
+
+    def save(self, source):
+        """Valide puis enregistre une définition ; retourne le plan compilé"""
+        definition = parse_scenario(source)
+        for field in ("module", "scenario"):
+            if not definition.get(field):
+                raise ScenarioError(f"Champ {field} manquant")
+        plan = compile_scenario(definition)
+        document = {k: definition.get(k) for k in ("module", "scenario", "variables", "error_patterns", "steps")}
+        document.update({"digest": plan.digest, "updated_at": datetime.now()})
+        self.collection.update_one(
+            {"module": definition["module"], "scenario": definition["scenario"]},
+            {"$set": document},
+            upsert=True
+        )
+        return plan
+
+    def load(self, module, scenario):
+        """Retourne le plan compilé du scénario (ou du scénario par défaut de son module)"""
+        definition = self.find(module, scenario)
+        if definition is None:
+            if not self.default_path or not os.path.exists(self.default_path):
+                raise ScenarioError(f"Aucun scénario défini pour {module} / {scenario}")
+            with open(self.default_path, encoding="utf-8") as f:
+                definition = parse_scenario(f.read())
+            # Le scénario par défaut ne vaut que pour son propre module : un autre
+            # module exécuterait des étapes sans rapport et pourrait réussir
+            if definition.get("module") != module:
+                raise ScenarioError(f"Aucun scénario défini pour {module} / {scenario}")
+            logger.warning(f"Aucun scénario défini pour {module} / {scenario}, scénario par défaut utilisé")
+        return compile_scenario(definition)
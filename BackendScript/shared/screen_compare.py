@@ -0,0 +1,139 @@
+from typing import NamedTuple
+import cv2
+import numpy as np
+from shared.template_matcher import to_grayscale
+
+# Largeur de travail : les captures sont réduites avant comparaison
+COMPARE_WIDTH = 320
+# Constantes de stabilisation du SSIM (images 8 bits)
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+class ScreenDiff(NamedTuple):
+    """Résultat d'une comparaison de captures"""
+    score: float
+    hash_distance: int
+    boxes: list
+
+    def to_dict(self):
+        return {
+            "score": round(self.score, 4),
+            "hash_distance": self.hash_distance,
+            "boxes": [list(box) for box in self.boxes]
+        }
+
+
+def _downscale(gray, width=COMPARE_WIDTH):
+    if gray.shape[1] <= width:
+        return gray
+    height = max(1, round(gray.shape[0] * width / gray.shape[1]))
+    return cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def apply_masks(gray, masks, scale=1.0):
+    """
+    Neutralise des zones variables (horloge, nom d'utilisateur...)
+
+    Args:
+        masks (list): Zones (left, top, width, height) en pixels de la capture d'origine
+        scale (float): Rapport entre `gray` et la capture d'origine
+    """
+    if not masks:
+        return gray
+    gray = gray.copy()
+    for left, top, width, height in masks:
+        x0, y0 = int(left * scale), int(top * scale)
+        x1, y1 = int(np.ceil((left + width) * scale)), int(np.ceil((top + height) * scale))
+        gray[max(0, y0):max(0, y1), max(0, x0):max(0, x1)] = 0
+    return gray
+
+
+def ssim_map(gray1, gray2):
+    """Carte SSIM (fenêtre gaussienne, sigma 1.5) de deux images de même taille"""
+    a = gray1.astype(np.float32)
+    b = gray2.astype(np.float32)
+
+    def blur(x):
+        return cv2.GaussianBlur(x, (11, 11), 1.5)
+
+    mu_a, mu_b = blur(a), blur(b)
+    mu_aa, mu_bb, mu_ab = mu_a * mu_a, mu_b * mu_b, mu_a * mu_b
+    var_a = blur(a * a) - mu_aa
+    var_b = blur(b * b) - mu_bb
+    cov = blur(a * b) - mu_ab
+    return ((2 * mu_ab + _C1) * (2 * cov + _C2)) / ((mu_aa + mu_bb + _C1) * (var_a + var_b + _C2))
+
+
+def perceptual_hash(image, hash_size=8):
+    """Empreinte perceptuelle (pHash, DCT) d'une capture, sous forme d'entier"""
+    gray = to_grayscale(image)
+    small = cv2.resize(gray, (hash_size * 4, hash_size * 4), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:hash_size, :hash_size]
+    bits = (low > np.median(low)).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hash_distance(hash1, hash2):
+    """Nombre de bits différents entre deux empreintes"""
+    return bin(hash1 ^ hash2).count("1")
+
+
+def changed_tiles(similarity, tile=16, threshold=0.9):
+    """
+    Grille booléenne des tuiles dont le SSIM moyen est sous le seuil
+
+    Le calcul est vectorisé : la carte est découpée en tuiles par reshape.
+    """
+    rows, cols = -(-similarity.shape[0] // tile), -(-similarity.shape[1] // tile)
+    padded = np.ones((rows * tile, cols * tile), dtype=np.float32)
+    padded[:similarity.shape[0], :similarity.shape[1]] = similarity
+    means = padded.reshape(rows, tile, cols, tile).mean(axis=(1, 3))
+    return means < threshold
+
+
+def _tile_boxes(grid, tile, scale, shape):
+    """Regroupe les tuiles modifiées voisines en rectangles (pixels d'origine)"""
+    count, _, stats, _ = cv2.connectedComponentsWithStats(grid.astype(np.uint8), connectivity=8)
+    boxes = []
+    for left, top, width, height, _ in stats[1:count]:
+        x0 = int(left * tile / scale)
+        y0 = int(top * tile / scale)
+        x1 = min(shape[1], int(np.ceil((left + width) * tile / scale)))
+        y1 = min(shape[0], int(np.ceil((top + height) * tile / scale)))
+        boxes.append((x0, y0, x1 - x0, y1 - y0))
+    return boxes
+
+
+def compare_screens(image1, image2, masks=None, width=COMPARE_WIDTH, tile=16, tile_threshold=0.9):
+    """
+    Compare deux captures (PIL ou numpy) sur une version réduite
+
+    Args:
+        masks (list): Zones (left, top, width, height) ignorées, en pixels de `image1`
+        width (int): Largeur de travail des captures réduites
+        tile (int): Taille des tuiles (pixels réduits) pour localiser les changements
+        tile_threshold (float): SSIM moyen sous lequel une tuile est considérée modifiée
+
+    Returns:
+        ScreenDiff: score SSIM global, distance entre empreintes perceptuelles et
+        zones modifiées (left, top, width, height) en pixels de `image1`
+    """
+    gray1 = to_grayscale(image1)
+    gray2 = to_grayscale(image2)
+    if gray1.shape != gray2.shape:
+        gray2 = cv2.resize(gray2, (gray1.shape[1], gray1.shape[0]), interpolation=cv2.INTER_AREA)
+
+    small1 = _downscale(gray1, width)
+    small2 = _downscale(gray2, width)
+    scale = small1.shape[1] / gray1.shape[1]
+    small1 = apply_masks(small1, masks, scale)
+    small2 = apply_masks(small2, masks, scale)
+
+    similarity = ssim_map(small1, small2)
+    grid = changed_tiles(similarity, tile, tile_threshold)
+    return ScreenDiff(
+        score=float(similarity.mean()),
+        hash_distance=hash_distance(perceptual_hash(small1), perceptual_hash(small2)),
+        boxes=_tile_boxes(grid, tile, scale, gray1.shape)
+    )
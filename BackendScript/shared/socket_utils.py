@@ -1,5 +1,6 @@
 from flask_socketio import emit
 from shared.logger import logger
+from shared.metrics import SOCKETIO_EMITS
 
 def emit_with_logging(event_name: str, data: dict, namespace: str = '/') -> None:
     """
@@ -12,5 +13,6 @@ def emit_with_logging(event_name: str, data: dict, namespace: str = '/') -> None
     try:
         logger.info(f"Emitting {event_name}: {data}")
         emit(event_name, data, namespace=namespace, broadcast=True)
+        SOCKETIO_EMITS.inc(event=event_name)
     except Exception as e:
         logger.error(f"Error emitting {event_name}: {str(e)}")
\ No newline at end of file
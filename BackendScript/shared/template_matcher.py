@@ -0,0 +1,318 @@
+import os
+import threading
+import time
+from typing import NamedTuple
+import cv2
+import numpy as np
+from shared.logger import logger
+from shared.tracing import traced
+
+
+class Match(NamedTuple):
+    """Résultat d'une recherche d'image, en pixels de la capture"""
+    left: float
+    top: float
+    width: float
+    height: float
+    confidence: float
+
+    @property
+    def center(self):
+        return (self.left + self.width / 2, self.top + self.height / 2)
+
+    def scaled(self, factor):
+        """Convertit la position dans une autre unité (ex. pixels CSS)"""
+        return Match(self.left / factor, self.top / factor, self.width / factor, self.height / factor, self.confidence)
+
+
+class TemplateMatcher:
+    """
+    Moteur de recherche d'images (template matching OpenCV).
+
+    - les modèles sont décodés une seule fois en niveaux de gris et gardés en mémoire
+    - la recherche commence dans une zone autour du dernier résultat obtenu
+      sur la même source de capture (bureau ou session navigateur)
+    - la recherche complète se fait d'abord sur une version réduite de la
+      capture (pyramide), puis est affinée à pleine résolution autour des candidats
+    """
+
+    def __init__(self, pyramid_levels=2, min_template_size=12, roi_margin=40, candidates=3):
+        """
+        Args:
+            pyramid_levels (int): Nombre maximum de réductions de moitié
+            min_template_size (int): Taille minimale (px) du modèle réduit
+            roi_margin (int): Marge autour du dernier résultat (px)
+            candidates (int): Nombre de candidats grossiers affinés
+        """
+        self.pyramid_levels = pyramid_levels
+        self.min_template_size = min_template_size
+        self.roi_margin = roi_margin
+        self.candidates = candidates
+        self._templates = {}
+        self._last_hits = {}
+        self._missing = set()
+        self._lock = threading.Lock()
+
+    def template(self, image_path):
+        """Retourne la pyramide en niveaux de gris d'un modèle (mise en cache)"""
+        path = os.path.normpath(image_path.replace("\\", os.sep))
+        with self._lock:
+            pyramid = self._templates.get(path)
+        if pyramid is not None:
+            return pyramid
+
+        template = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if template is None:
+            raise FileNotFoundError(f"Image introuvable: {image_path}")
+        pyramid = [template]
+        for _ in range(self.pyramid_levels):
+            smaller = cv2.pyrDown(pyramid[-1])
+            if min(smaller.shape) < self.min_template_size or not self._reliable(template, smaller, len(pyramid)):
+                break
+            pyramid.append(smaller)
+        with self._lock:
+            self._templates[path] = pyramid
+        return pyramid
+
+    @staticmethod
+    def _reliable(template, coarse_template, level, threshold=0.8):
+        """
+        Vérifie qu'un niveau réduit reste discriminant : les modèles peu texturés
+        ou très fins (champs vides, traits d'un pixel) ne se retrouvent plus une
+        fois réduits. Le pire score sur tous les alignements possibles du
+        modèle dans la capture doit rester au-dessus du seuil.
+        """
+        scale = 2 ** level
+        for dy in range(scale):
+            for dx in range(scale):
+                padded = cv2.copyMakeBorder(template, scale + dy, scale, scale + dx, scale, cv2.BORDER_REFLECT_101)
+                small = padded
+                for _ in range(level):
+                    small = cv2.pyrDown(small)
+                if coarse_template.shape[0] > small.shape[0] or coarse_template.shape[1] > small.shape[1]:
+                    return False
+                result = cv2.matchTemplate(small, coarse_template, cv2.TM_CCOEFF_NORMED)
+                if float(result.max()) < threshold:
+                    return False
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self._last_hits.clear()
+
+    @staticmethod
+    def _best(haystack, template, offset=(0, 0)):
+        if template.shape[0] > haystack.shape[0] or template.shape[1] > haystack.shape[1]:
+            return None
+        result = cv2.matchTemplate(haystack, template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (x, y) = cv2.minMaxLoc(result)
+        return (x + offset[0], y + offset[1], float(score))
+
+    @staticmethod
+    def _clip(region, shape):
+        left, top, width, height = (int(round(v)) for v in region)
+        left, top = max(0, left), max(0, top)
+        right = min(shape[1], left + width)
+        bottom = min(shape[0], top + height)
+        if right <= left or bottom <= top:
+            return None
+        return left, top, right, bottom
+
+    def _search_window(self, haystack, template, region):
+        clipped = self._clip(region, haystack.shape)
+        if clipped is None:
+            return None
+        left, top, right, bottom = clipped
+        return self._best(haystack[top:bottom, left:right], template, (left, top))
+
+    @staticmethod
+    def _downscaled(haystack, level, levels):
+        """Capture réduite `level` fois, partagée entre les modèles d'une même recherche"""
+        if level == 0:
+            return haystack
+        small = levels.get(level)
+        if small is None:
+            small = cv2.pyrDown(TemplateMatcher._downscaled(haystack, level - 1, levels))
+            levels[level] = small
+        return small
+
+    def _pyramid_search(self, haystack, pyramid, confidence, levels=None):
+        template = pyramid[0]
+        level = len(pyramid) - 1
+        if level == 0:
+            return self._best(haystack, template)
+
+        # Recherche grossière sur la capture réduite
+        small = self._downscaled(haystack, level, {} if levels is None else levels)
+        coarse_template = pyramid[level]
+        if coarse_template.shape[0] > small.shape[0] or coarse_template.shape[1] > small.shape[1]:
+            return self._best(haystack, template)
+        result = cv2.matchTemplate(small, coarse_template, cv2.TM_CCOEFF_NORMED)
+
+        # Affinage à pleine résolution autour des meilleurs candidats
+        scale = 2 ** level
+        margin = 2 * scale
+        threshold = confidence - 0.2
+        best = None
+        for _ in range(self.candidates):
+            _, score, _, (x, y) = cv2.minMaxLoc(result)
+            if score < threshold:
+                break
+            window = (x * scale - margin, y * scale - margin,
+                      template.shape[1] + 2 * margin, template.shape[0] + 2 * margin)
+            hit = self._search_window(haystack, template, window)
+            if hit and (best is None or hit[2] > best[2]):
+                best = hit
+            if best and best[2] >= confidence:
+                break
+            # Écarte ce candidat pour examiner le suivant
+            h, w = coarse_template.shape
+            result[max(0, y - h // 2):y + h // 2 + 1, max(0, x - w // 2):x + w // 2 + 1] = -1
+
+        # Les niveaux réduits du modèle sont validés par _reliable : aucun
+        # candidat au niveau grossier signifie que le modèle n'est pas affiché
+        return best
+
+    def match(self, haystack, image_path, confidence=0.9, region=None, use_last_hit=True, levels=None, source=None):
+        """
+        Cherche un modèle dans une capture en niveaux de gris
+
+        Args:
+            haystack (np.ndarray): Capture en niveaux de gris
+            image_path (str): Chemin du modèle
+            confidence (float): Score minimum (0-1)
+            region (tuple): Zone de recherche (left, top, width, height)
+            use_last_hit (bool): Chercher d'abord autour du dernier résultat
+            levels (dict): Cache des réductions de la zone de recherche,
+                partagé entre plusieurs modèles (voir match_many)
+            source: Identifiant de la source de capture (bureau, session
+                navigateur) ; le dernier résultat est mémorisé par source
+
+        Returns:
+            Match ou None
+        """
+        pyramid = self.template(image_path)
+        template = pyramid[0]
+        th, tw = template.shape
+
+        with self._lock:
+            # Une zone explicite prime sur le dernier résultat
+            last = self._last_hits.get((source, image_path)) if use_last_hit and region is None else None
+        hit = None
+        if last is not None:
+            margin = self.roi_margin
+            hit = self._search_window(haystack, template, (last[0] - margin, last[1] - margin, tw + 2 * margin, th + 2 * margin))
+            if hit and hit[2] < confidence:
+                hit = None
+
+        if hit is None:
+            left, top = 0, 0
+            area = haystack
+            if region is not None:
+                clipped = self._clip(region, haystack.shape)
+                if clipped is None:
+                    return None
+                left, top, right, bottom = clipped
+                area = haystack[top:bottom, left:right]
+            hit = self._pyramid_search(area, pyramid, confidence, levels)
+            if hit:
+                hit = (hit[0] + left, hit[1] + top, hit[2])
+
+        if not hit or hit[2] < confidence:
+            return None
+        with self._lock:
+            self._last_hits[(source, image_path)] = (hit[0], hit[1])
+        return Match(hit[0], hit[1], tw, th, hit[2])
+
+    def match_many(self, haystack, image_paths, confidence=0.9, region=None, source=None):
+        """
+        Cherche plusieurs modèles dans une même capture
+
+        La capture n'est réduite qu'une fois pour tous les modèles.
+
+        Args:
+            image_paths (list): Chemins des modèles
+            confidence (float | dict): Score minimum, commun ou par modèle
+
+        Returns:
+            dict: chemin -> Match pour chaque modèle trouvé (les modèles
+                introuvables sur le disque sont ignorés)
+        """
+        levels = {}
+        hits = {}
+        for image_path in image_paths:
+            threshold = confidence.get(image_path, 0.9) if isinstance(confidence, dict) else confidence
+            try:
+                found = self.match(haystack, image_path, threshold, region, levels=levels, source=source)
+            except FileNotFoundError as e:
+                # Un modèle absent n'empêche pas de trouver les autres
+                with self._lock:
+                    first = image_path not in self._missing
+                    self._missing.add(image_path)
+                if first:
+                    logger.warning(f"{str(e)} : modèle ignoré")
+                continue
+            if found:
+                hits[image_path] = found
+        return hits
+
+    def locate(self, capture, image_path, confidence=0.9, region=None, timeout=0, poll_interval=0.2, source=None):
+        """
+        Capture l'écran et cherche le modèle jusqu'à le trouver ou jusqu'au délai
+
+        Args:
+            capture (callable): Fonction retournant une capture en niveaux de gris (np.ndarray)
+            timeout (float): Temps maximum en secondes (0 = une seule tentative)
+            poll_interval (float): Délai entre deux tentatives en secondes
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with traced("image", os.path.basename(image_path.replace("\\", "/"))):
+                haystack = capture()
+                found = self.match(haystack, image_path, confidence, region, source=source) if haystack is not None else None
+            if found:
+                return found
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(poll_interval, remaining))
+
+    def locate_many(self, capture, image_paths, confidence=0.9, region=None, timeout=0, poll_interval=0.2, require_all=False,
+                    source=None):
+        """
+        Cherche plusieurs modèles dans une seule capture par tentative, jusqu'à
+        en trouver au moins un (ou tous si `require_all`) ou jusqu'au délai
+
+        Returns:
+            dict: chemin -> Match des modèles trouvés lors de la dernière tentative
+        """
+        deadline = time.monotonic() + timeout
+        name = ", ".join(os.path.basename(path.replace("\\", "/")) for path in image_paths)
+        while True:
+            hits = {}
+            with traced("image", name):
+                haystack = capture()
+                if haystack is not None:
+                    hits = self.match_many(haystack, image_paths, confidence, region, source=source)
+            if hits and (not require_all or len(hits) == len(image_paths)):
+                return hits
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return hits
+            time.sleep(min(poll_interval, remaining))
+
+
+def to_grayscale(image):
+    """Convertit une capture PIL ou un tableau couleur en tableau niveaux de gris"""
+    if isinstance(image, np.ndarray):
+        if image.ndim == 2:
+            return image
+        if image.shape[2] == 4:
+            return cv2.cvtColor(image, cv2.COLOR_RGBA2GRAY)
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return np.asarray(image.convert('L'))
+
+
+# Moteur partagé : le cache des modèles sert à tous les tests du processus
+matcher = TemplateMatcher()
@@ -2,7 +2,7 @@ from typing import List
 from shared.test_types import TestStep
 from shared.logger import logger
 from shared.socket_utils import emit_with_logging
-import pyautogui
+from selenium.webdriver.common.action_chains import ActionChains
 
 
 def update_step_status(steps: List[TestStep], index: int, status: str, result: str = None) -> None:
@@ -21,16 +21,25 @@ def update_step_status(steps: List[TestStep], index: int, status: str, result: s
         logger.error(f"Error updating step status: {str(e)}")
 
 
-def type_text(text, interval=0.1):
+def type_text(text, interval=0.1, driver=None):
     """
     Tape du texte avec un intervalle entre chaque caractère
     
     Args:
         text (str): Texte à taper
         interval (float): Délai entre chaque frappe en secondes
+        driver: Si fourni, la saisie passe par le navigateur (mode headless)
     """
     try:
-        pyautogui.write(text, interval=interval)
+        if driver is not None:
+            actions = ActionChains(driver)
+            for char in text:
+                actions.send_keys(char).pause(interval)
+            actions.perform()
+        else:
+            # Import différé : pyautogui exige un affichage
+            import pyautogui
+            pyautogui.write(text, interval=interval)
         logger.info(f"Texte saisi avec succès: {text}")
         return True
     except Exception as e:
@@ -0,0 +1,192 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Bornes (secondes) des histogrammes de durée d'étape
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+_local = threading.local()
+
+
+class Tracer:
+    """
+    Trace d'exécution d'un test : une liste de segments (étape, attente,
+    recherche d'image, appel WebDriver...) avec début, fin et durée.
+
+    Le traceur actif du thread (voir `activate`) est utilisé par les fonctions
+    instrumentées, sans avoir à le passer en paramètre.
+    """
+
+    def __init__(self, max_spans=5000):
+        """
+        Args:
+            max_spans (int): Nombre maximum de segments conservés (taille du document rapport)
+        """
+        self.spans = []
+        self.step = None
+        self.max_spans = max_spans
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, kind, name, start, end, success=True, **extra):
+        span = {
+            "kind": kind,
+            "name": name,
+            "start": round(start, 3),
+            "end": round(end, 3),
+            "duration": round(end - start, 3),
+            "success": success
+        }
+        if self.step is not None:
+            span["step"] = self.step
+        span.update(extra)
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+        return span
+
+    def record(self, description, elapsed, timeout, success):
+        """Enregistre une attente terminée (voir wait_utils.wait_until)"""
+        end = time.time()
+        return self.add("wait", description, end - elapsed, end, success, timeout=timeout)
+
+    @contextmanager
+    def span(self, kind, name, **extra):
+        """Mesure le bloc ; une exception marque le segment en échec"""
+        start = time.time()
+        success = True
+        try:
+            yield
+        except BaseException:
+            success = False
+            raise
+        finally:
+            self.add(kind, name, start, time.time(), success, **extra)
+
+    @contextmanager
+    def activate(self):
+        """Rend ce traceur actif pour le thread courant"""
+        previous = getattr(_local, "tracer", None)
+        _local.tracer = self
+        try:
+            yield self
+        finally:
+            _local.tracer = previous
+
+    def of_kind(self, kind, step=None):
+        return [s for s in self.spans if s["kind"] == kind and (step is None or s.get("step") == step)]
+
+    def summary(self, step=None):
+        """Nombre et durée cumulée des segments par type (hors étapes)"""
+        totals = {}
+        for span in self.spans:
+            if span["kind"] == "step" or (step is not None and span.get("step") != step):
+                continue
+            entry = totals.setdefault(span["kind"], {"count": 0, "duration": 0.0})
+            entry["count"] += 1
+            entry["duration"] = round(entry["duration"] + span["duration"], 3)
+        return totals
+
+
+def current_tracer():
+    """Traceur actif du thread courant, ou None"""
+    return getattr(_local, "tracer", None)
+
+
+@contextmanager
+def traced(kind, name, **extra):
+    """Mesure le bloc si un traceur est actif dans ce thread"""
+    tracer = current_tracer()
+    if tracer is None:
+        yield
+        return
+    with tracer.span(kind, name, **extra):
+        yield
+
+
+def instrument_driver(driver):
+    """
+    Trace chaque commande WebDriver (driver.execute) dans le traceur actif.
+
+    L'instrumentation est posée une seule fois par session : les sessions du
+    pool sont réutilisées d'un test à l'autre.
+    """
+    if getattr(driver, "_traced", False):
+        return driver
+    execute = driver.execute
+
+    def traced_execute(command, params=None):
+        tracer = current_tracer()
+        if tracer is None:
+            return execute(command, params)
+        with tracer.span("webdriver", command):
+            return execute(command, params)
+
+    driver.execute = traced_execute
+    driver._traced = True
+    return driver
+
+
+def percentile(sorted_values, fraction):
+    """Percentile par interpolation linéaire d'une liste triée"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def histogram(values, buckets=LATENCY_BUCKETS):
+    """Histogramme cumulatif (nombre de valeurs <= borne), format Prometheus"""
+    counts = [{"le": bound, "count": sum(1 for v in values if v <= bound)} for bound in buckets]
+    counts.append({"le": "+Inf", "count": len(values)})
+    return counts
+
+
+def step_latency_stats(rapport_collection, module=None, since=None, limit=500):
+    """
+    Agrège la durée des étapes des derniers tests terminés par module et par étape
+
+    Args:
+        module (str): Restreindre à un module
+        since (datetime): Ne prendre que les tests terminés depuis cette date
+        limit (int): Nombre maximum de tests analysés (les plus récents)
+
+    Returns:
+        list: {module, step, count, p50, p95, mean, max, histogram} triés par module puis p95 décroissant
+    """
+    query = {"status": {"$in": ["completed", "error"]}, "steps.duration": {"$exists": True}}
+    if module:
+        query["module"] = module
+    if since:
+        query["completed_at"] = {"$gte": since}
+
+    durations = {}
+    cursor = rapport_collection.find(
+        query, {"_id": 0, "module": 1, "steps.description": 1, "steps.duration": 1}
+    ).sort("completed_at", -1).limit(limit)
+    for rapport in cursor:
+        for step in rapport.get("steps") or []:
+            duration = step.get("duration")
+            if duration is None:
+                continue
+            durations.setdefault((rapport.get("module"), step.get("description")), []).append(duration)
+
+    stats = []
+    for (module_name, description), values in durations.items():
+        values.sort()
+        stats.append({
+            "module": module_name,
+            "step": description,
+            "count": len(values),
+            "p50": round(percentile(values, 0.5), 3),
+            "p95": round(percentile(values, 0.95), 3),
+            "mean": round(sum(values) / len(values), 3),
+            "max": round(values[-1], 3),
+            "histogram": histogram(values)
+        })
+    stats.sort(key=lambda s: (s["module"] or "", -s["p95"]))
+    return stats
@@ -1,16 +1,14 @@
-from flask_socketio import SocketIO
+import io
 from PIL import Image
-import numpy as np
-from skimage.metrics import structural_similarity as ssim
-import cv2
+from shared.extensions import socketio
 from shared.logger import logger
+from shared.screen_compare import compare_screens
 
 def emit_with_logging(event, data, namespace='/'):
     """
     Émet un événement via socketio avec logging
     """
     try:
-        from app import socketio
         socketio.emit(event, data, namespace=namespace)
         logger.info(f"Émission de l'événement {event}: {data}")
     except Exception as e:
@@ -45,27 +43,18 @@ def take_screenshot(driver=None):
         logger.error(f"Erreur lors de la capture d'écran: {str(e)}")
         return None
 
-def images_identiques_ssim(image1, image2, seuil=0.95):
+def images_identiques_ssim(image1, image2, seuil=0.95, masks=None):
     """
     Compare deux images en utilisant l'indice de similarité structurelle (SSIM)
+    calculé sur des versions réduites (voir shared.screen_compare)
+    Accepte des images PIL ou des tableaux numpy
     Retourne True si les images sont similaires, False sinon
     """
     try:
-        # Convertir les images PIL en tableaux numpy
-        if isinstance(image1, Image.Image):
-            img1 = np.array(image1.convert('L'))
-        if isinstance(image2, Image.Image):
-            img2 = np.array(image2.convert('L'))
+        diff = compare_screens(image1, image2, masks=masks)
+        logger.info(f"Score SSIM: {diff.score}")
 
-        # Redimensionner les images si nécessaire
-        if img1.shape != img2.shape:
-            img2 = cv2.resize(img2, (img1.shape[1], img1.shape[0]))
-
-        # Calculer le SSIM
-        score = ssim(img1, img2)
-        logger.info(f"Score SSIM: {score}")
-        
-        return score >= seuil
+        return diff.score >= seuil
     except Exception as e:
         logger.error(f"Erreur lors de la comparaison des images: {str(e)}")
-        return False
\ No newline at end of file
+        return False
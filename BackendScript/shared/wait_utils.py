@@ -0,0 +1,154 @@
+import time
+import numpy as np
+from selenium.common.exceptions import NoSuchFrameException, WebDriverException
+from shared.logger import logger
+from shared.tracing import Tracer, current_tracer
+
+
+class WaitRecorder(Tracer):
+    """Enregistre la durée réelle de chaque attente d'un test (et la trace complète)"""
+
+    @property
+    def records(self):
+        return [
+            dict({"description": s["name"], "elapsed": s["duration"], "timeout": s.get("timeout"), "success": s["success"]},
+                 **({"step": s["step"]} if "step" in s else {}))
+            for s in self.of_kind("wait")
+        ]
+
+    def for_step(self, step):
+        return [r for r in self.records if r.get("step") == step]
+
+    def total(self):
+        return round(sum(s["duration"] for s in self.of_kind("wait")), 3)
+
+
+def wait_until(condition, timeout=10, poll_interval=0.25, description="condition", recorder=None):
+    """
+    Interroge `condition` jusqu'à ce qu'elle retourne une valeur vraie ou que
+    le délai soit écoulé.
+
+    Args:
+        condition (callable): Fonction sans argument ; les exceptions comptent comme un échec
+        timeout (float): Temps maximum d'attente en secondes
+        poll_interval (float): Délai entre deux interrogations en secondes
+        description (str): Libellé de l'attente pour les logs et l'enregistrement
+        recorder (WaitRecorder): Enregistreur optionnel des durées d'attente
+
+    Returns:
+        La dernière valeur retournée par `condition` (None ou False en cas de dépassement)
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    value = None
+    while True:
+        try:
+            value = condition()
+        except Exception as e:
+            logger.debug(f"Attente '{description}': {str(e)}")
+            value = None
+        if value:
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(poll_interval, remaining))
+
+    elapsed = time.monotonic() - start
+    if recorder is None:
+        recorder = current_tracer()
+    if recorder is not None:
+        recorder.record(description, elapsed, timeout, bool(value))
+    if value:
+        logger.info(f"Attente '{description}' satisfaite en {elapsed:.2f}s")
+    else:
+        logger.warning(f"Attente '{description}' expirée après {elapsed:.2f}s")
+    return value
+
+
+def wait_for_element(driver, by, value, timeout=10, poll_interval=0.25, recorder=None):
+    """Attend qu'un élément soit présent dans le DOM et le retourne"""
+    # L'attente implicite du driver bloquerait chaque interrogation
+    previous = driver.timeouts.implicit_wait
+    driver.implicitly_wait(0)
+    try:
+        def find():
+            elements = driver.find_elements(by, value)
+            return elements[0] if elements else None
+        return wait_until(find, timeout, poll_interval, f"élément {by}={value}", recorder)
+    finally:
+        driver.implicitly_wait(previous)
+
+
+def wait_for_frame(driver, frame, timeout=10, poll_interval=0.25, recorder=None):
+    """Attend qu'un frame soit disponible et bascule dedans"""
+    def switch():
+        try:
+            driver.switch_to.frame(frame)
+            return True
+        except (NoSuchFrameException, WebDriverException):
+            return False
+    return wait_until(switch, timeout, poll_interval, f"frame {frame}", recorder)
+
+
+def wait_for_image(image_path, confidence=0.9, timeout=10, poll_interval=0.5, recorder=None, driver=None):
+    """
+    Attend qu'une image apparaisse à l'écran et retourne sa position
+
+    Args:
+        driver: Si fourni, l'image est cherchée dans la capture de la page (mode headless)
+    """
+    from shared.image_utils import locate_on_screen
+    return wait_until(
+        lambda: locate_on_screen(image_path, confidence=confidence, driver=driver),
+        timeout, poll_interval, f"image {image_path}", recorder
+    )
+
+
+def wait_for_images(image_paths, confidence=0.9, timeout=10, poll_interval=0.5, recorder=None, driver=None):
+    """
+    Attend qu'au moins une des images apparaisse (une capture par interrogation)
+
+    Returns:
+        dict: chemin -> Match des images visibles (vide en cas de dépassement)
+    """
+    from shared.image_utils import locate_images_on_screen
+    hits = wait_until(
+        lambda: locate_images_on_screen(image_paths, confidence=confidence, driver=driver),
+        timeout, poll_interval, f"images {', '.join(image_paths)}", recorder
+    )
+    return hits or {}
+
+
+def _frame_signature(image, size=(160, 90)):
+    # Image réduite en niveaux de gris : suffisante pour détecter un changement
+    return np.asarray(image.convert('L').resize(size), dtype=np.float32)
+
+
+def wait_for_screen_stable(capture, timeout=10, poll_interval=0.5, stable_frames=2, threshold=1.0, recorder=None):
+    """
+    Attend que l'écran ne change plus (différence entre images successives
+    inférieure à `threshold` pendant `stable_frames` captures).
+
+    Args:
+        capture (callable): Fonction retournant une capture d'écran PIL
+        threshold (float): Différence moyenne maximale par pixel (0-255)
+    """
+    state = {"previous": None, "stable": 0}
+
+    def settled():
+        image = capture()
+        if image is None:
+            return False
+        current = _frame_signature(image)
+        previous = state["previous"]
+        state["previous"] = current
+        if previous is None:
+            return False
+        if float(np.mean(np.abs(current - previous))) <= threshold:
+            state["stable"] += 1
+        else:
+            state["stable"] = 0
+        return state["stable"] >= stable_frames
+
+    return wait_until(settled, timeout, poll_interval, "stabilité de l'écran", recorder)
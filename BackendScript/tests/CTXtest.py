@@ -1,15 +1,23 @@
 from flask import request, jsonify
 from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.action_chains import ActionChains
-from shared.browser_utils import initialize_browser, keyboard_shortcut
-from shared.utils import emit_with_logging, update_step_status, take_screenshot, images_identiques_ssim
-from shared.image_utils import click_on_image
+from shared.browser_utils import initialize_browser, login_ikos
+from shared.utils import emit_with_logging, update_step_status, take_screenshot
+from shared.scenario import ScenarioContext, ScenarioStore, StepFailure
+from shared.screen_compare import compare_screens
+from shared.test_types import create_test_step
+from shared.wait_utils import WaitRecorder
+from shared.executor import check_cancelled
+from shared.tracing import instrument_driver
+from shared.metrics import PDF_BUILD
 from shared.report import generate_pdf
 from shared.logger import logger
+from shared.config import BROWSER_HEADLESS, SCREEN_MASKS, ERROR_PATTERNS
+from shared.error_watch import ErrorWatcher
 from shared.extensions import socketio  # 🔄 au lieu de from app import socketio
-from pymongo import MongoClient
+from shared.mongo import DatabaseProxy
+from shared.maintenance import delete_entries_without_module, delete_duplicates
 from datetime import datetime
+from contextlib import contextmanager
 # from shared.video_utils import save_video_to_gridfs  # Assurez-vous que ce module/fonction existe
 
 def take_and_save_error_screenshot(driver, test_id, error_type):
@@ -22,8 +30,8 @@ def take_and_save_error_screenshot(driver, test_id, error_type):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"error_screenshots/{test_id}_{error_type}_{timestamp}.png"
 
-        # Prendre la capture d'écran
-        screenshot = take_screenshot()
+        # Prendre la capture d'écran (page du navigateur en mode headless)
+        screenshot = take_screenshot(driver if BROWSER_HEADLESS else None)
         screenshot.save(filename)
 
         logger.info(f"Capture d'erreur sauvegardée: {filename}")
@@ -40,266 +48,191 @@ import time
 import subprocess
 import os
 
-_test_running = False
-
-mongo_client = MongoClient("mongodb://10.110.6.139:27017/")
-db = mongo_client["TestIkos"]
+db = DatabaseProxy()
 test_collection = db["test_results"]
-
-def clean_duplicate_tests():
-    """Supprime les doublons basés sur la durée d'exécution et le titre/scénario"""
-    count_deleted = 0
-    
+# Scénarios déclaratifs ; le scénario CTX livré avec l'application sert de repli
+scenario_store = ScenarioStore(
+    db["scenarios"],
+    default_path=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scenarios", "ctx.json")
+)
+
+def clean_duplicate_tests(dry_run=False):
+    """
+    Supprime les résultats sans scénario et les doublons (même module, scénario
+    et durée d'exécution), en conservant le plus récent
+
+    Le nettoyage n'est plus lancé après chaque test : il est planifié par
+    l'application (voir shared/maintenance.py).
+    """
     try:
-        # 1. Suppression des enregistrements sans nom de module (comme avant)
-        result = test_collection.delete_many({"scenario": None})
-        count_deleted += result.deleted_count
-        logger.info(f"Supprimé {count_deleted} enregistrements sans module.")
-        
-        # 2. Suppression des doublons basés sur durée ET titre
-        pipeline = [
-            {
-                "$group": {
-                    "_id": {
-                        "scenario": "$scenario",
-                        "execution_time": "$execution_time",
-                        "module": "$module"  # Ajout du module pour plus de précision
-                    },
-                    "docs": {"$push": "$$ROOT"},
-                    "count": {"$sum": 1}
-                }
-            },
-            {
-                "$match": {
-                    "count": {"$gt": 1}
-                }
-            }
-        ]
-        
-        # Trouve tous les groupes de doublons
-        duplicates = list(test_collection.aggregate(pipeline))
-        
-        duplicates_deleted = 0
-        for duplicate_group in duplicates:
-            docs = duplicate_group["docs"]
-            # Garde le plus récent (basé sur execution_date) et supprime les autres
-            docs_sorted = sorted(docs, key=lambda x: x.get("execution_date", datetime.min), reverse=True)
-            docs_to_delete = docs_sorted[1:]  # Tous sauf le plus récent
-            
-            for doc in docs_to_delete:
-                test_collection.delete_one({"_id": doc["_id"]})
-                duplicates_deleted += 1
-        
-        logger.info(f"Supprimé {duplicates_deleted} doublons basés sur durée et titre.")
-        count_deleted += duplicates_deleted
-        
-        # 3. Alternative plus simple : suppression basée uniquement sur durée d'exécution identique
-        # (décommentez cette section si vous préférez cette approche)
-        """
-        # Trouve les documents avec des durées d'exécution identiques
-        pipeline_simple = [
-            {
-                "$group": {
-                    "_id": "$execution_time",
-                    "docs": {"$push": "$$ROOT"},
-                    "count": {"$sum": 1}
-                }
-            },
-            {
-                "$match": {
-                    "count": {"$gt": 1}
-                }
-            }
-        ]
-        
-        time_duplicates = list(test_collection.aggregate(pipeline_simple))
-        
-        for duplicate_group in time_duplicates:
-            docs = duplicate_group["docs"]
-            # Garde le plus récent
-            docs_sorted = sorted(docs, key=lambda x: x.get("execution_date", datetime.min), reverse=True)
-            docs_to_delete = docs_sorted[1:]
-            
-            for doc in docs_to_delete:
-                test_collection.delete_one({"_id": doc["_id"]})
-                count_deleted += 1
-        """
-        
-        logger.info(f"Total supprimé: {count_deleted} enregistrements.")
-        
+        without_module = delete_entries_without_module(test_collection, dry_run)
+        duplicates = delete_duplicates(test_collection, dry_run)
+        logger.info(f"Nettoyage des résultats : {without_module} sans module, {duplicates} doublon(s)")
+        return without_module + duplicates
     except Exception as e:
         logger.error(f"Erreur lors du nettoyage des doublons: {str(e)}")
-    
-    finally:
-        # Déconnexion
-        mongo_client.close()
-
-def check_for_errors(driver):
-    """Vérifie si le mot 'erreur' apparaît dans la page"""
-    try:
-        # Vérifier dans le corps de la page
-        page_text = driver.find_element(By.TAG_NAME, 'body').text.lower()
-        if 'erreur' in page_text:
-            return True
-
-        # Vérifier aussi dans les éléments spécifiques qui pourraient contenir des messages d'erreur
-        error_elements = driver.find_elements(By.XPATH, "//*[contains(translate(text(), 'ERREUR', 'erreur'), 'erreur')]")
-        return len(error_elements) > 0
-
-    except Exception as e:
-        logger.error(f"Erreur lors de la vérification des erreurs: {str(e)}")
-        return False
-
-
-
-
-def run_ctx_test(module, scenario, test_id=None):
-    global _test_running
-    if _test_running:
-        logger.warning("Test already running, skipping duplicate execution")
-        return [{
-            "description": "Test déjà en cours",
-            "status": "skipped",
-            "result": "Un test est déjà en cours d'exécution"
-        }]
-    _test_running = True
+        return 0
+
+def attach_wait_timings(steps, waits):
+    """Ajoute à chaque étape la durée réelle de ses attentes"""
+    for index, step in enumerate(steps):
+        step_waits = waits.for_step(index)
+        if step_waits:
+            step['waits'] = step_waits
+            step['wait_time'] = round(sum(w['elapsed'] for w in step_waits), 3)
+
+
+def run_ctx_test(module, scenario, test_id=None, driver=None, tracer=None):
+    """
+    Exécute le scénario défini pour le module (collection "scenarios"), ou le
+    scénario CTX par défaut
+
+    Args:
+        driver: Session déjà authentifiée fournie par le pool de navigateurs.
+            Si absent, un navigateur est démarré puis fermé par le test.
+        tracer (WaitRecorder): Trace à compléter (étapes, attentes, images,
+            appels WebDriver) ; créée si absente
+    """
+    # Chaque appel dispose de sa propre session navigateur : plusieurs tests
+    # peuvent s'exécuter en parallèle depuis les emplacements du pool
+    run_started = time.time()
     error_screenshots = []
-
-    video_path = f"test_video_{int(time.time())}.mp4"
-    recorder = start_recording(video_path)
+    owns_driver = driver is None
+    waits = tracer if tracer is not None else WaitRecorder()
+
+    def screen():
+        # En mode headless, captures et clics passent par le navigateur au lieu
+        # du bureau : plusieurs tests peuvent tourner sur la même machine
+        return driver if BROWSER_HEADLESS else None
+
+    def capture():
+        return take_screenshot(screen())
+
+    screens = {"previous": None}
+
+    def track_screen(step_index):
+        # Comparaison réduite (quelques ms) avec l'écran de l'étape précédente :
+        # enregistre le score et les zones modifiées sur l'étape
+        image = capture()
+        if image is not None and screens["previous"] is not None:
+            steps[step_index]["screen_change"] = compare_screens(screens["previous"], image, masks=SCREEN_MASKS).to_dict()
+        screens["previous"] = image
+        return image
+
+    @contextmanager
+    def timed_step(index):
+        # Horodatage de l'étape, stocké sur l'étape et dans la trace
+        waits.step = index
+        start = time.time()
+        success = False
+        try:
+            yield
+            success = True
+        finally:
+            end = time.time()
+            steps[index].update({
+                "started_at": round(start, 3),
+                "ended_at": round(end, 3),
+                "duration": round(end - start, 3),
+                "trace": waits.summary(index)
+            })
+            waits.add("step", steps[index]["description"], start, end, success)
+
+    video_path = f"test_video_{test_id or int(time.time())}.mp4"
+    # L'enregistrement capture le bureau : inutilisable sans affichage
+    recorder = None if BROWSER_HEADLESS else start_recording(video_path)
     try:
         logger.info(f"Starting test for module: {module}, scenario: {scenario}")
 
-        steps = [
-            {"description": "Initialisation du navigateur", "status": "pending", "result": "En attente"},
-            {"description": "Connexion à l'application", "status": "pending", "result": "En attente"},
-            {"description": "Navigation et saisie", "status": "pending", "result": "En attente"},
-            {"description": "Validation des changements", "status": "pending", "result": "En attente"},
-            {"description": "Nettoyage et fermeture", "status": "pending", "result": "En attente"}
-        ]
+        # Plan compilé une seule fois par définition (cache par contenu)
+        plan = scenario_store.load(module, scenario)
+        steps = (
+            [create_test_step("Initialisation du navigateur", "pending", "En attente"),
+             create_test_step("Connexion à l'application", "pending", "En attente")]
+            + plan.test_steps()
+            + [create_test_step("Nettoyage et fermeture", "pending", "En attente")]
+        )
+        cleanup_index = len(steps) - 1
+        # Observateur injecté une fois par page : chaque vérification ne lit
+        # qu'un tampon de messages au lieu du DOM complet
+        check_for_errors = ErrorWatcher(ERROR_PATTERNS + plan.error_patterns)
 
         if socketio:
             socketio.emit('steps', {'type': 'steps', 'steps': steps}, namespace='/')
 
         try:
-            # Étape 0 - Initialisation navigateur
-            emit_with_logging('step_update', {'stepIndex': 0, 'status': 'running', 'message': 'Initialisation en cours...'})
-            driver = initialize_browser()
-            update_step_status(steps, 0, 'completed', 'Navigateur initialisé avec succès')
-            emit_with_logging('step_update', {'stepIndex': 0, 'status': 'completed', 'message': 'Navigateur initialisé avec succès'})
-
-            # Vérification d'erreurs après étape 0
-            if check_for_errors(driver):
-                steps[0]['screenshot'] = take_and_save_error_screenshot(driver, test_id, "init_error")
-                raise Exception("Erreur détectée dans la page après initialisation navigateur")
-
-            # Étape 1 - Connexion
-            emit_with_logging('step_update', {'stepIndex': 1, 'status': 'running'})
-            driver.get("http://ikostst.maisonsetcites.local")
-            time.sleep(2)
-            driver.switch_to.frame("fappli")
-            driver.find_element(By.NAME, "userID").send_keys("BLASZYKCO")
-            driver.find_element(By.NAME, "userPWD").send_keys("7WLv7ldBaLnvrpq")
-            driver.find_element(By.NAME, "userPWD").send_keys(Keys.RETURN)
-            update_step_status(steps, 1, 'completed', 'Connexion réussie')
-            emit_with_logging('step_update', {'stepIndex': 1, 'status': 'completed'})
-
-            # Vérification d'erreurs après étape 1
-            if check_for_errors(driver):
-                steps[1]['screenshot'] = take_and_save_error_screenshot(driver, test_id, "login_error")
-                raise Exception("Erreur détectée dans la page après connexion")
-
-            # Étape 2 - Navigation et saisie
-            emit_with_logging('step_update', {'stepIndex': 2, 'status': 'running'})
-            time.sleep(3)
-            actions = ActionChains(driver)
-            actions.send_keys("COX200M").perform()
-            actions.send_keys(Keys.RETURN).perform()
-            time.sleep(3)
-            actions.send_keys("118218").perform()
-            actions.send_keys(Keys.RETURN).perform()
-            time.sleep(8)
-
-            # Vérification d'erreurs après étape 2 (avant screenshot)
-            if check_for_errors(driver):
-                steps[2]['screenshot'] = take_and_save_error_screenshot(driver, test_id, "navigation_error")
-                raise Exception("Erreur détectée dans la page après navigation et saisie")
-
-            image1 = take_screenshot()
-            click_on_image("image\\boutonVoulezVous.PNG", confidence=0.8)
-            time.sleep(1)
-
-            for _ in range(22):
-                actions.send_keys(Keys.TAB).perform()
-                time.sleep(0.1)
-            actions.send_keys(Keys.RETURN).perform()
-            time.sleep(1)
-
-            actions.send_keys("JUG").perform()
-            actions.send_keys(Keys.RETURN).perform()
-            time.sleep(2)
-            click_on_image("image\\BoutonValider.PNG", confidence=0.8)
-            time.sleep(2)
-            click_on_image("image\\BoutonValider.PNG", confidence=0.8)
-            time.sleep(10)
-            image2 = take_screenshot()
-            changed = not images_identiques_ssim(image1, image2)
-            update_step_status(steps, 2, 'completed', 'Navigation et saisie complètes')
-            emit_with_logging('step_update', {'stepIndex': 2, 'status': 'completed'})
-
-            # Vérification d'erreurs après étape 2 (après actions)
-            if check_for_errors(driver):
-                steps[2]['screenshot'] = take_and_save_error_screenshot(driver, test_id, "navigation_post_action_error")
-                raise Exception("Erreur détectée dans la page après navigation et saisie (post actions)")
-
-            # Étape 3 - Validation
-            emit_with_logging('step_update', {'stepIndex': 3, 'status': 'running'})
-            click_on_image("image\\boutonSelect.PNG")
-            time.sleep(10)
-            click_on_image("image\\boutonVoulezVous.PNG", confidence=0.8)
-            time.sleep(5)
-
-            # Vérification d'erreurs après étape 3 (avant TAB)
-            if check_for_errors(driver):
-                steps[3]['screenshot'] = take_and_save_error_screenshot(driver, test_id, "validation_error")
-                raise Exception("Erreur détectée dans la page après validation (avant TAB)")
-
-            for _ in range(4):
-                actions.send_keys(Keys.TAB).perform()
-                time.sleep(0.1)
-            actions.send_keys(Keys.RETURN).perform()
-            time.sleep(5)
-            click_on_image("image\\BoutonValider.PNG", confidence=0.8)
-            time.sleep(5)
-            click_on_image("image\\boutonRetour.PNG", confidence=0.8)
-            time.sleep(2)
-
-            # Vérification d'erreurs après étape 3 (après actions)
-            if check_for_errors(driver):
-                steps[3]['screenshot'] = take_and_save_error_screenshot(driver, test_id, "validation_post_action_error")
-                raise Exception("Erreur détectée dans la page après validation (post actions)")
-
-            update_step_status(steps, 3, 'completed', 'Validation des changements effectuée')
-            emit_with_logging('step_update', {'stepIndex': 3, 'status': 'completed'})
-
-            # Étape 4 - Nettoyage
-            update_step_status(steps, 4, 'completed', 'Nettoyage et fermeture réussis')
-            emit_with_logging('step_update', {'stepIndex': 4, 'status': 'completed'})
-
-            # Vérification d'erreurs après étape 4
-            if check_for_errors(driver):
-                steps[4]['screenshot'] = take_and_save_error_screenshot(driver, test_id, "cleanup_error")
-                raise Exception("Erreur détectée dans la page après nettoyage et fermeture")
-
-            pdf_path = generate_pdf(steps)
+            with waits.activate():
+                # Étape 0 - Initialisation navigateur
+                with timed_step(0):
+                    emit_with_logging('step_update', {'stepIndex': 0, 'status': 'running', 'message': 'Initialisation en cours...'})
+                    if owns_driver:
+                        driver = initialize_browser()
+                    instrument_driver(driver)
+                    update_step_status(steps, 0, 'completed', 'Navigateur initialisé avec succès')
+                    emit_with_logging('step_update', {'stepIndex': 0, 'status': 'completed', 'message': 'Navigateur initialisé avec succès'})
+
+                    # Vérification d'erreurs après étape 0
+                    if check_for_errors(driver):
+                        steps[0]['screenshot'] = take_and_save_error_screenshot(driver, test_id, "init_error")
+                        raise Exception("Erreur détectée dans la page après initialisation navigateur")
+
+                # Étape 1 - Connexion
+                with timed_step(1):
+                    emit_with_logging('step_update', {'stepIndex': 1, 'status': 'running'})
+                    if owns_driver:
+                        login_ikos(driver, recorder=waits)
+                        update_step_status(steps, 1, 'completed', 'Connexion réussie')
+                    else:
+                        # La session du pool est déjà authentifiée et positionnée sur l'accueil
+                        update_step_status(steps, 1, 'completed', 'Connexion réussie (session pré-authentifiée)')
+                    track_screen(1)
+                    emit_with_logging('step_update', {'stepIndex': 1, 'status': 'completed'})
+
+                    # Vérification d'erreurs après étape 1
+                    if check_for_errors(driver):
+                        steps[1]['screenshot'] = take_and_save_error_screenshot(driver, test_id, "login_error")
+                        raise Exception("Erreur détectée dans la page après connexion")
+
+                # Étapes du scénario
+                context = ScenarioContext(driver, screen=screen(), recorder=waits, capture=capture,
+                                          check_errors=check_for_errors, test_id=test_id)
+                for index, plan_step in enumerate(plan.steps, start=2):
+                    # Arrêt du scénario si le job a été repris par un autre worker
+                    check_cancelled()
+                    with timed_step(index):
+                        context.step = steps[index]
+                        emit_with_logging('step_update', {'stepIndex': index, 'status': 'running'})
+                        try:
+                            plan_step.run(context)
+                        except StepFailure as failure:
+                            steps[index]['screenshot'] = take_and_save_error_screenshot(driver, test_id, f"step{index}_error")
+                            raise Exception(f"{plan_step.description} : {str(failure)}")
+                        track_screen(index)
+                        update_step_status(steps, index, 'completed', f"{plan_step.description} : terminé")
+                        emit_with_logging('step_update', {'stepIndex': index, 'status': 'completed'})
+
+                # Dernière étape - Nettoyage
+                with timed_step(cleanup_index):
+                    update_step_status(steps, cleanup_index, 'completed', 'Nettoyage et fermeture réussis')
+                    emit_with_logging('step_update', {'stepIndex': cleanup_index, 'status': 'completed'})
+
+                    # Vérification d'erreurs après nettoyage
+                    if check_for_errors(driver):
+                        steps[cleanup_index]['screenshot'] = take_and_save_error_screenshot(driver, test_id, "cleanup_error")
+                        raise Exception("Erreur détectée dans la page après nettoyage et fermeture")
+
+            attach_wait_timings(steps, waits)
+            with PDF_BUILD.time(report="etapes"):
+                pdf_path = generate_pdf(steps)
             socketio.emit('complete', {'type': 'complete', 'pdfUrl': f'/download/{pdf_path}'}, namespace='/')
 
-            driver.quit()
-            _test_running = False
+            if owns_driver:
+                driver.quit()
+                driver = None
 
             try:
-                start_time = time.time()
-                execution_time = time.time() - start_time
+                # Durée réelle du test, depuis le début de run_ctx_test
+                execution_time = time.time() - run_started
                 result_id = save_test_results(
                     module=module,
                     scenario=scenario,
@@ -309,19 +242,19 @@ def run_ctx_test(module, scenario, test_id=None):
                     execution_time=execution_time
                 )
                 logger.info(f"Test results saved to MongoDB with ID: {result_id.inserted_id}")
-                clean_duplicate_tests()
-                time.sleep(1)
                 return steps
             finally:
-                stop_recording(recorder)
-                time.sleep(1)
-                if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
-                    video_id = save_video_to_gridfs(video_path, test_id)
-                    os.remove(video_path)
-                else:
-                    logger.error("La vidéo n'a pas été créée correctement ou est vide.")
+                if recorder is not None:
+                    stop_recording(recorder)
+                    time.sleep(1)
+                    if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
+                        video_id = save_video_to_gridfs(video_path, test_id)
+                        os.remove(video_path)
+                    else:
+                        logger.error("La vidéo n'a pas été créée correctement ou est vide.")
 
         except Exception as step_error:
+            attach_wait_timings(steps, waits)
             logger.error(f"Erreur pendant l'exécution du test: {str(step_error)}")
             for step in steps:
                 if step['status'] == 'pending':
@@ -336,7 +269,13 @@ def run_ctx_test(module, scenario, test_id=None):
             "status": "error",
             "result": f"Erreur: {str(e)}"
         }]
-    
+    finally:
+        if owns_driver and driver is not None:
+            try:
+                driver.quit()
+            except Exception as quit_error:
+                logger.error(f"Erreur lors de la fermeture du navigateur: {str(quit_error)}")
+
 def capture_specific_element(driver, element_identifier, filename_prefix):
     """Capture un élément spécifique de la page"""
     try:
@@ -349,10 +288,12 @@ def capture_specific_element(driver, element_identifier, filename_prefix):
 
 
 
-def save_test_results(steps, test_id, pdf_path, execution_time):
+def save_test_results(steps, test_id, pdf_path, execution_time, module=None, scenario=None):
     """Sauvegarde les résultats du test dans MongoDB"""
     test_result = {
         "test_id": test_id,
+        "module": module,
+        "scenario": scenario,
         "execution_date": datetime.now(),
         "execution_time": execution_time,
         "pdf_path": pdf_path,
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+# Les tests importent les modules du backend (shared.*) depuis BackendScript
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db():
+    """Base MongoDB en mémoire (mongomock), vide pour chaque test"""
+    return mongomock.MongoClient()["test_ikos"]
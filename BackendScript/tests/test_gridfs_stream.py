@@ -0,0 +1,66 @@
+import gridfs
+import mongomock.gridfs
+import pytest
+from flask import Flask
+
+from shared.gridfs_stream import send_gridfs_file
+
+mongomock.gridfs.enable_gridfs_integration()
+
+DATA = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def client(db):
+    fs = gridfs.GridFS(db)
+    file_id = fs.put(DATA, filename="rapport_é.pdf", content_type="application/pdf", chunkSize=1000)
+    app = Flask(__name__)
+
+    @app.route("/fichier")
+    def fichier():
+        return send_gridfs_file(fs.get(file_id))
+
+    return app.test_client()
+
+
+def test_full_file(client):
+    response = client.get("/fichier")
+    assert response.status_code == 200
+    assert response.data == DATA
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert "filename*=UTF-8''rapport_%C3%A9.pdf" in response.headers["Content-Disposition"]
+
+
+def test_etag_not_modified(client):
+    etag = client.get("/fichier").headers["ETag"]
+    assert client.get("/fichier", headers={"If-None-Match": etag}).status_code == 304
+
+
+@pytest.mark.parametrize("header, start, stop", [
+    ("bytes=990-1010", 990, 1011),
+    ("bytes=-10", len(DATA) - 10, len(DATA)),
+    ("bytes=10000-", 10000, len(DATA)),
+])
+def test_single_range(client, header, start, stop):
+    response = client.get("/fichier", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes {start}-{stop - 1}/{len(DATA)}"
+    assert response.data == DATA[start:stop]
+
+
+def test_unsatisfiable_range(client):
+    response = client.get("/fichier", headers={"Range": "bytes=999999-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(DATA)}"
+
+
+def test_multiple_ranges_serve_full_file(client):
+    response = client.get("/fichier", headers={"Range": "bytes=0-1,5-9"})
+    assert response.status_code == 200
+    assert response.data == DATA
+
+
+def test_if_range_mismatch_serves_full_file(client):
+    response = client.get("/fichier", headers={"Range": "bytes=0-1", "If-Range": '"autre"'})
+    assert response.status_code == 200
+    assert response.data == DATA
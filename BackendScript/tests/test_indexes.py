@@ -0,0 +1,42 @@
+from pymongo import ASCENDING, DESCENDING
+
+from shared.indexes import IndexSpec, apply_indexes
+
+SPECS = [
+    IndexSpec("rapport", [("test_id", ASCENDING)], {"unique": True}),
+    IndexSpec("rapport", [("module", ASCENDING), ("date_creation", DESCENDING)]),
+    IndexSpec("campagne", [("campaign_id", ASCENDING)], {"unique": True}),
+]
+
+
+def test_creates_missing_indexes_once(db):
+    report = apply_indexes(db, SPECS)
+    assert report["rapport"]["created"] == ["test_id_1", "module_1_date_creation_-1"]
+    assert report["campagne"]["created"] == ["campaign_id_1"]
+
+    report = apply_indexes(db, SPECS)
+    assert report["rapport"]["created"] == []
+    assert report["rapport"]["present"] == ["test_id_1", "module_1_date_creation_-1"]
+
+
+def test_reports_option_mismatch_and_extra_indexes(db):
+    db["rapport"].create_index([("test_id", ASCENDING)])
+    db["rapport"].create_index([("status", ASCENDING)])
+    report = apply_indexes(db, SPECS)["rapport"]
+    assert report["mismatched"] == ["test_id_1"]
+    assert report["extra"] == ["status_1"]
+    assert not db["rapport"].index_information()["test_id_1"].get("unique")
+
+
+def test_repair_recreates_mismatched_index(db):
+    db["rapport"].create_index([("test_id", ASCENDING)])
+    report = apply_indexes(db, SPECS, repair=True)["rapport"]
+    assert "test_id_1" in report["created"]
+    assert db["rapport"].index_information()["test_id_1"]["unique"] is True
+
+
+def test_duplicates_fall_back_to_non_unique_index(db):
+    db["rapport"].insert_many([{"test_id": "t1"}, {"test_id": "t1"}])
+    report = apply_indexes(db, SPECS)["rapport"]
+    assert report["failed"] == [{"index": "test_id_1", "error": "doublons : index créé sans unicité"}]
+    assert "test_id_1" in db["rapport"].index_information()
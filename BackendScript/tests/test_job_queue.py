@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+import pytest
+
+from shared.job_queue import JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JobQueue, utcnow
+
+
+@pytest.fixture
+def queue(db):
+    queue = JobQueue(db["test_jobs"], lease_seconds=60, max_attempts=2)
+    queue.ensure_indexes()
+    return queue
+
+
+def expire_lease(queue, job_id):
+    queue.collection.update_one({"job_id": job_id}, {"$set": {"lease_expires": utcnow() - timedelta(seconds=1)}})
+
+
+def test_enqueue_ignores_duplicates(queue):
+    assert queue.enqueue("t1") is True
+    assert queue.enqueue("t1") is False
+    assert queue.enqueue_many(["t1", "t2", "t3"]) == 2
+    assert queue.depth() == 3
+
+
+def test_requeue_finished_job(queue):
+    queue.enqueue("t1")
+    queue.claim("w1")
+    queue.complete("t1", "w1")
+    assert queue.enqueue("t1") is False
+    assert queue.enqueue("t1", requeue_finished=True) is True
+    job = queue.collection.find_one({"job_id": "t1"})
+    assert job["status"] == JOB_QUEUED
+    assert job["attempts"] == 0
+
+
+def test_claim_takes_oldest_job_first(queue):
+    queue.enqueue_many(["t1", "t2", "t3"])
+    assert queue.queued_ids() == ["t1", "t2", "t3"]
+    assert queue.position("t3") == 3
+
+    job = queue.claim("w1")
+    assert job["job_id"] == "t1"
+    assert job["status"] == JOB_RUNNING
+    assert job["lease_owner"] == "w1"
+    assert job["attempts"] == 1
+    assert queue.claim("w2")["job_id"] == "t2"
+    assert queue.position("t3") == 1
+    assert queue.running_count() == 2
+
+
+def test_claim_empty_queue(queue):
+    assert queue.claim("w1") is None
+
+
+def test_heartbeat_only_for_lease_owner(queue):
+    queue.enqueue("t1")
+    queue.claim("w1")
+    assert queue.heartbeat("t1", "w1") is True
+    assert queue.heartbeat("t1", "w2") is False
+
+
+def test_complete_records_error(queue):
+    queue.enqueue_many(["t1", "t2"])
+    queue.claim("w1")
+    queue.claim("w1")
+    queue.complete("t1", "w1")
+    queue.complete("t2", "w1", error="boom")
+    assert queue.collection.find_one({"job_id": "t1"})["status"] == JOB_DONE
+    failed = queue.collection.find_one({"job_id": "t2"})
+    assert failed["status"] == JOB_FAILED
+    assert failed["error"] == "boom"
+
+
+def test_recover_stale_requeues_then_fails(queue):
+    queue.enqueue("t1")
+    queue.claim("w1")
+    assert queue.recover_stale() == ([], [])
+
+    expire_lease(queue, "t1")
+    assert queue.recover_stale() == (["t1"], [])
+    # Le worker d'origine a perdu son bail
+    assert queue.heartbeat("t1", "w1") is False
+
+    assert queue.claim("w2")["attempts"] == 2
+    expire_lease(queue, "t1")
+    assert queue.recover_stale() == ([], ["t1"])
+    assert queue.collection.find_one({"job_id": "t1"})["status"] == JOB_FAILED
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from shared.job_queue import utcnow
+from shared.maintenance import MaintenanceScheduler, delete_duplicates, duplicate_ids, run_cleanup
+
+
+@pytest.fixture
+def results(db):
+    base = datetime(2026, 1, 1)
+    docs = []
+    # Trois exécutions identiques (même module, scénario et durée) : la plus récente est conservée
+    for day in range(3):
+        docs.append({"name": f"dup{day}", "module": "A", "scenario": "s1", "execution_time": 12.5,
+                     "execution_date": base + timedelta(days=day)})
+    docs += [
+        {"name": "other_time", "module": "A", "scenario": "s1", "execution_time": 13.0, "execution_date": base},
+        {"name": "other_module", "module": "B", "scenario": "s1", "execution_time": 12.5, "execution_date": base},
+        {"name": "no_scenario", "module": "A", "scenario": None, "execution_time": 1.0, "execution_date": base},
+    ]
+    db["test_results"].insert_many(docs)
+    return db["test_results"]
+
+
+def names(collection, ids):
+    return sorted(doc["name"] for doc in collection.find({"_id": {"$in": ids}}))
+
+
+def test_duplicate_ids_keep_the_most_recent(results):
+    batches = list(duplicate_ids(results))
+    assert len(batches) == 1
+    assert names(results, batches[0]) == ["dup0", "dup1"]
+
+
+def test_duplicate_ids_are_batched(results):
+    assert [len(batch) for batch in duplicate_ids(results, batch_size=1)] == [1, 1]
+
+
+def test_delete_duplicates_dry_run(results):
+    assert delete_duplicates(results, dry_run=True) == 2
+    assert results.count_documents({}) == 6
+    assert delete_duplicates(results) == 2
+    assert sorted(doc["name"] for doc in results.find()) == ["dup2", "no_scenario", "other_module", "other_time"]
+
+
+def test_run_cleanup(db, results):
+    db["rapport"].insert_many([{"test_id": "t1", "scenario": None}, {"test_id": "t2", "scenario": "s1"}])
+    report = run_cleanup(db)
+    assert report["test_results"] == {"without_module": 1, "duplicates": 2}
+    assert report["rapport"] == {"without_module": 1}
+    assert results.count_documents({}) == 3
+
+
+def test_scheduler_runs_once_per_interval(db):
+    runs = []
+    first = MaintenanceScheduler(lambda: runs.append(1) or "ok", db["locks"], "cleanup", interval_seconds=3600)
+    other = MaintenanceScheduler(lambda: runs.append(2), db["locks"], "cleanup", interval_seconds=3600)
+    assert first.run_once() == "ok"
+    assert other.run_once() is None
+    assert runs == [1]
+    assert db["locks"].find_one({"_id": "cleanup"})["until"] > utcnow().replace(tzinfo=None)
@@ -0,0 +1,115 @@
+import pytest
+from pymongo.errors import BulkWriteError
+
+from shared.progress_writer import ProgressWriter, _PendingUpdate
+
+
+class FailingCollection:
+    """Collection dont le bulk_write échoue, entièrement ou pour certaines opérations"""
+
+    def __init__(self, failed_indexes=None):
+        self.failed_indexes = failed_indexes
+        self.calls = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.calls.append(operations)
+        if self.failed_indexes is None:
+            raise ConnectionError("MongoDB indisponible")
+        raise BulkWriteError({
+            "writeErrors": [{"index": index, "code": 1, "errmsg": "erreur"} for index in self.failed_indexes]
+        })
+
+
+@pytest.fixture
+def writer(db):
+    db["rapport"].insert_many([{"test_id": "t1", "steps": []}, {"test_id": "t2", "steps": []}])
+    # Intervalle long : seuls les flush explicites écrivent pendant le test
+    return ProgressWriter(db["rapport"], interval=3600)
+
+
+def test_set_replaces_pending_push_and_unset():
+    update = _PendingUpdate()
+    update.merge(push={"steps": "a"}, unset=["error"])
+    update.merge(set_fields={"steps": ["b"], "error": "x"})
+    assert update.to_update() == {"$set": {"steps": ["b"], "error": "x"}}
+
+
+def test_push_after_set_extends_the_set_value():
+    update = _PendingUpdate()
+    update.merge(set_fields={"steps": ["a"], "status": "running"})
+    update.merge(push={"steps": "b", "logs": "l1"})
+    update.merge(push={"logs": "l2"})
+    assert update.to_update() == {
+        "$set": {"steps": ["a", "b"], "status": "running"},
+        "$push": {"logs": {"$each": ["l1", "l2"]}}
+    }
+
+
+def test_unset_removes_pending_changes():
+    update = _PendingUpdate()
+    update.merge(set_fields={"error": "x"}, push={"steps": "a"})
+    update.merge(unset=["error", "steps"])
+    assert update.to_update() == {"$unset": {"error": "", "steps": ""}}
+
+
+def test_absorb_applies_newer_changes_on_top():
+    older = _PendingUpdate()
+    older.merge(set_fields={"status": "running", "progress": 10}, push={"steps": "a"})
+    newer = _PendingUpdate()
+    newer.merge(set_fields={"progress": 50}, push={"steps": "b"}, unset=["status"])
+    older.absorb(newer)
+    assert older.to_update() == {
+        "$set": {"progress": 50},
+        "$push": {"steps": {"$each": ["a", "b"]}},
+        "$unset": {"status": ""}
+    }
+
+
+def test_flush_writes_all_tests_in_one_bulk(writer, db):
+    writer.update("t1", set_fields={"status": "running"}, push={"steps": "a"})
+    writer.update("t1", push={"steps": "b"})
+    writer.update("t2", set_fields={"progress": 40})
+    assert db["rapport"].find_one({"test_id": "t1"})["steps"] == []
+
+    assert writer.flush() == 2
+    assert db["rapport"].find_one({"test_id": "t1"}, {"_id": 0}) == {
+        "test_id": "t1", "status": "running", "steps": ["a", "b"]
+    }
+    assert db["rapport"].find_one({"test_id": "t2"})["progress"] == 40
+    assert writer.flush() == 0
+
+
+def test_discard_drops_pending_updates(writer, db):
+    writer.update("t1", set_fields={"status": "running"})
+    writer.discard("t1")
+    assert writer.flush() == 0
+    assert "status" not in db["rapport"].find_one({"test_id": "t1"})
+
+
+def test_failed_flush_keeps_updates_before_newer_ones():
+    writer = ProgressWriter(FailingCollection(), interval=3600)
+    writer.update("t1", set_fields={"status": "running"}, push={"steps": "a"})
+    assert writer.flush() == 0
+
+    writer.update("t1", set_fields={"progress": 20}, push={"steps": "b"})
+    assert writer._pending["t1"].to_update() == {
+        "$set": {"status": "running", "progress": 20},
+        "$push": {"steps": {"$each": ["a", "b"]}}
+    }
+
+
+def test_flush_on_update_raises_to_the_caller():
+    writer = ProgressWriter(FailingCollection(), interval=3600)
+    with pytest.raises(ConnectionError):
+        writer.update("t1", set_fields={"status": "completed"}, flush=True)
+    assert "t1" in writer._pending
+
+
+def test_bulk_write_error_retries_only_failed_operations():
+    collection = FailingCollection(failed_indexes=[1])
+    writer = ProgressWriter(collection, interval=3600)
+    writer.update("t1", push={"steps": "a"})
+    writer.update("t2", push={"steps": "b"})
+    writer.flush()
+    # Le $push de t1 a été appliqué : il ne doit pas être rejoué
+    assert list(writer._pending) == ["t2"]
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from shared.rapport_listing import decode_cursor, list_rapports_page, rapport_filters, rapport_stats
+
+
+@pytest.fixture
+def rapports(db):
+    base = datetime(2026, 1, 1)
+    docs = [
+        {
+            "test_id": f"T{i}",
+            "module": "A" if i % 2 else "B",
+            "scenario": f"Scénario {i}",
+            "status": "completed",
+            "success": i % 3 != 0,
+            "execution_time": float(i),
+            # Plusieurs rapports par minute : départage par _id
+            "date_creation": base + timedelta(minutes=i // 3),
+            "steps": [{"description": "étape"}],
+        }
+        for i in range(20)
+    ]
+    # Anciens documents sans date de création
+    docs += [{"test_id": f"N{i}", "module": "A", "scenario": "Ancien", "status": "error"} for i in range(3)]
+    db["rapport"].insert_many(docs)
+    return db["rapport"]
+
+
+def read_all(collection, query, descending, limit=4):
+    seen, cursor = [], None
+    while True:
+        page, cursor = list_rapports_page(collection, query, limit=limit, cursor=cursor, descending=descending)
+        assert len(page) <= limit
+        seen += [doc["test_id"] for doc in page]
+        if not cursor:
+            return seen
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_keyset_pages_cover_every_document_once(rapports, descending):
+    seen = read_all(rapports, {}, descending)
+    assert len(seen) == len(set(seen)) == 23
+    dated = [test_id for test_id in seen if test_id.startswith("T")]
+    expected = [f"T{i}" for i in range(20)]
+    assert dated == (expected[::-1] if descending else expected)
+    # Sans date : en fin de liste en ordre décroissant, en début sinon
+    undated = seen[-3:] if descending else seen[:3]
+    assert all(test_id.startswith("N") for test_id in undated)
+
+
+def test_keyset_pages_with_filters(rapports):
+    query = rapport_filters(module="A", success=False)
+    seen = read_all(rapports, query, True, limit=2)
+    assert seen == ["T15", "T9", "T3", "N2", "N1", "N0"]
+
+
+def test_summary_view_omits_steps(rapports):
+    page, _ = list_rapports_page(rapports, {}, limit=1)
+    assert "steps" not in page[0]
+    page, _ = list_rapports_page(rapports, {}, view="full", limit=1)
+    assert "steps" in page[0]
+    with pytest.raises(ValueError):
+        list_rapports_page(rapports, {}, view="inconnue")
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("pas-un-curseur")
+
+
+def test_filters():
+    since = datetime(2026, 1, 1)
+    assert rapport_filters(status="completed, error", success=True, since=since) == {
+        "status": {"$in": ["completed", "error"]},
+        "success": True,
+        "date_creation": {"$gte": since},
+    }
+    assert rapport_filters(status="error", success=False) == {"status": "error", "success": {"$ne": True}}
+
+
+def test_search_is_case_insensitive_and_literal(rapports):
+    assert read_all(rapports, rapport_filters(search="scénario 1"), True) == [
+        "T19", "T18", "T17", "T16", "T15", "T14", "T13", "T12", "T11", "T10", "T1"
+    ]
+    assert read_all(rapports, rapport_filters(search="("), True) == []
+
+
+def test_stats_use_the_same_filters(rapports):
+    assert rapport_stats(rapports, rapport_filters(module="B")) == {
+        "total": 10, "success": 6, "fail": 4, "in_progress": 0, "avg_execution_time": 9.0
+    }
+    assert rapport_stats(rapports, rapport_filters(module="Z"))["total"] == 0
+
+
+def test_stats_do_not_count_unfinished_tests_as_failures(db):
+    db["rapport"].insert_many([
+        {"test_id": "ok", "status": "completed", "success": True},
+        {"test_id": "ko", "status": "completed", "success": False},
+        {"test_id": "crash", "status": "error"},
+        {"test_id": "wait", "status": "pending", "success": False},
+        {"test_id": "run", "status": "running"},
+    ])
+    stats = rapport_stats(db["rapport"], {})
+    assert (stats["total"], stats["success"], stats["fail"], stats["in_progress"]) == (5, 1, 2, 2)
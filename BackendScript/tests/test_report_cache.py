@@ -0,0 +1,62 @@
+import gridfs
+import mongomock.gridfs
+import pytest
+
+from shared.report_cache import ReportCache
+
+mongomock.gridfs.enable_gridfs_integration()
+
+
+class EvictingGridFS(gridfs.GridFS):
+    """GridFS dont le fichier demandé est supprimé juste avant la lecture (éviction concurrente)"""
+
+    def get(self, file_id):
+        if getattr(self, "evict_next_get", False):
+            self.evict_next_get = False
+            self.delete(file_id)
+        return super().get(file_id)
+
+
+@pytest.fixture
+def cache(db):
+    return ReportCache(EvictingGridFS(db), db, budget_bytes=10_000)
+
+
+def render(data=b"%PDF rapport"):
+    calls = []
+
+    def render():
+        calls.append(1)
+        return data, "rapport.pdf", {"test_id": "t1"}
+
+    return render, calls
+
+
+def test_second_download_is_served_from_cache(cache):
+    key = cache.key([{"description": "étape"}], module="CTX")
+    first, calls = render()
+    assert cache.get_or_render(key, first).read() == b"%PDF rapport"
+    assert cache.get_or_render(key, first).read() == b"%PDF rapport"
+    assert len(calls) == 1
+
+
+def test_file_evicted_during_get_is_a_miss(cache):
+    key = cache.key([], module="CTX")
+    first, _ = render()
+    cache.get_or_render(key, first)
+
+    cache.fs.evict_next_get = True
+    assert cache.get(key) is None
+
+    again, calls = render(b"%PDF nouveau rendu")
+    assert cache.get_or_render(key, again).read() == b"%PDF nouveau rendu"
+    assert len(calls) == 1
+
+
+def test_eviction_keeps_recent_reports_under_budget(db):
+    cache = ReportCache(gridfs.GridFS(db), db, budget_bytes=25)
+    for index in range(3):
+        cache.put(f"k{index}", b"x" * 10, f"rapport_{index}.pdf")
+    assert cache.size() <= 25
+    assert cache.get("k2") is not None
+    assert cache.get("k0") is None
@@ -0,0 +1,47 @@
+import io
+import threading
+
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Spacer
+
+from shared.report_template import footer_flowables, header_flowables, section_title, step_flowables
+
+STEPS = [
+    {"description": f"Étape {i}", "status": status, "result": "Résultat " * 20}
+    for i, status in enumerate(["success", "error", "en cours"] * 5)
+]
+
+
+def render():
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    story = header_flowables()
+    story.append(section_title("DÉTAIL DES ÉTAPES"))
+    story.extend(step_flowables(STEPS))
+    story.append(Spacer(1, 10))
+    story.extend(footer_flowables("2026-01-01 08:00:00"))
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def test_render_twice_in_the_same_thread():
+    assert render().startswith(b"%PDF")
+    assert render().startswith(b"%PDF")
+
+
+def test_render_from_several_threads():
+    errors = []
+
+    def worker():
+        for _ in range(15):
+            try:
+                render()
+            except Exception as e:
+                errors.append(repr(e))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
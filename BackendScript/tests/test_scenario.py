@@ -0,0 +1,82 @@
+import os
+import re
+
+import pytest
+
+from shared.scenario import ScenarioError, ScenarioStore, compile_scenario, parse_scenario
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def definition(*actions, **extra):
+    return {
+        "module": "CTX",
+        "scenario": "Test",
+        "steps": [{"description": "Étape", "actions": list(actions)}],
+        **extra,
+    }
+
+
+@pytest.fixture
+def backend_dir(monkeypatch):
+    # Les chemins d'images des scénarios sont relatifs à BackendScript
+    monkeypatch.chdir(BACKEND_DIR)
+
+
+def test_parse_json_and_yaml():
+    assert parse_scenario('{"module": "CTX"}') == {"module": "CTX"}
+    pytest.importorskip("yaml")
+    assert parse_scenario("module: CTX\nscenario: Test") == {"module": "CTX", "scenario": "Test"}
+
+
+@pytest.mark.parametrize("source", ["[]", "42", '"texte"', None])
+def test_parse_rejects_non_objects(source):
+    with pytest.raises(ScenarioError):
+        parse_scenario(source)
+
+
+def test_compile_default_scenario(backend_dir):
+    with open(os.path.join("scenarios", "ctx.json"), encoding="utf-8") as f:
+        plan = compile_scenario(f.read())
+    assert plan.module == "CTX"
+    assert [step["status"] for step in plan.test_steps()] == ["pending"] * len(plan.steps)
+
+
+def test_compiled_plans_are_cached_by_content():
+    first = compile_scenario(definition({"action": "type", "text": "{contrat}"}, variables={"contrat": "1"}))
+    second = compile_scenario(definition({"action": "type", "text": "{contrat}"}, variables={"contrat": "1"}))
+    other = compile_scenario(definition({"action": "type", "text": "{contrat}"}, variables={"contrat": "2"}))
+    assert first is second
+    assert other.digest != first.digest
+
+
+@pytest.mark.parametrize("source, message", [
+    ({"module": "CTX", "steps": []}, "au moins une étape"),
+    (definition({"action": "inconnue"}), "Action inconnue"),
+    (definition({"action": "type"}), "champ(s) manquant(s) text"),
+    (definition({"action": "type", "text": "{absente}"}, variables={"contrat": "1"}), "Variable inconnue"),
+    (definition({"action": "key", "key": "pas-une-touche"}), "Touche inconnue"),
+    (definition({"action": "click-image", "image": "image/Absente.PNG"}), "Image introuvable"),
+    (definition(error_patterns=["(?P<nom>erreur)"]), "Motif d'erreur invalide"),
+    (definition(error_patterns=["["]), "Motif d'erreur invalide"),
+])
+def test_compile_errors(backend_dir, source, message):
+    with pytest.raises(ScenarioError, match=re.escape(message)):
+        compile_scenario(source)
+
+
+def test_store_falls_back_to_module_definition(db, backend_dir):
+    store = ScenarioStore(db["scenarios"], default_path=os.path.join("scenarios", "ctx.json"))
+    store.ensure_indexes()
+    module_plan = store.save(definition({"action": "type", "text": "module"}, scenario="*"))
+    assert store.load("CTX", "Autre").digest == module_plan.digest
+    with pytest.raises(ScenarioError):
+        store.save({"module": "CTX", "steps": []})
+
+
+def test_default_scenario_only_for_its_module(db, backend_dir):
+    store = ScenarioStore(db["scenarios"], default_path=os.path.join("scenarios", "ctx.json"))
+    assert store.load("CTX", "Test").module == "CTX"
+    # Un autre module ne doit pas exécuter les étapes CTX
+    with pytest.raises(ScenarioError, match="Aucun scénario défini pour AUTRE / Test"):
+        store.load("AUTRE", "Test")
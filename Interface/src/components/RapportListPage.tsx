@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { Link } from 'react-router-dom';
 import axios from 'axios';
 import { 
@@ -23,62 +23,73 @@ import {
 const RapportListPage: React.FC = () => {
   const [rapports, setRapports] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [moduleFilter, setModuleFilter] = useState<string>('all');
   const [statusFilter, setStatusFilter] = useState<string>('all');
   const [searchTerm, setSearchTerm] = useState<string>('');
-  const [sortOrder, setSortOrder] = useState<string>('desc'); // 'asc', 'desc', 'none'
+  const [sortOrder, setSortOrder] = useState<string>('desc'); // 'asc', 'desc'
+  const [modules, setModules] = useState<string[]>([]);
+  const [stats, setStats] = useState({ total: 0, success: 0, fail: 0, inProgress: 0, avgTime: '0' });
+  // Seule la réponse de la dernière recherche est affichée
+  const requestId = useRef(0);
 
-  const modules = Array.from(new Set(rapports.map(r => r.module))).sort();
+  // Filtres, recherche et tri appliqués par le serveur (mêmes paramètres pour
+  // la liste et les statistiques)
+  const filterParams = () => ({
+    ...(moduleFilter !== 'all' ? { module: moduleFilter } : {}),
+    ...(statusFilter !== 'all' ? { success: statusFilter === 'success' } : {}),
+    ...(searchTerm.trim() ? { search: searchTerm.trim() } : {}),
+    order: sortOrder
+  });
 
-  useEffect(() => {
-    const fetchRapports = async () => {
-      try {
-        const res = await axios.get('http://172.16.8.23:5000/api/rapport');
-        setRapports(res.data.rapports || []);
-      } finally {
-        setLoading(false);
-      }
-    };
-    fetchRapports();
-  }, []);
+  // Liste paginée côté serveur : vue synthèse, page suivante via next_cursor
+  const fetchRapports = async (cursor?: string) => {
+    const current = requestId.current;
+    const res = await axios.get('http://172.16.8.23:5000/api/rapport', {
+      params: { view: 'summary', limit: 200, ...filterParams(), ...(cursor ? { cursor } : {}) }
+    });
+    if (current !== requestId.current) return;
+    setRapports(prev => (cursor ? [...prev, ...(res.data.rapports || [])] : res.data.rapports || []));
+    setNextCursor(res.data.next_cursor || null);
+  };
 
-  // Filtrage avec recherche et tri
-  const filteredAndSortedRapports = rapports
-    .filter(r => {
-      const moduleOk = moduleFilter === 'all' || r.module === moduleFilter;
-      const statusOk =
-        statusFilter === 'all' ||
-        (statusFilter === 'success' && r.success) ||
-        (statusFilter === 'fail' && !r.success);
-      const searchOk = searchTerm === '' || 
-        r.module.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        r.scenario.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        r.test_id.toLowerCase().includes(searchTerm.toLowerCase());
-      
-      return moduleOk && statusOk && searchOk;
-    })
-    .sort((a, b) => {
-      if (sortOrder === 'none') return 0;
-      
-      const dateA = new Date(a.date_creation || 0).getTime();
-      const dateB = new Date(b.date_creation || 0).getTime();
-      
-      if (sortOrder === 'asc') {
-        return dateA - dateB;
-      } else if (sortOrder === 'desc') {
-        return dateB - dateA;
-      }
-      return 0;
+  const fetchStats = async () => {
+    const current = requestId.current;
+    const res = await axios.get('http://172.16.8.23:5000/api/rapport/stats', { params: filterParams() });
+    if (current !== requestId.current) return;
+    setModules(res.data.modules || []);
+    setStats({
+      total: res.data.total || 0,
+      success: res.data.success || 0,
+      fail: res.data.fail || 0,
+      inProgress: res.data.in_progress || 0,
+      avgTime: (res.data.avg_execution_time || 0).toFixed(1)
     });
+  };
+
+  useEffect(() => {
+    // La recherche est envoyée après une courte pause de saisie
+    const timer = setTimeout(() => {
+      requestId.current += 1;
+      Promise.all([fetchRapports(), fetchStats()]).finally(() => setLoading(false));
+    }, searchTerm ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [moduleFilter, statusFilter, searchTerm, sortOrder]);
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      await fetchRapports(nextCursor);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   // Fonction pour changer l'ordre de tri
   const handleSortChange = () => {
-    const nextSort = {
-      'desc': 'asc',
-      'asc': 'none', 
-      'none': 'desc'
-    };
-    setSortOrder(nextSort[sortOrder as keyof typeof nextSort]);
+    setSortOrder(sortOrder === 'desc' ? 'asc' : 'desc');
   };
 
   // Icône et texte pour le bouton de tri
@@ -98,16 +109,10 @@ const RapportListPage: React.FC = () => {
     }
   };
 
-  // Statistiques (basées sur les rapports filtrés)
-  const stats = {
-    total: rapports.length,
-    success: rapports.filter(r => r.success).length,
-    fail: rapports.filter(r => !r.success).length,
-    avgTime: rapports.length > 0 ? 
-      (rapports.reduce((sum, r) => sum + (r.execution_time || 0), 0) / rapports.length).toFixed(1) : 0
-  };
-
-  const successRate = rapports.length > 0 ? ((stats.success / stats.total) * 100).toFixed(1) : 0;
+  // Statistiques calculées par le serveur sur tous les rapports filtrés ;
+  // les tests en attente ou en cours ne sont ni des succès ni des échecs
+  const successRate = stats.total > 0 ? ((stats.success / stats.total) * 100).toFixed(1) : '0';
+  const failRate = stats.total > 0 ? ((stats.fail / stats.total) * 100).toFixed(1) : '0';
 
   if (loading) {
     return (
@@ -136,7 +141,7 @@ const RapportListPage: React.FC = () => {
             </div>
             <div className="flex items-center space-x-4">
               <div className="text-right">
-                <div className="text-2xl font-bold text-slate-800">{filteredAndSortedRapports.length}</div>
+                <div className="text-2xl font-bold text-slate-800">{stats.total}</div>
                 <div className="text-sm text-slate-500">rapports trouvés</div>
               </div>
             </div>
@@ -152,6 +157,9 @@ const RapportListPage: React.FC = () => {
               <div>
                 <p className="text-sm font-medium text-slate-600">Total Rapports</p>
                 <p className="text-2xl font-bold text-slate-800">{stats.total}</p>
+                {stats.inProgress > 0 && (
+                  <p className="text-xs text-slate-500">{stats.inProgress} en attente ou en cours</p>
+                )}
               </div>
               <div className="p-3 bg-blue-100 rounded-lg">
                 <FileText className="h-6 w-6 text-blue-600" />
@@ -177,7 +185,7 @@ const RapportListPage: React.FC = () => {
               <div>
                 <p className="text-sm font-medium text-slate-600">Échecs</p>
                 <p className="text-2xl font-bold text-red-600">{stats.fail}</p>
-                <p className="text-xs text-slate-500">{(100 - parseFloat(successRate)).toFixed(1)}% d'échec</p>
+                <p className="text-xs text-slate-500">{failRate}% d'échec</p>
               </div>
               <div className="p-3 bg-red-100 rounded-lg">
                 <TrendingDown className="h-6 w-6 text-red-600" />
@@ -207,7 +215,7 @@ const RapportListPage: React.FC = () => {
               Filtres et Tri
             </h2>
             <div className="text-sm text-slate-500">
-              {filteredAndSortedRapports.length} sur {rapports.length} rapports
+              {rapports.length} affichés sur {stats.total} rapports
             </div>
           </div>
           
@@ -298,7 +306,7 @@ const RapportListPage: React.FC = () => {
         </div>
 
         {/* Reports Grid */}
-        {filteredAndSortedRapports.length === 0 ? (
+        {rapports.length === 0 ? (
           <div className="text-center py-16">
             <div className="w-32 h-32 mx-auto mb-6 bg-gradient-to-br from-slate-100 to-slate-200 rounded-full flex items-center justify-center">
               <BarChart3 className="w-16 h-16 text-slate-400" />
@@ -310,7 +318,7 @@ const RapportListPage: React.FC = () => {
           </div>
         ) : (
           <div className="grid gap-6 md:grid-cols-2 lg:grid-cols-3">
-            {filteredAndSortedRapports.map((r, index) => (
+            {rapports.map((r, index) => (
               <Link
                 to={`/reports/${r._id}`}
                 key={r._id}
@@ -413,6 +421,19 @@ const RapportListPage: React.FC = () => {
             ))}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="text-center mt-8">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="inline-flex items-center gap-2 px-6 py-3 bg-white border border-slate-200 rounded-lg text-slate-700 hover:bg-slate-50 disabled:opacity-50"
+            >
+              {loadingMore && <Loader2 className="h-4 w-4 animate-spin" />}
+              Charger plus de rapports
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
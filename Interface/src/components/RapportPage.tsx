@@ -40,7 +40,9 @@ interface Rapport {
   completed_at?: string;
   execution_time: number;
   filename: string;
-  pdf_id: string;
+  pdf_id?: string;
+  // "on_demand" : PDF rendu au premier téléchargement (REPORT_RENDERING=lazy)
+  report_status?: string;
   success: boolean;
 }
 
@@ -82,26 +84,29 @@ const RapportPage: React.FC = () => {
     fetchRapport();
   }, [testId]);
 
+  const canDownload = !!rapport?.pdf_id || rapport?.report_status === 'on_demand';
+
   const handleDownload = async () => {
-    if (!rapport?.pdf_id) {
+    if (!rapport || !canDownload) {
       alert('ID du PDF manquant');
       return;
     }
 
     try {
       setDownloading(true);
-      const res = await axios.get(
-        `http://172.16.8.23:5000/api/download_pdf/${rapport.pdf_id}`,
-        { responseType: 'blob' }
-      );
-      const url = window.URL.createObjectURL(new Blob([res.data]));
+      // Sans PDF stocké, le rapport est rendu à la demande par le serveur
+      const url = rapport.pdf_id
+        ? `http://172.16.8.23:5000/api/download_pdf/${rapport.pdf_id}`
+        : `http://172.16.8.23:5000/api/test-report/${encodeURIComponent(rapport.test_id)}/pdf`;
+      const res = await axios.get(url, { responseType: 'blob' });
+      const blobUrl = window.URL.createObjectURL(new Blob([res.data]));
       const link = document.createElement('a');
-      link.href = url;
+      link.href = blobUrl;
       link.setAttribute('download', rapport.filename || 'rapport.pdf');
       document.body.appendChild(link);
       link.click();
       link.remove();
-      window.URL.revokeObjectURL(url);
+      window.URL.revokeObjectURL(blobUrl);
     } catch (err) {
       console.error('Erreur téléchargement:', err);
       alert('Erreur lors du téléchargement du PDF');
@@ -219,7 +224,7 @@ const RapportPage: React.FC = () => {
             
             <button
               onClick={handleDownload}
-              disabled={downloading || !rapport?.pdf_id}
+              disabled={downloading || !canDownload}
               className="inline-flex items-center gap-2 bg-blue-600 text-white px-6 py-3 rounded-lg hover:bg-blue-700 disabled:bg-slate-300 disabled:cursor-not-allowed transition-all shadow-lg hover:shadow-xl"
             >
               {downloading ? (
@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import { ArrowLeft, Download, Loader2, CheckCircle, XCircle, ChevronDown, ChevronUp, RefreshCw } from 'lucide-react';
-import { getTestResults, downloadReport } from '../services/api';
+import { getTestResults, downloadReport, downloadTestReport } from '../services/api';
 import { Test, TestStep } from '../types';
 import { toast } from 'react-toastify';
 
@@ -50,14 +50,21 @@ const TestDetails: React.FC = () => {
     setRefreshing(false);
   };
   
+  // Without a stored PDF, an on-demand report is rendered by the server on download
+  const canDownload = !!test?.pdf_id || test?.report_status === 'on_demand';
+  
   const handleDownloadReport = async () => {
-    if (!test?.pdf_id) {
+    if (!test || !canDownload) {
       toast.error('No report available for download');
       return;
     }
     
     try {
-      await downloadReport(test.pdf_id);
+      if (test.pdf_id) {
+        await downloadReport(test.pdf_id);
+      } else {
+        await downloadTestReport(test.test_id);
+      }
       toast.success('Report downloaded successfully');
     } catch (err) {
       toast.error('Failed to download report');
@@ -147,7 +154,7 @@ const TestDetails: React.FC = () => {
             <RefreshCw className={`h-4 w-4 ${refreshing ? 'animate-spin' : ''}`} />
             Refresh
           </button>
-          {test?.pdf_id && (
+          {canDownload && (
             <button
               onClick={handleDownloadReport}
               className="flex items-center gap-1 bg-blue-600 hover:bg-blue-700 text-white px-4 py-2 rounded-md text-sm font-medium transition-colors"
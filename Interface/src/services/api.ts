@@ -149,6 +149,28 @@ export const downloadReport = async (pdfId: string): Promise<void> => {
   }
 };
 
+// Download a test report by test id (rendered on demand when no PDF is stored yet)
+export const downloadTestReport = async (testId: string): Promise<void> => {
+  try {
+    const response = await api.get(`/api/test-report/${encodeURIComponent(testId)}/pdf`, {
+      responseType: 'blob',
+    });
+    
+    const blob = new Blob([response.data], { type: 'application/pdf' });
+    const url = window.URL.createObjectURL(blob);
+    const a = document.createElement('a');
+    a.href = url;
+    a.download = `test-report-${testId}.pdf`;
+    document.body.appendChild(a);
+    a.click();
+    window.URL.revokeObjectURL(url);
+    document.body.removeChild(a);
+  } catch (error) {
+    console.error('Error downloading report:', error);
+    throw error;
+  }
+};
+
 // Get a specific test report
 export const getTestReport = async (testId: string): Promise<any> => {
   try {
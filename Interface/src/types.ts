@@ -9,6 +9,8 @@ export interface Test {
   status: string;
   date_creation: string;
   pdf_id?: string;
+  // "on_demand" : PDF rendu au premier téléchargement (REPORT_RENDERING=lazy)
+  report_status?: string;
   filename?: string;
   execution_time?: number;
   success?: boolean;